@@ -0,0 +1,203 @@
+# run.py
+"""
+Benchmarks the document parsing pipeline offline on CPU.
+
+Synthetic statements of several page counts are converted with an OCR model
+from convert_doc_docling and their text is sent to extract_data_using_ollama_llm,
+which talks to a local stub server with a configurable delay instead of Ollama.
+Reports docs/sec, p50/p95 latency of every stage and peak RSS, and compares the
+results against a stored baseline.
+
+Usage:
+    python -m benchmarks.run --pages 1 5 20 --docs 2 --ocr-model easy
+    python -m benchmarks.run --skip-ocr --llm-latency 0.05 --save-baseline
+"""
+
+# imports
+import argparse
+import json
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from llm_document_parser.config import LLM_PROMPT, RESPONSE_MODEL, TESSERACT_TESSDATA_LOCATION
+from llm_document_parser.export_data import ResultAccumulator
+from llm_document_parser.instructor_llm import extract_data_using_ollama_llm
+from llm_document_parser.instrumentation import metrics
+
+from benchmarks.stub_llm import StubLLMServer
+from benchmarks.synthetic import generate_corpus, make_transactions, statement_markdown
+
+DEFAULT_BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of a list of values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process and its finished children, in MB.
+    """
+    scale = 1 if sys.platform == "darwin" else 1024  # bytes on macOS, KB on Linux
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return usage * scale / (1024 * 1024)
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """
+    Run the benchmark described by the command line arguments.
+    Returns:
+        dict: The throughput, per-stage latencies and peak RSS.
+    """
+    stage_seconds: Dict[str, List[float]] = defaultdict(list)
+
+    def record_span(event: dict):
+        if event["type"] == "span":
+            stage_seconds[event["name"]].append(event["seconds"])
+
+    metrics.add_sink(record_span)
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        if args.skip_ocr:
+            documents = [
+                statement_markdown(make_transactions(page_count * 30, seed=page_count * 1000 + index))
+                for page_count in args.pages
+                for index in range(args.docs)
+            ]
+        else:
+            from llm_document_parser.convert_doc_docling import load_ocr_model
+            from llm_document_parser.ocr_pool import convert_to_markdown
+
+            corpus = generate_corpus(Path(corpus_dir), args.pages, args.docs)
+            document_converter = load_ocr_model(args.ocr_model, TESSERACT_TESSDATA_LOCATION)
+            # Warm up model loading so it is not counted as part of the first document
+            convert_to_markdown(document_converter, corpus[0][0])
+            stage_seconds.clear()
+
+        with StubLLMServer(make_transactions(5), latency_seconds=args.llm_latency) as stub:
+            def extract(text_data: str):
+                result = extract_data_using_ollama_llm(
+                    prompt=LLM_PROMPT,
+                    text_data=text_data,
+                    ollama_model="stub",
+                    response_model=RESPONSE_MODEL,
+                    base_url=stub.base_url
+                )
+                accumulator = ResultAccumulator(RESPONSE_MODEL)
+                accumulator.add_result(result)
+                accumulator.to_df()
+
+            # Warm up the lazy imports and the shared client so they are not counted as part of the first document
+            extract(statement_markdown(make_transactions(1)))
+            stage_seconds.clear()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.llm_workers) as llm_pool:
+                if args.skip_ocr:
+                    futures = [llm_pool.submit(extract, document) for document in documents]
+                else:
+                    futures = [
+                        llm_pool.submit(extract, convert_to_markdown(document_converter, path))
+                        for path, _ in corpus
+                    ]
+                for future in futures:
+                    future.result()
+            elapsed = time.perf_counter() - start
+
+    doc_count = len(args.pages) * args.docs
+    return {
+        "config": {
+            "pages": args.pages,
+            "docs": args.docs,
+            "ocr_model": None if args.skip_ocr else args.ocr_model,
+            "llm_latency": args.llm_latency,
+            "llm_workers": args.llm_workers,
+        },
+        "docs": doc_count,
+        "seconds": elapsed,
+        "docs_per_sec": doc_count / elapsed if elapsed else 0.0,
+        "stages": {
+            name: {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+            for name, values in sorted(stage_seconds.items())
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Compare results with a baseline run.
+    Args:
+        results (dict): The current results.
+        baseline (dict): The baseline results.
+        tolerance (float): Allowed relative slowdown before a metric counts as a regression.
+    Returns:
+        List[str]: A description of every regression.
+    """
+    regressions = []
+    if results["docs_per_sec"] < baseline["docs_per_sec"] * (1 - tolerance):
+        regressions.append(f"docs/sec {results['docs_per_sec']:.2f} < baseline {baseline['docs_per_sec']:.2f}")
+    for name, stage in results["stages"].items():
+        baseline_stage = baseline["stages"].get(name)
+        if baseline_stage and stage["p95"] > baseline_stage["p95"] * (1 + tolerance):
+            regressions.append(f"{name} p95 {stage['p95'] * 1000:.1f} ms > baseline {baseline_stage['p95'] * 1000:.1f} ms")
+    if results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak RSS {results['peak_rss_mb']:.0f} MB > baseline {baseline['peak_rss_mb']:.0f} MB")
+    return regressions
+
+def print_report(results: dict):
+    print(f"{results['docs']} documents in {results['seconds']:.2f}s ({results['docs_per_sec']:.2f} docs/sec)")
+    print(f"{'stage':<40}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}")
+    for name, stage in results["stages"].items():
+        print(f"{name:<40}{stage['count']:>8}{stage['p50'] * 1000:>12.1f}{stage['p95'] * 1000:>12.1f}")
+    print(f"peak RSS: {results['peak_rss_mb']:.0f} MB")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5], help="Page counts of the synthetic statements")
+    parser.add_argument("--docs", type=int, default=2, help="Statements per page count")
+    parser.add_argument("--ocr-model", default="easy", help="OCR model passed to load_ocr_model")
+    parser.add_argument("--skip-ocr", action="store_true", help="Send synthetic markdown straight to the LLM stage")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the stub LLM waits before answering")
+    parser.add_argument("--llm-workers", type=int, default=1, help="Concurrent LLM requests")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown against the baseline")
+    parser.add_argument("--output", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args)
+    print_report(results)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("config") != results["config"]:
+            print(f"Baseline {args.baseline} was recorded with a different configuration, skipping comparison")
+            return 0
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
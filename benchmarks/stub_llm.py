@@ -0,0 +1,77 @@
+# stub_llm.py
+"""
+A local OpenAI compatible chat completions server for benchmarks.
+It answers every request with a fixed bank statement after a configurable
+delay, standing in for Ollama so LLM-side overhead can be measured offline.
+"""
+
+# imports
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+
+class StubLLMServer:
+    """
+    OpenAI compatible stub that returns the same transactions for every request.
+    Also answers the Ollama /api/tags endpoint, so it passes health checks.
+    """
+
+    def __init__(self, transactions: List[dict], latency_seconds: float = 0.0):
+        """
+        Args:
+            transactions (List[dict]): The transactions returned in every response.
+            latency_seconds (float): Delay before each chat completion response.
+        """
+        content = json.dumps({"transactions": transactions})
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._send_json({"models": []})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests += 1
+                time.sleep(stub.latency_seconds)
+                self._send_json({
+                    "id": f"stub-{stub.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"http://127.0.0.1:{self._server.server_port}"
+        self.base_url = f"{self.host}/v1"
+
+    def __enter__(self) -> "StubLLMServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,115 @@
+# synthetic.py
+"""
+Generates synthetic bank statements for benchmarking.
+Statements are rendered as page images with a header, a transaction table and a
+"Page i of n" footer, and saved as PNG (single page) or PDF (any page count).
+The transactions are returned as well so results can be checked.
+"""
+
+# imports
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+PAGE_SIZE = (1700, 2200)  # US letter at 200 DPI
+ROWS_PER_PAGE = 30
+DESCRIPTIONS = ["Walmart", "Payroll Deposit", "Shell Gas", "Rent Payment", "Amazon", "Coffee Shop", "Electric Co", "ATM Withdrawal"]
+
+
+def make_transactions(count: int, seed: int = 0) -> List[dict]:
+    """
+    Make a list of random but reproducible transactions.
+    Args:
+        count (int): Number of transactions.
+        seed (int): Random seed.
+    Returns:
+        List[dict]: Transactions with the fields of BankStatementEntry.
+    """
+    rng = random.Random(seed)
+    start = date(2025, 1, 1)
+    transactions = []
+    for index in range(count):
+        transaction_type = rng.choice(["deposit", "withdrawal"])
+        transactions.append({
+            "transaction_date": (start + timedelta(days=index // 3)).isoformat(),
+            "description": rng.choice(DESCRIPTIONS),
+            "amount": round(rng.uniform(1, 2500), 2),
+            "transaction_type": transaction_type,
+        })
+    return transactions
+
+def _font(size: int) -> ImageFont.ImageFont:
+    return ImageFont.load_default(size=size)
+
+def render_statement_pages(transactions: List[dict], page_count: int) -> List[Image.Image]:
+    """
+    Render transactions onto statement page images.
+    Args:
+        transactions (List[dict]): The transactions, ROWS_PER_PAGE per page.
+        page_count (int): Number of pages to render.
+    Returns:
+        List[Image.Image]: The rendered pages.
+    """
+    pages = []
+    header_font, body_font = _font(48), _font(30)
+    for page_index in range(page_count):
+        page = Image.new("RGB", PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(page)
+        draw.text((120, 100), "ACME BANK - Account Statement", fill="black", font=header_font)
+        draw.text((120, 180), "Account 000123456789    CONFIDENTIAL", fill="black", font=body_font)
+        draw.text((120, 280), "Date          Description                 Amount", fill="black", font=body_font)
+
+        rows = transactions[page_index * ROWS_PER_PAGE:(page_index + 1) * ROWS_PER_PAGE]
+        for row_index, transaction in enumerate(rows):
+            transaction_date = date.fromisoformat(transaction["transaction_date"]).strftime("%m/%d/%Y")
+            sign = "" if transaction["transaction_type"] == "deposit" else "-"
+            line = f"{transaction_date}    {transaction['description']:<26}  {sign}${transaction['amount']:,.2f}"
+            draw.text((120, 340 + row_index * 55), line, fill="black", font=body_font)
+
+        draw.text((760, 2080), f"Page {page_index + 1} of {page_count}", fill="black", font=body_font)
+        pages.append(page)
+    return pages
+
+def statement_markdown(transactions: List[dict]) -> str:
+    """
+    Render transactions as the markdown table docling would produce, for runs without OCR.
+    Args:
+        transactions (List[dict]): The transactions.
+    Returns:
+        str: The markdown.
+    """
+    lines = ["## ACME BANK - Account Statement", "", "| Date | Description | Amount |", "|---|---|---|"]
+    for transaction in transactions:
+        sign = "" if transaction["transaction_type"] == "deposit" else "-"
+        lines.append(f"| {transaction['transaction_date']} | {transaction['description']} | {sign}{transaction['amount']:.2f} |")
+    return "\n".join(lines)
+
+def generate_corpus(output_dir: Path, page_counts: List[int], docs_per_size: int, seed: int = 0) -> List[Tuple[Path, List[dict]]]:
+    """
+    Write synthetic statements of each page count to a directory.
+    Single page statements are written as PNG images, longer ones as PDFs.
+    Args:
+        output_dir (Path): Directory to write the statements to.
+        page_counts (List[int]): Page counts to generate.
+        docs_per_size (int): Number of statements of each page count.
+        seed (int): Random seed.
+    Returns:
+        List[Tuple[Path, List[dict]]]: Each statement file and its transactions.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    corpus = []
+    for page_count in page_counts:
+        for doc_index in range(docs_per_size):
+            transactions = make_transactions(page_count * ROWS_PER_PAGE, seed=seed + page_count * 1000 + doc_index)
+            pages = render_statement_pages(transactions, page_count)
+            if page_count == 1:
+                path = output_dir / f"statement_{page_count}p_{doc_index}.png"
+                pages[0].save(path)
+            else:
+                path = output_dir / f"statement_{page_count}p_{doc_index}.pdf"
+                pages[0].save(path, save_all=True, append_images=pages[1:], resolution=200)
+            corpus.append((path, transactions))
+    return corpus
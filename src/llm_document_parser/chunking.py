@@ -0,0 +1,157 @@
+# chunking.py
+"""
+This module splits long documents into chunks for LLM extraction.
+The OCR markdown is split on page breaks and blank lines, oversized tables are
+split by rows with their header repeated, and the pieces are packed into
+token-budgeted chunks. Chunks are extracted concurrently and the results are
+merged back into a single response model, dropping transactions that were
+extracted twice from the overlap between neighbouring chunks.
+"""
+
+# imports
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Type
+
+from pydantic import BaseModel
+
+# Written between pages by export_to_markdown(page_break_placeholder=...)
+PAGE_BREAK_PLACEHOLDER = "<!-- page break -->"
+
+BLOCK_SEPARATOR = re.compile(r"\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in the text.
+    Uses the common approximation of four characters per token.
+    Args:
+        text (str): The input text.
+    Returns:
+        int: The estimated token count.
+    """
+    return len(text) // 4 + 1
+
+def _is_table(lines: List[str]) -> bool:
+    return len(lines) > 2 and all(line.lstrip().startswith("|") for line in lines[:2])
+
+def _split_block(block: str, max_tokens: int) -> List[str]:
+    """
+    Split a block that is over the token budget by lines.
+    Tables keep their header and separator rows at the top of every piece.
+    """
+    if estimate_tokens(block) <= max_tokens:
+        return [block]
+
+    lines = block.splitlines()
+    header = lines[:2] if _is_table(lines) else []
+    pieces = []
+    current: List[str] = []
+    for line in lines[len(header):]:
+        if current and estimate_tokens("\n".join(header + current + [line])) > max_tokens:
+            pieces.append("\n".join(header + current))
+            current = []
+        current.append(line)
+    if current:
+        pieces.append("\n".join(header + current))
+    return pieces
+
+def split_markdown_into_chunks(markdown: str, max_tokens: int, overlap_lines: int = 0) -> List[str]:
+    """
+    Split OCR markdown into chunks of at most roughly max_tokens tokens.
+    Args:
+        markdown (str): The markdown export of the document, with pages separated by PAGE_BREAK_PLACEHOLDER.
+        max_tokens (int): The token budget of a chunk.
+        overlap_lines (int): Number of trailing lines of each chunk repeated at the start of the next.
+    Returns:
+        List[str]: The chunks, in document order.
+    """
+    blocks = []
+    for page in markdown.split(PAGE_BREAK_PLACEHOLDER):
+        for block in BLOCK_SEPARATOR.split(page):
+            if block.strip():
+                blocks.extend(_split_block(block.strip(), max_tokens))
+
+    chunks = []
+    current: List[str] = []
+    for block in blocks:
+        if current and estimate_tokens("\n\n".join(current + [block])) > max_tokens:
+            chunks.append("\n\n".join(current))
+            current = []
+        current.append(block)
+    if current:
+        chunks.append("\n\n".join(current))
+
+    if overlap_lines <= 0:
+        return chunks
+
+    overlapped_chunks = chunks[:1]
+    for previous_chunk, chunk in zip(chunks, chunks[1:]):
+        overlap = "\n".join(previous_chunk.splitlines()[-overlap_lines:])
+        overlapped_chunks.append(f"{overlap}\n\n{chunk}")
+    return overlapped_chunks
+
+def _overlap_length(previous: list, current: list, max_length: int) -> int:
+    for length in range(min(len(previous), len(current), max_length), 0, -1):
+        if previous[-length:] == current[:length]:
+            return length
+    return 0
+
+def merge_extracted_chunks(results: List[BaseModel], response_model: Type[BaseModel], overlap_lines: int = 0) -> BaseModel:
+    """
+    Merge the data extracted from each chunk into one response model.
+    List fields are concatenated in chunk order. When chunks overlap, entries at the
+    start of a chunk that repeat the entries at the end of the previous chunk are
+    dropped, since they come from the overlap between the two chunks. At most
+    overlap_lines entries are dropped, as each entry takes at least one line, so
+    genuine repeated transactions after the overlap are kept. Other fields keep
+    their first non-null value.
+    Args:
+        results (List[BaseModel]): The data extracted from each chunk, in document order.
+        response_model (Type[BaseModel]): The model the LLM output was validated against.
+        overlap_lines (int): Number of lines shared between neighbouring chunks, 0 for none.
+    Returns:
+        BaseModel: The merged data.
+    """
+    merged: dict = {}
+    for result in results:
+        for field in response_model.model_fields:
+            value = getattr(result, field)
+            if isinstance(value, list):
+                previous = merged.get(field) or []
+                merged[field] = previous + value[_overlap_length(previous, value, overlap_lines):]
+            elif merged.get(field) is None:
+                merged[field] = value
+
+    return response_model.model_validate(merged)
+
+def extract_data_in_chunks(
+    markdown: str,
+    extract: Callable[[str], BaseModel],
+    response_model: Type[BaseModel],
+    max_tokens: int,
+    overlap_lines: int = 0,
+    max_workers: int = 4
+) -> BaseModel:
+    """
+    Extract data from a long document by extracting its chunks concurrently.
+    Args:
+        markdown (str): The markdown export of the document.
+        extract (Callable[[str], BaseModel]): Extracts data from a piece of text.
+        response_model (Type[BaseModel]): The model the LLM output is validated against.
+        max_tokens (int): The token budget of a chunk.
+        overlap_lines (int): Number of lines shared between neighbouring chunks.
+        max_workers (int): Maximum number of chunks extracted at once.
+    Returns:
+        BaseModel: The merged data.
+    """
+    chunks = split_markdown_into_chunks(markdown, max_tokens, overlap_lines)
+    if len(chunks) <= 1:
+        # Pages are separated by a blank line, as blocks are within a chunk
+        return extract(markdown.replace(PAGE_BREAK_PLACEHOLDER, "\n\n"))
+
+    print(f"Extracting data from {len(chunks)} chunks")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(extract, chunks))
+
+    return merge_extracted_chunks(results, response_model, overlap_lines)
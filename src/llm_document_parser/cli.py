@@ -1,113 +1,694 @@
+"""
+Command line entry point of the document parser.
+Every setting can be given as an argument; config.py provides the defaults, so
+several jobs with different settings can run side by side on one host.
+
+Usage:
+    llm-document-parser statements/ --export-type parquet --output-folder out/
+    llm-document-parser "scans/**/*.pdf" --ocr-model rapid --ollama-hosts http://gpu-1:11434 http://gpu-2:11434
+
+Sharded across 4 nodes sharing the output folder, then merged:
+    llm-document-parser statements/ --output-folder /shared/out --shard 0/4    (on each node, 0/4 to 3/4)
+    llm-document-parser --output-folder /shared/out --merge-shards 4
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
 from pathlib import Path
-import pandas as pd
-from docling.document_converter import DocumentConverter
-from llm_document_parser.export_data import combine_json_data_into_df, export_as_csv, convert_json_to_df, export_as_json
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+import queue
+import threading
+from llm_document_parser.export_data import STREAMING_WRITERS, ResultAccumulator, open_streaming_writer
 from llm_document_parser.config import (
     OCR_MODEL,
+    OCR_FALLBACK_MODEL,
+    OCR_FALLBACK_MIN_CONFIDENCE,
+    MODEL_DIR,
+    MODELS_OFFLINE,
     OLLAMA_MODEL,
+    OLLAMA_HOSTS,
+    OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS,
     LLM_PROMPT,
     TESSERACT_TESSDATA_LOCATION,
     INPUT_PATH,
     OUTPUT_FOLDER,
     OUTPUT_FILE_NAME,
     EXPORT_TYPE,
-    RESPONSE_MODEL
+    RESPONSE_MODEL,
+    OCR_WORKERS,
+    OCR_THREADS_PER_WORKER,
+    OCR_MAX_PENDING,
+    OCR_PAGES_PER_TASK,
+    OCR_PREPROCESS_BATCH_SIZE,
+    PDF_TEXT_LAYER_MIN_CHARS,
+    LLM_WORKERS,
+    OCR_CACHE_ENABLED,
+    OCR_CACHE_DIR,
+    OCR_CACHE_MAX_BYTES,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_ENTRIES,
+    PROMPT_COMPACTION_ENABLED,
+    LLM_CHUNKING_ENABLED,
+    LLM_CHUNK_MAX_TOKENS,
+    LLM_CHUNK_OVERLAP_LINES,
+    LLM_CHUNK_WORKERS,
+    RESUME_ENABLED,
+    COLUMNAR_STORE_ENABLED,
+    COLUMNAR_BATCH_ROWS,
+    JOB_MANIFEST_FILE_NAME,
+    METRICS_LOG_PATH,
+    PROFILER,
+    PROFILE_OUTPUT_PATH
 )
 
-from llm_document_parser.instructor_llm import extract_json_data_using_ollama_llm, pull_ollama_model
-from llm_document_parser.convert_doc_docling import (
-    load_rapid_ocr_model,
-    load_easy_ocr_model,
-    load_ocr_mac_model,
-    load_tesseract_model,
-    image_to_text
+from llm_document_parser.ocr_cache import OCRCache
+from llm_document_parser.job_manifest import JobManifest
+from llm_document_parser.instrumentation import JSONLogSink, metrics, profile
+from llm_document_parser.ocr_pool import OCRWorkerPool, convert_to_markdown
+from llm_document_parser.llm_cache import LLMCache, SQLiteLLMCache
+from llm_document_parser.ollama_endpoints import OllamaEndpointPool
+from llm_document_parser.chunking import PAGE_BREAK_PLACEHOLDER, extract_data_in_chunks
+from llm_document_parser.convert_doc_docling import load_ocr_model
+from llm_document_parser.preprocessing.prompt_compaction import compact_prompt
+from llm_document_parser.model_store import ModelStore
+from llm_document_parser.ocr_fallback import OCRFallback, escalation_stats, record_llm_escalation, unparseable_llm_errors
+from llm_document_parser.sharding import (
+    merge_shards,
+    parse_shard_spec,
+    part_export_type,
+    part_file_name,
+    record_shard_part,
+    select_shard,
+    shard_file_name,
+    shard_part_paths,
 )
 
-def load_ocr_model_from_config(model_type: str) -> DocumentConverter:
+# pydantic and docling are only imported on the code paths that use them, keeping startup fast
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+    from docling.document_converter import DocumentConverter
+
+def build_parser() -> argparse.ArgumentParser:
     """
-    Load the OCR model based on the configuration.
+    Build the command line parser, with the values in config.py as defaults.
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog="llm-document-parser", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("inputs", nargs="*", default=[INPUT_PATH],
+                        help="Files, directories or glob patterns to process (default: INPUT_PATH)")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--output-folder", default=OUTPUT_FOLDER, help="Folder the results are written to")
+    output.add_argument("--output-file-name", default=OUTPUT_FILE_NAME, help="Base name of the output file")
+    output.add_argument("--export-type", default=EXPORT_TYPE, choices=sorted(STREAMING_WRITERS), help="Output format")
+    output.add_argument("--resume", action=argparse.BooleanOptionalAction, default=RESUME_ENABLED,
+                        help="Skip files already recorded as done, with the same settings, in the job manifest of the output folder")
+    output.add_argument("--job-manifest-file-name", default=JOB_MANIFEST_FILE_NAME, help="Job manifest file in the output folder")
+    output.add_argument("--columnar-store", action=argparse.BooleanOptionalAction, default=COLUMNAR_STORE_ENABLED,
+                        help="Keep rows in typed Arrow columns built from the response model (requires pyarrow)")
+    output.add_argument("--columnar-batch-rows", type=int, default=COLUMNAR_BATCH_ROWS,
+                        help="Rows packed into one Arrow record batch, and written as one Parquet row group, at a time")
+
+    sharding = parser.add_argument_group("sharding")
+    sharding.add_argument("--shard", metavar="i/N",
+                          help="Only process the files of shard i of N (0 to N - 1), chosen by content hash, into a part file")
+    sharding.add_argument("--merge-shards", type=int, metavar="N",
+                          help="Merge the part files of N finished shards in the output folder instead of processing inputs")
+
+    ocr = parser.add_argument_group("OCR")
+    ocr.add_argument("--ocr-model", default=OCR_MODEL, help="OCR engine: rapid, rapid-mobile, easy, ocrmac or tesseract")
+    ocr.add_argument("--ocr-fallback-model", default=OCR_FALLBACK_MODEL, help="OCR engine for low-confidence pages (tiered OCR)")
+    ocr.add_argument("--ocr-fallback-min-confidence", type=float, default=OCR_FALLBACK_MIN_CONFIDENCE,
+                     help="Pages with a lower OCR confidence are escalated to the fallback engine")
+    ocr.add_argument("--tessdata", default=TESSERACT_TESSDATA_LOCATION, help="Tesseract data directory")
+    ocr.add_argument("--ocr-preprocess-batch-size", type=int, default=OCR_PREPROCESS_BATCH_SIZE,
+                     help="Preprocess pages in memory and convert them in batches of this many pages (0 to disable)")
+    ocr.add_argument("--pdf-text-layer-min-chars", type=int, default=PDF_TEXT_LAYER_MIN_CHARS,
+                     help="Read PDF pages with at least this many text layer characters without OCR (0 to always OCR)")
+    ocr.add_argument("--model-dir", default=MODEL_DIR, help="Local model directory")
+    ocr.add_argument("--models-offline", action=argparse.BooleanOptionalAction, default=MODELS_OFFLINE,
+                     help="Never download models missing from the model directory")
+
+    llm = parser.add_argument_group("LLM")
+    llm.add_argument("--ollama-model", default=OLLAMA_MODEL, help="Ollama model to extract the data with")
+    llm.add_argument("--ollama-hosts", nargs="+", default=OLLAMA_HOSTS, help="Ollama servers to spread requests across")
+    llm.add_argument("--ollama-health-check-interval", type=float, default=OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS,
+                     help="Seconds between Ollama health checks")
+    llm.add_argument("--prompt-compaction", action=argparse.BooleanOptionalAction, default=PROMPT_COMPACTION_ENABLED,
+                     help="Drop non-transaction lines from the OCR text before it is sent to the LLM")
+    llm.add_argument("--chunking", action=argparse.BooleanOptionalAction, default=LLM_CHUNKING_ENABLED,
+                     help="Split long documents into chunks that are extracted concurrently")
+    llm.add_argument("--chunk-max-tokens", type=int, default=LLM_CHUNK_MAX_TOKENS, help="Token budget of each chunk")
+    llm.add_argument("--chunk-overlap-lines", type=int, default=LLM_CHUNK_OVERLAP_LINES, help="Lines repeated between chunks")
+    llm.add_argument("--chunk-workers", type=int, default=LLM_CHUNK_WORKERS, help="Concurrent chunk requests per document")
+
+    concurrency = parser.add_argument_group("concurrency")
+    concurrency.add_argument("--ocr-workers", type=int, default=OCR_WORKERS, help="OCR processes (0 for one per CPU core)")
+    concurrency.add_argument("--ocr-threads-per-worker", type=int, default=OCR_THREADS_PER_WORKER,
+                             help="Thread limit of each OCR process (0 for no limit)")
+    concurrency.add_argument("--ocr-max-pending", type=int, default=OCR_MAX_PENDING,
+                             help="OCR tasks in flight before waiting for the LLM stage (0 for twice --ocr-workers)")
+    concurrency.add_argument("--ocr-pages-per-task", type=int, default=OCR_PAGES_PER_TASK,
+                             help="Split PDFs into OCR tasks of this many pages (0 to convert whole files)")
+    concurrency.add_argument("--llm-workers", type=int, default=LLM_WORKERS, help="Concurrent LLM extraction threads")
+
+    caches = parser.add_argument_group("caches")
+    caches.add_argument("--ocr-cache", action=argparse.BooleanOptionalAction, default=OCR_CACHE_ENABLED, help="Cache OCR output on disk")
+    caches.add_argument("--ocr-cache-dir", default=OCR_CACHE_DIR, help="Directory of the OCR cache")
+    caches.add_argument("--ocr-cache-max-bytes", type=int, default=OCR_CACHE_MAX_BYTES, help="Size limit of the OCR cache")
+    caches.add_argument("--llm-cache", action=argparse.BooleanOptionalAction, default=LLM_CACHE_ENABLED, help="Cache LLM output")
+    caches.add_argument("--llm-cache-path", default=LLM_CACHE_PATH, help="SQLite file of the LLM cache")
+    caches.add_argument("--llm-cache-ttl-seconds", type=float, default=LLM_CACHE_TTL_SECONDS, help="Age after which LLM cache entries expire")
+    caches.add_argument("--llm-cache-max-entries", type=int, default=LLM_CACHE_MAX_ENTRIES, help="Size limit of the LLM cache")
+
+    instrumentation = parser.add_argument_group("instrumentation")
+    instrumentation.add_argument("--metrics-log", default=METRICS_LOG_PATH, help="JSON Lines file stage timings are appended to")
+    instrumentation.add_argument("--profiler", default=PROFILER, choices=["cprofile", "pyinstrument"],
+                                 help="Profile single-document runs")
+    instrumentation.add_argument("--profile-output", default=PROFILE_OUTPUT_PATH, help="File the profile is written to")
+    return parser
+
+def expand_inputs(inputs: List[str]) -> List[Path]:
+    """
+    Expand files, directories and glob patterns into the files to process.
+    Directories contribute the files directly inside them.
+    Args:
+        inputs (List[str]): The input arguments.
+    Returns:
+        List[Path]: The files, sorted and without duplicates.
+    """
+    paths = set()
+    for pattern in inputs:
+        if glob.has_magic(pattern):
+            matches = [Path(match) for match in glob.glob(pattern, recursive=True)]
+            if not matches:
+                print(f"Warning: {pattern} does not match any files")
+        else:
+            matches = [Path(pattern)]
+            if not matches[0].exists():
+                raise FileNotFoundError(f"Input path {pattern} does not exist")
+        for path in matches:
+            if path.is_dir():
+                paths.update(child for child in path.iterdir() if child.is_file())
+            elif path.is_file():
+                paths.add(path)
+    return sorted(paths)
+
+def load_model_store_from_args(args: argparse.Namespace) -> ModelStore:
+    """
+    Open the local model directory based on the arguments.
+    Returns:
+        ModelStore: The model directory and its manifest.
+    """
+    return ModelStore(args.model_dir, offline=args.models_offline)
+
+def load_ocr_model_from_args(args: argparse.Namespace, model_type: str) -> DocumentConverter:
+    """
+    Load the OCR model based on the arguments.
     Args:
+        args (argparse.Namespace): The parsed command line arguments.
         model_type (str): The type of OCR model to load.
     Returns:
         object: The loaded OCR model.
     """
-    if model_type == "rapid":
-        # TODO: REFACTOR LOAD OCR MODEL TO JUST EITHER USE SERVER MODELS OR MOBILE MODELS
-        return load_rapid_ocr_model(
-            "PP-OCRv4/ch_PP-OCRv4_det_server_infer.onnx",
-            "PP-OCRv3/ch_PP-OCRv3_rec_infer.onnx",
-            "PP-OCRv3/ch_ppocr_mobile_v2.0_cls_train.onnx"
-        )
-    if model_type == "easy":
-        return load_easy_ocr_model()
-    if model_type == "ocrmac":
-        return load_ocr_mac_model()
-    if model_type == "tesseract":
-        return load_tesseract_model(TESSERACT_TESSDATA_LOCATION)
+    return load_ocr_model(model_type, args.tessdata, load_model_store_from_args(args))
+
+def load_ocr_fallback_from_args(args: argparse.Namespace) -> Optional[OCRFallback]:
+    """
+    Create the fallback OCR engine of tiered OCR based on the arguments.
+    The model itself is only loaded once a page is escalated to it.
+    Returns:
+        Optional[OCRFallback]: The fallback OCR engine, or None if tiered OCR is disabled.
+    """
+    if args.ocr_fallback_model is None:
+        return None
+    return OCRFallback(
+        args.ocr_fallback_model,
+        args.tessdata,
+        args.ocr_fallback_min_confidence,
+        load_model_store_from_args(args)
+    )
+
+def load_ocr_pool_from_args(
+    args: argparse.Namespace,
+    model_type: str,
+    ocr_cache: Optional[OCRCache] = None,
+    ocr_fallback: Optional[OCRFallback] = None
+) -> OCRWorkerPool:
+    """
+    Start a pool of OCR worker processes based on the arguments.
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        model_type (str): The type of OCR model each worker loads.
+        ocr_cache (Optional[OCRCache]): Cache of earlier OCR results, or None to always run OCR.
+        ocr_fallback (Optional[OCRFallback]): Fallback OCR engine for low-confidence pages, or None.
+    Returns:
+        OCRWorkerPool: The OCR worker pool.
+    """
+    return OCRWorkerPool(
+        model_type,
+        args.tessdata,
+        workers=args.ocr_workers,
+        threads_per_worker=args.ocr_threads_per_worker,
+        max_pending=args.ocr_max_pending,
+        pages_per_task=args.ocr_pages_per_task,
+        ocr_cache=ocr_cache,
+        page_break_placeholder=page_break_placeholder_from_args(args),
+        metrics_log_path=args.metrics_log,
+        preprocess_batch_size=args.ocr_preprocess_batch_size,
+        text_layer_min_chars=args.pdf_text_layer_min_chars,
+        ocr_fallback=ocr_fallback,
+        model_store=load_model_store_from_args(args)
+    )
 
-    raise ValueError(f"Unknown OCR model type in config: {model_type}")
 
+def load_ocr_cache_from_args(args: argparse.Namespace) -> Optional[OCRCache]:
+    """
+    Create the OCR cache based on the arguments.
+    Returns:
+        Optional[OCRCache]: The OCR cache, or None if caching is disabled.
+    """
+    if not args.ocr_cache:
+        return None
+    return OCRCache(args.ocr_cache_dir, args.ocr_cache_max_bytes)
+
+def load_llm_cache_from_args(args: argparse.Namespace) -> Optional[LLMCache]:
+    """
+    Create the LLM result cache based on the arguments.
+    Returns:
+        Optional[LLMCache]: The LLM cache, or None if caching is disabled.
+    """
+    if not args.llm_cache:
+        return None
+    return SQLiteLLMCache(args.llm_cache_path, ttl_seconds=args.llm_cache_ttl_seconds, max_entries=args.llm_cache_max_entries)
 
-def save_results(export_type: str, output_file_name: str, df: pd.DataFrame, output_folder: str):
+def load_ollama_endpoints_from_args(args: argparse.Namespace) -> OllamaEndpointPool:
     """
-    Save the results in the specified format. 
+    Create the pool of Ollama endpoints based on the arguments.
+    Returns:
+        OllamaEndpointPool: The endpoint pool.
+    """
+    return OllamaEndpointPool(args.ollama_hosts, health_check_interval=args.ollama_health_check_interval)
+
+# Arguments that change the rows extracted from a file or the file they are written to
+RESULT_SETTINGS = (
+    "export_type",
+    "ocr_model",
+    "ocr_fallback_model",
+    "ocr_fallback_min_confidence",
+    "ocr_preprocess_batch_size",
+    "pdf_text_layer_min_chars",
+    "ollama_model",
+    "prompt_compaction",
+    "chunking",
+    "chunk_max_tokens",
+    "chunk_overlap_lines",
+)
+
+def job_settings_fingerprint(args: argparse.Namespace) -> str:
+    """
+    Fingerprint the settings a file's results depend on, so a resumed run only skips
+    files completed with the same prompt, models, response model and export type.
     Args:
-        export_type (str): The type of export (e.g., "csv").
-        output_file_name (str): The name of the output file.
-        json_data (str): The JSON data to save.
-        output_folder (str): The folder to save the output file.
-    """
-    if export_type == "csv":
-        export_as_csv(df=df, output_folder=output_folder, output_file_name=output_file_name)
-    if export_type == "json":
-        export_as_json(df=df, output_folder=output_folder, output_file_name=output_file_name)
-        #export_as_json(json_data=json_data, output_folder=output_folder, output_file_name=output_file_name)
-
-def process_file(input_path: Path, document_converter: DocumentConverter) -> str:
-    conversion_result = image_to_text(document_converter, input_path)
-    ocr_text_data = conversion_result.document.export_to_markdown()
+        args (argparse.Namespace): The parsed command line arguments.
+    Returns:
+        str: The fingerprint.
+    """
+    settings = {name: getattr(args, name) for name in RESULT_SETTINGS}
+    settings["prompt"] = LLM_PROMPT
+    settings["response_model"] = RESPONSE_MODEL.model_json_schema()
+    payload = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def load_job_manifest_from_args(args: argparse.Namespace) -> Optional[JobManifest]:
+    """
+    Open the job manifest based on the arguments.
+    Returns:
+        Optional[JobManifest]: The job manifest stored in the output folder, or None if resuming is disabled.
+    """
+    if not args.resume:
+        return None
+    job_manifest_file_name = args.job_manifest_file_name
+    if args.shard:
+        # Each shard keeps its own ledger, so nodes never write to the same SQLite file
+        job_manifest_file_name = shard_file_name(job_manifest_file_name, *parse_shard_spec(args.shard))
+    return JobManifest(str(Path(args.output_folder) / job_manifest_file_name), job_settings_fingerprint(args))
+
+def page_break_placeholder_from_args(args: argparse.Namespace) -> Optional[str]:
+    """
+    Returns:
+        Optional[str]: The page break marker written into OCR markdown, or None for no marker.
+    """
+    # Chunking splits the markdown on page breaks, so they are only marked when it is enabled
+    return PAGE_BREAK_PLACEHOLDER if args.chunking else None
+
+def ocr_file(
+    args: argparse.Namespace,
+    input_path: Path,
+    document_converter: DocumentConverter,
+    ocr_cache: Optional[OCRCache] = None,
+    ocr_fallback: Optional[OCRFallback] = None
+) -> str:
+    """
+    Run OCR on a file and return its text as markdown.
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        input_path (Path): The file to convert.
+        document_converter (DocumentConverter): The document converter to use.
+        ocr_cache (Optional[OCRCache]): Cache of earlier OCR results, or None to always run OCR.
+        ocr_fallback (Optional[OCRFallback]): Fallback OCR engine for low-confidence pages, or None.
+    Returns:
+        str: The markdown export of the converted document.
+    """
+    return convert_to_markdown(
+        document_converter,
+        input_path,
+        ocr_cache,
+        page_break_placeholder_from_args(args),
+        preprocess_batch_size=args.ocr_preprocess_batch_size,
+        text_layer_min_chars=args.pdf_text_layer_min_chars,
+        fallback=ocr_fallback
+    )
+
+def compact_prompt_from_args(args: argparse.Namespace, ocr_text_data: str, input_path: Path) -> str:
+    """
+    Compact the OCR text for the LLM if prompt compaction is enabled.
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        ocr_text_data (str): The OCR text of the file.
+        input_path (Path): The file the text was extracted from.
+    Returns:
+        str: The text to send to the LLM.
+    """
+    if not args.prompt_compaction:
+        return ocr_text_data
+    return compact_prompt(ocr_text_data, str(input_path))
+
+def extract_text_data(
+    args: argparse.Namespace,
+    ocr_text_data: str,
+    ollama_endpoints: OllamaEndpointPool,
+    llm_cache: Optional[LLMCache] = None
+) -> BaseModel:
+    """
+    Extract structured data from OCR text using the selected LLM.
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        ocr_text_data (str): The OCR text to extract data from.
+        ollama_endpoints (OllamaEndpointPool): The Ollama servers to send the request to.
+        llm_cache (Optional[LLMCache]): Cache of earlier LLM results, or None to always call the LLM.
+    Returns:
+        BaseModel: The extracted data, validated against RESPONSE_MODEL.
+    """
+    def extract(text_data: str) -> BaseModel:
+        return ollama_endpoints.extract_data(
+            prompt=LLM_PROMPT,
+            text_data=text_data,
+            ollama_model=args.ollama_model,
+            response_model=RESPONSE_MODEL,
+            cache=llm_cache
+        )
+
+    if args.chunking:
+        return extract_data_in_chunks(
+            ocr_text_data,
+            extract,
+            RESPONSE_MODEL,
+            max_tokens=args.chunk_max_tokens,
+            overlap_lines=args.chunk_overlap_lines,
+            max_workers=args.chunk_workers
+        )
+    return extract(ocr_text_data)
+
+def extract_file_data(
+    args: argparse.Namespace,
+    input_path: Path,
+    ocr_text_data: str,
+    ollama_endpoints: OllamaEndpointPool,
+    llm_cache: Optional[LLMCache] = None,
+    fallback_ocr: Optional[Callable[[Path], str]] = None
+) -> BaseModel:
+    """
+    Extract structured data from the OCR text of a file.
+    If the LLM cannot parse the text and a fallback OCR engine is available, the file is
+    converted again with it and extraction is retried once.
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        input_path (Path): The file the text was extracted from.
+        ocr_text_data (str): The OCR text of the file.
+        ollama_endpoints (OllamaEndpointPool): The Ollama servers to send the request to.
+        llm_cache (Optional[LLMCache]): Cache of earlier LLM results, or None to always call the LLM.
+        fallback_ocr (Optional[Callable[[Path], str]]): Converts a file with the fallback OCR engine, or None.
+    Returns:
+        BaseModel: The extracted data, validated against RESPONSE_MODEL.
+    """
+    try:
+        return extract_text_data(args, compact_prompt_from_args(args, ocr_text_data, input_path), ollama_endpoints, llm_cache)
+    except unparseable_llm_errors() as e:
+        if fallback_ocr is None:
+            raise
+        record_llm_escalation(input_path, e)
+    ocr_text_data = fallback_ocr(input_path)
+    return extract_text_data(args, compact_prompt_from_args(args, ocr_text_data, input_path), ollama_endpoints, llm_cache)
+
+def process_file(
+    args: argparse.Namespace,
+    input_path: Path,
+    document_converter: DocumentConverter,
+    ollama_endpoints: OllamaEndpointPool,
+    ocr_cache: Optional[OCRCache] = None,
+    llm_cache: Optional[LLMCache] = None,
+    ocr_fallback: Optional[OCRFallback] = None
+) -> BaseModel:
+    ocr_text_data = ocr_file(args, input_path, document_converter, ocr_cache, ocr_fallback)
     print(f"Extracted OCR text from file {input_path}:")
     print(ocr_text_data)
 
-    json_data = extract_json_data_using_ollama_llm(
-        prompt=LLM_PROMPT,
-        text_data=ocr_text_data,
-        ollama_model=OLLAMA_MODEL,
-        response_model=RESPONSE_MODEL
-    )
+    fallback_ocr = None
+    if ocr_fallback is not None:
+        def fallback_ocr(path: Path) -> str:
+            return ocr_file(args, path, ocr_fallback.document_converter, ocr_cache)
+    result = extract_file_data(args, input_path, ocr_text_data, ollama_endpoints, llm_cache, fallback_ocr)
 
-    print(json_data)
-    return json_data
+    # The JSON string is only built for display; exporters take the rows of the model
+    print(result.model_dump_json(indent=4))
+    return result
 
 
-if __name__ == "__main__":
-    document_converter = load_ocr_model_from_config(OCR_MODEL)
-    pull_ollama_model(OLLAMA_MODEL)
-
-    df = pd.DataFrame()
-    if Path(INPUT_PATH).is_dir():
-        json_data_objects = list()
-        for file in Path(INPUT_PATH).iterdir():
-            json_data = process_file(file, document_converter)
-            json_data_objects.append(json_data)
-            df = combine_json_data_into_df(json_data_objects)
-    else:
-        json_data = process_file(Path(INPUT_PATH), document_converter)
-        df = convert_json_to_df(json_data)
-
-#    conversion_result = image_to_text(document_converter, Path(INPUT_PATH))
-#
-#    ocr_text_data = conversion_result.document.export_to_text()
-#    print("Extracted OCR text:")
-#    print(ocr_text_data)
-#
-#    json_data = extract_json_data_using_ollama_llm(
-#        prompt=LLM_PROMPT,
-#        text_data=ocr_text_data,
-#        ollama_model=OLLAMA_MODEL,
-#        response_model=RESPONSE_MODEL
-#    )
-#
-#    print(json_data)
-    save_results(export_type=EXPORT_TYPE,output_file_name=OUTPUT_FILE_NAME, df=df, output_folder=OUTPUT_FOLDER)
+def process_files_pipelined(
+    args: argparse.Namespace,
+    input_paths: List[Path],
+    ocr_pool: OCRWorkerPool,
+    ollama_endpoints: OllamaEndpointPool,
+    on_result: Callable[[int, Path, BaseModel], None],
+    on_error: Optional[Callable[[int, Path, Exception], None]] = None,
+    llm_cache: Optional[LLMCache] = None
+):
+    """
+    Process multiple files with the OCR and LLM stages running concurrently.
+    OCR runs in a pool of worker processes, each holding its own document converter.
+    OCR output is passed through a bounded queue to a pool of LLM threads, so OCR on
+    one file overlaps with LLM extraction on another.
+    Args:
+        args (argparse.Namespace): The parsed command line arguments, including the LLM worker count.
+        input_paths (List[Path]): The files to process.
+        ocr_pool (OCRWorkerPool): The OCR worker processes.
+        ollama_endpoints (OllamaEndpointPool): The Ollama servers LLM requests are spread across.
+        on_result (Callable[[int, Path, BaseModel], None]): Called with the index, path and extracted data
+            of each file as soon as it is done. Calls are serialized, in completion order.
+        on_error (Optional[Callable[[int, Path, Exception], None]]): Called with the index, path and error
+            of each file that fails, including files whose on_result call raised, after which processing
+            continues. If None, or if on_error itself raises, the first error is raised once all files are done.
+        llm_cache (Optional[LLMCache]): Cache of earlier LLM results, or None to always call the LLM.
+    """
+    llm_workers = max(1, args.llm_workers)
+    text_queue: queue.Queue = queue.Queue(maxsize=llm_workers * 2)
+    result_lock = threading.Lock()
+    errors: list[Exception] = []
+
+    # Files the LLM cannot parse are converted again by a worker process with the fallback OCR engine
+    fallback_ocr = ocr_pool.convert_with_fallback if ocr_pool.ocr_fallback is not None else None
+
+    def llm_worker():
+        while True:
+            item = text_queue.get()
+            if item is None:
+                return
+            index, input_path, ocr_text_data = item
+            try:
+                result = extract_file_data(args, input_path, ocr_text_data, ollama_endpoints, llm_cache, fallback_ocr)
+            except Exception as e:
+                print(f"LLM extraction failed for file {input_path}: {e}")
+                report_error(index, input_path, e)
+                continue
+            print(f"Extracted data from file {input_path}")
+            try:
+                with result_lock:
+                    on_result(index, input_path, result)
+            except Exception as e:
+                # An LLM thread that died here would leave the OCR stage blocked on a full queue
+                print(f"Saving the result of file {input_path} failed: {e}")
+                report_error(index, input_path, e)
+
+    def report_error(index: int, input_path: Path, error: Exception):
+        with result_lock:
+            if on_error is not None:
+                try:
+                    on_error(index, input_path, error)
+                    return
+                except Exception as e:
+                    print(f"Recording the failure of file {input_path} failed: {e}")
+                    error = e
+            errors.append(error)
+
+    llm_threads = [threading.Thread(target=llm_worker, daemon=True) for _ in range(llm_workers)]
+    for thread in llm_threads:
+        thread.start()
+
+    try:
+        for index, input_path, ocr_text_data in ocr_pool.imap_unordered(input_paths, return_exceptions=on_error is not None):
+            if isinstance(ocr_text_data, Exception):
+                print(f"OCR failed for file {input_path}: {ocr_text_data}")
+                report_error(index, input_path, ocr_text_data)
+                continue
+            print(f"Extracted OCR text from file {input_path}")
+            # Blocks while the LLM stage is saturated, which stops new OCR tasks being submitted
+            text_queue.put((index, input_path, ocr_text_data))
+    finally:
+        for _ in llm_threads:
+            text_queue.put(None)
+        for thread in llm_threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Run the parser on the files given on the command line.
+    Args:
+        argv (Optional[List[str]]): The command line arguments, or None to read sys.argv.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
 
+    if args.merge_shards:
+        merged_path = merge_shards(
+            args.output_folder, args.output_file_name, args.export_type, args.merge_shards, response_model=RESPONSE_MODEL
+        )
+        print(f"Merged {args.merge_shards} shards into {merged_path}")
+        return
+
+    export_type, output_file_name = args.export_type, args.output_file_name
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard_spec(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        export_type, output_file_name = part_export_type(export_type), part_file_name(output_file_name, *shard)
+
+    if args.metrics_log:
+        metrics.add_sink(JSONLogSink(args.metrics_log))
+
+    ollama_endpoints = load_ollama_endpoints_from_args(args)
+    ollama_endpoints.start_health_checks()
+    ollama_endpoints.pull_model(args.ollama_model, load_model_store_from_args(args))
+    ocr_cache = load_ocr_cache_from_args(args)
+    llm_cache = load_llm_cache_from_args(args)
+    ocr_fallback = load_ocr_fallback_from_args(args)
+
+    job_manifest = load_job_manifest_from_args(args)
+    input_paths = expand_inputs(args.inputs)
+    complete_outputs = None
+    if shard is not None:
+        input_paths = select_shard(input_paths, *shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(input_paths)} files")
+        # Only the parts in the shard manifest are merged, so files written to a part
+        # a crashed run never recorded are processed again
+        complete_outputs = shard_part_paths(args.output_folder, args.output_file_name, *shard)
+    shard_files = len(input_paths)
+    if job_manifest is not None:
+        input_paths = job_manifest.pending_files(input_paths, complete_outputs)
+
+    # Text formats are written as each file finishes, so a crash keeps everything already extracted.
+    # A Parquet file is only readable once closed, so its rows are collected into full batches first
+    failed_paths: List[Path] = []
+    accumulator = ResultAccumulator(RESPONSE_MODEL if args.columnar_store else None, args.columnar_batch_rows)
+    drain_rows = args.columnar_batch_rows if export_type == "parquet" else 1
+    # Files whose rows are in the accumulator, only marked done once their rows are written
+    unwritten_files: List[Tuple[Path, int]] = []
+    with open_streaming_writer(export_type, args.output_folder, output_file_name, RESPONSE_MODEL, args.columnar_batch_rows) as writer:
+        def write_rows():
+            row_offset = writer.rows_written
+            writer.write(accumulator.drain())
+            for input_path, row_count in unwritten_files:
+                if job_manifest is not None:
+                    job_manifest.mark_done(input_path, writer.path, row_offset, row_count)
+                row_offset += row_count
+            unwritten_files.clear()
+
+        def write_result(index: int, input_path: Path, result: BaseModel):
+            unwritten_files.append((input_path, len(accumulator.add_result(result))))
+            if accumulator.rows >= drain_rows:
+                write_rows()
+
+        def record_error(index: int, input_path: Path, error: Exception):
+            failed_paths.append(input_path)
+            job_manifest.mark_failed(input_path, error)
+
+        try:
+            if len(input_paths) > 1:
+                with load_ocr_pool_from_args(args, args.ocr_model, ocr_cache, ocr_fallback) as ocr_pool:
+                    process_files_pipelined(
+                        args,
+                        input_paths,
+                        ocr_pool,
+                        ollama_endpoints,
+                        on_result=write_result,
+                        on_error=record_error if job_manifest is not None else None,
+                        llm_cache=llm_cache
+                    )
+            elif input_paths:
+                document_converter = load_ocr_model_from_args(args, args.ocr_model)
+                try:
+                    with profile(args.profile_output, args.profiler) if args.profiler else nullcontext():
+                        result = process_file(
+                            args, input_paths[0], document_converter, ollama_endpoints, ocr_cache, llm_cache, ocr_fallback
+                        )
+                except Exception as e:
+                    if job_manifest is not None:
+                        record_error(0, input_paths[0], e)
+                    raise
+                write_result(0, input_paths[0], result)
+        finally:
+            # Rows of files that finished before an error are still written
+            write_rows()
+
+    if shard is not None:
+        record_shard_part(
+            args.output_folder, args.output_file_name, *shard, args.export_type,
+            writer.path, writer.rows_written, shard_files, input_paths, failed_paths, resume=job_manifest is not None
+        )
+    if job_manifest is not None:
+        print(f"Job manifest: {job_manifest.counts()}")
+    ollama_endpoints.stop_health_checks()
+    if llm_cache is not None:
+        print(f"LLM cache: {llm_cache.stats()}")
+    if ocr_fallback is not None:
+        print(f"OCR escalation: {escalation_stats()}")
+    print(f"Timings: {metrics.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# columnar_store.py
+"""
+This module keeps extracted rows in a compact, typed columnar form.
+The Arrow schema is built from the response model: the model of its rows field
+(e.g. BankStatementEntry for BankStatement) gives one column per field, with
+dates stored as date32, numbers as float64 or int64, and strings dictionary
+encoded, since descriptions and transaction types repeat across a batch.
+Fields that also allow strings, e.g. dates the LLM may write in any format, are
+stored as strings, so no extracted value is lost.
+Rows are buffered in Python lists and packed into Arrow record batches every
+batch_rows rows, so a large batch holds a fraction of the memory of a DataFrame
+of Python objects. The exporters receive Arrow backed DataFrames.
+Requires pyarrow.
+"""
+
+# imports
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+from types import UnionType
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Literal, Optional, Tuple, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+# pyarrow and pandas are imported when a store is created, so importing this module stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+
+def _union_args(annotation: Any) -> Tuple[Any, ...]:
+    # Optional[X], X | None and other unions, without NoneType
+    if get_origin(annotation) in (Union, UnionType):
+        return tuple(arg for arg in get_args(annotation) if arg is not type(None))
+    return (annotation,)
+
+def _is_list_annotation(annotation: Any) -> bool:
+    return any(get_origin(arg) is list for arg in _union_args(annotation))
+
+@lru_cache(maxsize=None)
+def rows_field(response_model: Type[BaseModel]) -> Optional[str]:
+    """
+    Get the field of a response model that holds its rows, e.g. "transactions" for BankStatement.
+    The field is taken from the model's declared fields rather than the values of a result,
+    so a result whose list is empty or null still has no rows.
+    Args:
+        response_model (Type[BaseModel]): The model the LLM output is validated against.
+    Returns:
+        Optional[str]: The name of the first field declared as a list, or None if there is none.
+    """
+    for name, field_info in response_model.model_fields.items():
+        if _is_list_annotation(field_info.annotation):
+            return name
+    return None
+
+def row_model(response_model: Type[BaseModel]) -> Optional[Type[BaseModel]]:
+    """
+    Get the model of one row of a response model, e.g. BankStatementEntry for BankStatement.
+    Args:
+        response_model (Type[BaseModel]): The model the LLM output is validated against.
+    Returns:
+        Optional[Type[BaseModel]]: The item model of the rows field, the response model itself
+            if it has no rows field, or None if the rows are not models.
+    """
+    field = rows_field(response_model)
+    if field is None:
+        return response_model
+    for arg in _union_args(response_model.model_fields[field].annotation):
+        if get_origin(arg) is list:
+            item = get_args(arg)[0] if get_args(arg) else None
+            if isinstance(item, type) and issubclass(item, BaseModel):
+                return item
+    return None
+
+def _is_string_annotation(annotation: Any) -> bool:
+    if annotation is str or get_origin(annotation) is Literal:
+        return True
+    return isinstance(annotation, type) and issubclass(annotation, Enum)
+
+def _parse_date(value: Any) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+def _parse_datetime(value: Any) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+def _to_string(value: Any) -> str:
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value if isinstance(value, str) else json.dumps(value)
+
+def _column_type(annotation: Any) -> Tuple[pa.DataType, Callable[[Any], Any]]:
+    """
+    Pick the Arrow type of a field and the function that converts its row values.
+    A field is only given a typed column if every value it allows fits that type. A union
+    that includes a string, e.g. `date | None | str` for dates the LLM did not write as
+    ISO dates, is stored as strings, so no extracted value is lost.
+    """
+    import pyarrow as pa
+
+    args = _union_args(annotation)
+    if any(_is_string_annotation(arg) for arg in args):
+        # Numbers or dates allowed next to strings are kept as their text
+        return pa.dictionary(pa.int32(), pa.string()), _to_string
+
+    # bool is checked before int and float, since it is a subclass of int
+    column_types = [
+        (bool, pa.bool_(), bool),
+        (datetime, pa.timestamp("us"), _parse_datetime),
+        (date, pa.date32(), _parse_date),
+        (int, pa.int64(), int),
+        (float, pa.float64(), float),
+    ]
+    matches = [
+        next((column for column in column_types if isinstance(arg, type) and issubclass(arg, column[0])), None)
+        for arg in args
+    ]
+    if None not in matches:
+        python_types = {python_type for python_type, _, _ in matches}
+        if len(python_types) == 1:
+            return matches[0][1:]
+        if python_types == {int, float}:
+            return pa.float64(), float
+    # Nested models, lists, other values and unions of different types are kept as JSON text
+    return pa.string(), _to_string
+
+@lru_cache(maxsize=None)
+def _columns(response_model: Type[BaseModel]) -> Tuple[Tuple[str, pa.DataType, Callable[[Any], Any]], ...]:
+    model = row_model(response_model)
+    if model is None:
+        raise ValueError(f"The rows of {response_model.__name__} are not models, so they have no schema")
+    return tuple((name, *_column_type(field_info.annotation)) for name, field_info in model.model_fields.items())
+
+def arrow_schema(response_model: Type[BaseModel]) -> pa.Schema:
+    """
+    Build the Arrow schema of the rows of a response model.
+    Args:
+        response_model (Type[BaseModel]): The model the LLM output is validated against.
+    Returns:
+        pa.Schema: One column per field of the row model, in declaration order.
+    """
+    import pyarrow as pa
+
+    return pa.schema([(name, arrow_type) for name, arrow_type, _ in _columns(response_model)])
+
+
+class ColumnarStore:
+    """
+    Typed, Arrow backed storage for the rows of many extraction results.
+    """
+
+    def __init__(self, response_model: Type[BaseModel], batch_rows: int = 10000):
+        """
+        Args:
+            response_model (Type[BaseModel]): The model the LLM output is validated against.
+            batch_rows (int): Number of rows buffered as Python objects before they are packed into a record batch.
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError("The columnar store requires pyarrow. Install it with `pip install pyarrow`.") from e
+        self._pa = pyarrow
+        self.schema = arrow_schema(response_model)
+        self.batch_rows = max(1, batch_rows)
+        self._converters = {name: convert for name, _, convert in _columns(response_model)}
+        self._pending: Dict[str, List[Any]] = {name: [] for name in self.schema.names}
+        self._pending_rows = 0
+        self._batches: List[pa.RecordBatch] = []
+        self.rows = 0
+
+    def append(self, rows: List[Dict[str, Any]]):
+        """
+        Add rows. Keys that are not fields of the row model are ignored.
+        Args:
+            rows (List[Dict[str, Any]]): The rows, as dictionaries keyed by column.
+        Raises:
+            ValueError: If a value does not match the type of its column. None of the rows are added then.
+        """
+        # Converted before any row is added, so a bad value never leaves the store half updated
+        converted = [{name: self._convert(name, row.get(name)) for name in self._pending} for row in rows]
+        for row in converted:
+            for name, values in self._pending.items():
+                values.append(row[name])
+        self._pending_rows += len(rows)
+        self.rows += len(rows)
+        if self._pending_rows >= self.batch_rows:
+            self._flush()
+
+    def _convert(self, name: str, value: Any) -> Any:
+        if value is None:
+            return None
+        try:
+            return self._converters[name](value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Value {value!r} of column {name} does not match its type {self.schema.field(name).type}") from e
+
+    def _flush(self):
+        if not self._pending_rows:
+            return
+        arrays = [
+            self._pa.array(self._pending[field.name], type=field.type)
+            for field in self.schema
+        ]
+        self._batches.append(self._pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._pending = {name: [] for name in self.schema.names}
+        self._pending_rows = 0
+
+    def to_table(self) -> pa.Table:
+        """
+        Get every row added so far as an Arrow table.
+        """
+        self._flush()
+        return self._pa.Table.from_batches(self._batches, schema=self.schema).unify_dictionaries()
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Get every row added so far as a DataFrame backed by the Arrow columns.
+        """
+        import pandas as pd
+
+        return self.to_table().to_pandas(types_mapper=pd.ArrowDtype)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes held by the packed record batches.
+        """
+        return sum(batch.nbytes for batch in self._batches)
+
+    def clear(self):
+        """
+        Release every row added so far.
+        """
+        self._pending = {name: [] for name in self.schema.names}
+        self._pending_rows = 0
+        self._batches = []
+        self.rows = 0
@@ -3,9 +3,22 @@ from pydantic import BaseModel
 from datetime import date
 from typing import List
 
-# Options: "rapid", "easy", "ocrmac", "tesseract"
+# Options: "rapid", "rapid-mobile", "easy", "ocrmac", "tesseract"
 OCR_MODEL = "easy"
 
+# Local directory of OCR, layout and LLM models with a manifest of its contents,
+# filled once by `python -m llm_document_parser.model_store prefetch`
+MODEL_DIR = "models"
+# Only use models already in MODEL_DIR and never download them, e.g. in air-gapped containers
+MODELS_OFFLINE = False
+
+# Tiered OCR: pages OCR_MODEL reads with a confidence score (0 to 1) below
+# OCR_FALLBACK_MIN_CONFIDENCE, and documents the LLM cannot parse, are converted
+# again with the slower, more accurate OCR_FALLBACK_MODEL (None to disable)
+# e.g. OCR_MODEL = "rapid-mobile" with OCR_FALLBACK_MODEL = "easy"
+OCR_FALLBACK_MODEL = None
+OCR_FALLBACK_MIN_CONFIDENCE = 0.5
+
 # Must be set when using the tesseract OCR model
 # Linux: "/usr/share/tesseract-ocr/4.00/tessdata"
 # Windows: "C:\\Program Files\\Tesseract-OCR\\tessdata"
@@ -14,6 +27,18 @@ TESSERACT_TESSDATA_LOCATION = "/usr/share/tesseract-ocr/4.00/tessdata"
 
 OLLAMA_MODEL = "llama3:instruct"
 
+# OpenAI compatible API of the Ollama server
+OLLAMA_BASE_URL = "http://localhost:11434/v1"
+
+# Ollama servers that batch LLM requests are load balanced across
+OLLAMA_HOSTS = ["http://localhost:11434"]
+OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS = 30
+
+# HTTP connection pool shared by all LLM requests to one base URL
+LLM_CONNECTION_POOL_SIZE = 8
+LLM_TIMEOUT_SECONDS = 600
+LLM_CONNECT_TIMEOUT_SECONDS = 10
+
 LLM_PROMPT = """
         Extract all transactions from the following statement. Each transaction must be returned as a JSON object with the fields: transaction_date (YYYY-MM-DD), description, amount, and transaction_type ('deposit' or 'withdrawal'). All of these must be returned as a list of JSON objects under a key called 'transactions'. Here is an example:
         [
@@ -26,7 +51,7 @@ LLM_PROMPT = """
         ]
 """
 
-# Options: "csv", "json", "excel"
+# Options: "csv", "json", "jsonl", "parquet" (parquet requires pyarrow)
 EXPORT_TYPE = "json"
 
 # Can be a file or directory
@@ -34,6 +59,78 @@ INPUT_PATH = "/home/david/Projects/school/capstone/llm-document-parser/src/llm_d
 OUTPUT_FOLDER = "/home/david/Desktop/"
 OUTPUT_FILE_NAME = "output"
 
+# Keep extracted rows in typed Arrow columns built from RESPONSE_MODEL (dates as date32,
+# strings dictionary encoded, fields that allow strings as strings) instead of Python objects.
+# Requires pyarrow, falls back without it
+COLUMNAR_STORE_ENABLED = True
+# Rows packed into one Arrow record batch at a time. Parquet output is collected into
+# batches of this many rows and written as one row group each
+COLUMNAR_BATCH_ROWS = 10000
+
+# Record finished files in a manifest in OUTPUT_FOLDER so a re-run skips them
+# and only processes failed, changed or new files, or files last processed with
+# other settings. Each run writes its rows to a new output file, and the manifest
+# records which file holds the rows of each input
+RESUME_ENABLED = False
+JOB_MANIFEST_FILE_NAME = "job_manifest.sqlite3"
+
+# Batch mode concurrency (used when INPUT_PATH is a directory)
+# OCR runs in a process pool, LLM extraction in a thread pool
+# OCR_WORKERS = 0 starts one OCR process per CPU core
+OCR_WORKERS = 2
+LLM_WORKERS = 4
+
+# Thread limit for each OCR process (0 for no limit)
+OCR_THREADS_PER_WORKER = 1
+# Maximum OCR tasks in flight before waiting for the LLM stage (0 for twice OCR_WORKERS)
+OCR_MAX_PENDING = 0
+# Split PDFs into tasks of this many pages spread across OCR processes (0 to convert whole files)
+OCR_PAGES_PER_TASK = 0
+# Preprocess pages in memory (grayscale, upscale, blur, threshold) before OCR and
+# send them to docling in batches of this many pages (0 to send files to docling unchanged)
+OCR_PREPROCESS_BATCH_SIZE = 0
+# PDF pages whose embedded text layer has at least this many readable characters
+# are read directly instead of being rasterized and OCR'd (0 to always run OCR)
+PDF_TEXT_LAYER_MIN_CHARS = 20
+
+# Drop headers, footers, boilerplate and non-transaction lines and table rows
+# from the OCR text before it is sent to the LLM, to cut prompt tokens
+PROMPT_COMPACTION_ENABLED = False
+
+# Split long documents into token-budgeted chunks that are extracted concurrently
+# and merged back into one RESPONSE_MODEL. Each LLM worker runs up to LLM_CHUNK_WORKERS requests
+LLM_CHUNKING_ENABLED = False
+LLM_CHUNK_MAX_TOKENS = 2000
+LLM_CHUNK_OVERLAP_LINES = 2
+LLM_CHUNK_WORKERS = 4
+
+# On-disk cache of OCR output, keyed on file contents and OCR settings
+# Re-runs that only change the prompt or response model skip OCR entirely
+OCR_CACHE_ENABLED = True
+OCR_CACHE_DIR = ".cache/ocr"
+OCR_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# SQLite cache of validated LLM output, keyed on prompt, OCR text, model and response model schema
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = ".cache/llm_cache.sqlite3"
+LLM_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+LLM_CACHE_MAX_ENTRIES = 100000
+
+# Gradio app: uploads are queued as jobs and their files are processed by
+# JOB_WORKERS threads shared by all users. Uploads are rejected while more than
+# JOB_MAX_QUEUE_DEPTH files are waiting (0 for no limit)
+JOB_WORKERS = 2
+JOB_MAX_QUEUE_DEPTH = 200
+
+# Instrumentation
+# JSON Lines file that every stage timing is appended to (None to disable)
+METRICS_LOG_PATH = None
+# Port of the Prometheus text endpoint (/metrics) started by the Gradio app (None to disable)
+METRICS_PORT = None
+# Profile single-document CLI runs with "cprofile" or "pyinstrument" (None to disable)
+PROFILER = None
+PROFILE_OUTPUT_PATH = "profile.out"
+
 # Define Pydantic response models for instructor:
 
 class BankStatementEntry(BaseModel):
@@ -1,29 +1,85 @@
+# convert_doc_docling.py
+"""
+This module loads docling OCR models and converts documents with them.
+docling, pypdfium2 and PIL are imported inside the functions that use them,
+since docling pulls in torch and takes seconds to import.
+"""
+
+# imports
+from __future__ import annotations
+
 import os
+import weakref
+from io import BytesIO
 from pathlib import Path
-from docling.datamodel.document import ConversionResult
-from huggingface_hub import snapshot_download
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Tuple
+
+from llm_document_parser.model_store import RAPID_OCR_MODEL_FILES, ModelStore
 
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import EasyOcrOptions, OcrMacOptions, PdfPipeline, PdfPipelineOptions, PipelineOptions, RapidOcrOptions, TesseractOcrOptions
-from docling.document_converter import DocumentConverter, ImageFormatOption, PdfFormatOption
-from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend, PyPdfiumPageBackend
-from docling.pipeline.standard_pdf_pipeline import StandardPdfPipeline
-from docling.pipeline.simple_pipeline import SimplePipeline
+if TYPE_CHECKING:
+    import numpy
+    from docling.datamodel.document import ConversionResult
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import DocumentConverter
+    from docling_core.types.io import DocumentStream
+
+
+def _pdf_and_image_converter(pipeline_options: PdfPipelineOptions) -> DocumentConverter:
+    """
+    Build a converter that reads PDFs and images with the same pipeline options.
+    Preprocessed pages reach docling as an in-memory PDF, and the text layer converter
+    is copied from the PDF options, so both formats need the OCR engine and artifacts_path.
+    Args:
+        pipeline_options (PdfPipelineOptions): The OCR engine and model settings.
+    Returns:
+        DocumentConverter: The document converter.
+    """
+    from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+    from docling.pipeline.standard_pdf_pipeline import StandardPdfPipeline
 
+    format_option = PdfFormatOption(
+        pipeline_cls=StandardPdfPipeline, backend=PyPdfiumDocumentBackend, pipeline_options=pipeline_options
+    )
+    return DocumentConverter(
+        allowed_formats=[
+            InputFormat.PDF,
+            InputFormat.IMAGE
+        ],
+        format_options={
+            InputFormat.PDF: format_option,
+            InputFormat.IMAGE: format_option
+        }
+    )
 
 # TODO: REFACTOR LOAD OCR MODEL TO JUST EITHER USE SERVER MODELS OR MOBILE MODELS
-def load_rapid_ocr_model(det_model: str, rec_model: str, cls_model: str) -> DocumentConverter:
+def load_rapid_ocr_model(
+    det_model: str,
+    rec_model: str,
+    cls_model: str,
+    download_path: Optional[str] = None,
+    artifacts_path: Optional[str] = None
+) -> DocumentConverter:
     """
     Load the RapidOCR model from Hugging Face Hub.
     Args:
         det_model (str): Path to the detection model.
         rec_model (str): Path to the recognition model.
         cls_model (str): Path to the classification model.
+        download_path (Optional[str]): Local directory the model paths are relative to,
+            or None to download the models from Hugging Face Hub.
+        artifacts_path (Optional[str]): Directory of docling's layout and table models,
+            or None to let docling download them.
     Returns:
         DocumentConverter: The loaded RapidOCR model.
     """
-    print("Downloading RapidOCR models")
-    download_path = snapshot_download(repo_id="SWHL/RapidOCR")
+    from docling.datamodel.pipeline_options import PdfPipelineOptions, RapidOcrOptions
+    from huggingface_hub import snapshot_download
+
+    if download_path is None:
+        print("Downloading RapidOCR models")
+        download_path = snapshot_download(repo_id="SWHL/RapidOCR")
 
     det_model_path = os.path.join(
         download_path, det_model
@@ -42,119 +98,252 @@ def load_rapid_ocr_model(det_model: str, rec_model: str, cls_model: str) -> Docu
     )
 
     pipeline_options = PdfPipelineOptions(
-        ocr_options=ocr_options
+        ocr_options=ocr_options,
+        artifacts_path=artifacts_path
     )
 
-    doc_converter = DocumentConverter(
-        format_options={
-            InputFormat.IMAGE: ImageFormatOption(
-                pipeline_options=pipeline_options
-            )
-        }
-    )
+    doc_converter = _pdf_and_image_converter(pipeline_options)
 
     return doc_converter
 
-def load_ocr_mac_model() -> DocumentConverter:
+def load_ocr_mac_model(artifacts_path: Optional[str] = None) -> DocumentConverter:
     """
     Load the OCR Mac model.
+    Args:
+        artifacts_path (Optional[str]): Directory of docling's layout and table models,
+            or None to let docling download them.
     Returns:
         DocumentConverter: The loaded OCR Mac model.
     """
+    from docling.datamodel.pipeline_options import OcrMacOptions, PdfPipelineOptions
+
     ocr_options = OcrMacOptions(
         framework='vision'
     )
 
     pipeline_options = PdfPipelineOptions(
-        ocr_options=ocr_options
+        ocr_options=ocr_options,
+        artifacts_path=artifacts_path
     )
 
-    doc_converter = DocumentConverter(
-        allowed_formats=[
-            InputFormat.PDF,
-            InputFormat.IMAGE,
-        ],
-        format_options={
-            InputFormat.PDF: PdfFormatOption(
-                pipeline_cls=StandardPdfPipeline, backend=PyPdfiumDocumentBackend, pipeline_options=pipeline_options
-            ),
-            InputFormat.IMAGE: PdfFormatOption(
-                pipeline_cls=StandardPdfPipeline, backend=PyPdfiumDocumentBackend, pipeline_options=pipeline_options
-            )
-        }
-    )
+    doc_converter = _pdf_and_image_converter(pipeline_options)
     
     return doc_converter
 
-def load_tesseract_model(tessdata_path: str) -> DocumentConverter:
+def load_tesseract_model(tessdata_path: str, artifacts_path: Optional[str] = None) -> DocumentConverter:
     """
     Load the Tesseract OCR model. 
     Args:
         tessdata_path (str): Path to the Tesseract data directory.
+        artifacts_path (Optional[str]): Directory of docling's layout and table models,
+            or None to let docling download them.
     Returns:
         DocumentConverter: The loaded Tesseract OCR model.
     """
+    from docling.datamodel.pipeline_options import TesseractOcrOptions, PdfPipelineOptions
+
     os.environ["TESSDATA_PREFIX"] = tessdata_path
 
     ocr_options = TesseractOcrOptions()
 
     pipeline_options = PdfPipelineOptions(
-        ocr_options=ocr_options
+        ocr_options=ocr_options,
+        artifacts_path=artifacts_path
     )
 
-    doc_converter = DocumentConverter(
-        allowed_formats=[
-            InputFormat.PDF,
-            InputFormat.IMAGE
-        ],
-        format_options={
-            InputFormat.PDF: PdfFormatOption(
-                pipeline_cls=StandardPdfPipeline, backend=PyPdfiumDocumentBackend, pipeline_options=pipeline_options
-            ),
-            InputFormat.IMAGE: PdfFormatOption(
-                pipeline_cls=StandardPdfPipeline, backend=PyPdfiumDocumentBackend, pipeline_options=pipeline_options
-            )
-        }
-    )
+    doc_converter = _pdf_and_image_converter(pipeline_options)
 
     return doc_converter
 
-def load_easy_ocr_model() -> DocumentConverter:
+def load_easy_ocr_model(artifacts_path: Optional[str] = None, download_enabled: bool = True) -> DocumentConverter:
     """
     Load the EasyOCR model.
+    Args:
+        artifacts_path (Optional[str]): Directory of docling's layout, table and EasyOCR models,
+            or None to let docling and EasyOCR download them.
+        download_enabled (bool): Whether EasyOCR may download missing models.
     Returns:
         DocumentConverter: The loaded EasyOCR model.
     """
-    ocr_options = EasyOcrOptions()
+    from docling.datamodel.pipeline_options import EasyOcrOptions, PdfPipelineOptions
+
+    ocr_options = EasyOcrOptions(download_enabled=download_enabled)
 
     pipeline_options = PdfPipelineOptions(
-        ocr_options=ocr_options
+        ocr_options=ocr_options,
+        artifacts_path=artifacts_path
     )
 
-    doc_converter = DocumentConverter(
-        allowed_formats=[
-            InputFormat.PDF,
-            InputFormat.IMAGE
-        ],
-        format_options={
-            InputFormat.PDF: PdfFormatOption(
-                pipeline_cls=StandardPdfPipeline, backend=PyPdfiumDocumentBackend, pipeline_options=pipeline_options
-            ),
-            InputFormat.IMAGE: PdfFormatOption(
-                pipeline_cls=StandardPdfPipeline, backend=PyPdfiumDocumentBackend, pipeline_options=pipeline_options
-            )
-        }
-    )
+    doc_converter = _pdf_and_image_converter(pipeline_options)
     return doc_converter
 
-def image_to_text(document_converter: DocumentConverter, file_path: Path) -> ConversionResult:
+def load_ocr_model(model_type: str, tessdata_location: str, model_store: Optional[ModelStore] = None) -> DocumentConverter:
+    """
+    Load an OCR model by name.
+    Args:
+        model_type (str): The type of OCR model to load ("rapid", "rapid-mobile", "easy", "ocrmac" or "tesseract").
+        tessdata_location (str): Path to the Tesseract data directory, used by the tesseract model.
+        model_store (Optional[ModelStore]): Local model directory to load the models from,
+            or None to download them on demand.
+    Returns:
+        DocumentConverter: The loaded OCR model.
+    """
+    artifacts_path = model_store.docling_artifacts_path() if model_store is not None else None
+
+    if model_type in RAPID_OCR_MODEL_FILES:
+        # TODO: REFACTOR LOAD OCR MODEL TO JUST EITHER USE SERVER MODELS OR MOBILE MODELS
+        model_files = RAPID_OCR_MODEL_FILES[model_type]
+        download_path = model_store.rapid_ocr_dir(model_files) if model_store is not None else None
+        return load_rapid_ocr_model(*model_files, download_path=download_path, artifacts_path=artifacts_path)
+    if model_type == "easy":
+        return load_easy_ocr_model(artifacts_path, download_enabled=model_store is None or not model_store.offline)
+    if model_type == "ocrmac":
+        return load_ocr_mac_model(artifacts_path)
+    if model_type == "tesseract":
+        return load_tesseract_model(tessdata_location, artifacts_path)
+
+    raise ValueError(f"Unknown OCR model type in config: {model_type}")
+
+def count_pdf_pages(file_path: Path) -> int:
+    """
+    Count the pages of a PDF without converting it.
+    Args:
+        file_path (Path): Path to the PDF file.
+    Returns:
+        int: The number of pages.
+    """
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def image_to_text(document_converter: DocumentConverter, file_path: Path, page_range: Optional[Tuple[int, int]] = None) -> ConversionResult:
     """
     Convert an image to text using the specified document converter.
     Args:
         document_converter (DocumentConverter): The document converter to use.
         file_path (Path): Path to the image file.
+        page_range (Optional[Tuple[int, int]]): First and last page (1-based, inclusive) to convert, or None for all pages.
     Returns:
         ConversionResult: The result of the conversion.
     """
-    conv_results = document_converter.convert(file_path)
+    if page_range is None:
+        return document_converter.convert(file_path)
+    conv_results = document_converter.convert(file_path, page_range=page_range)
     return conv_results
+
+def images_to_document_stream(images: List[numpy.ndarray], name: str) -> DocumentStream:
+    """
+    Pack page images into an in-memory PDF that docling can convert without touching disk.
+    Pages are embedded at 72 DPI, so docling sees every image pixel as one point of the page.
+    The images are stored losslessly (Flate), since JPEG artifacts around glyph edges hurt OCR.
+    Args:
+        images (List[numpy.ndarray]): The page images, grayscale or BGR.
+        name (str): Name of the document, used by docling in logs and results.
+    Returns:
+        DocumentStream: The in-memory PDF.
+    """
+    import pypdfium2
+    from docling_core.types.io import DocumentStream
+    from PIL import Image
+
+    pdf = pypdfium2.PdfDocument.new()
+    try:
+        for image in images:
+            height, width = image.shape[:2]
+            page = pdf.new_page(width, height)
+            page_image = pypdfium2.PdfImage.new(pdf)
+            page_image.set_bitmap(
+                pypdfium2.PdfBitmap.from_pil(Image.fromarray(image if image.ndim == 2 else image[:, :, 2::-1]))
+            )
+            page_image.set_matrix(pypdfium2.PdfMatrix().scale(width, height))
+            page.insert_obj(page_image)
+            page.gen_content()
+        stream = BytesIO()
+        pdf.save(stream)
+    finally:
+        pdf.close()
+    stream.seek(0)
+    return DocumentStream(name=f"{Path(name).stem}.pdf", stream=stream)
+
+def images_to_text(document_converter: DocumentConverter, images: List[numpy.ndarray], name: str) -> ConversionResult:
+    """
+    Convert page images held in memory to text using the specified document converter.
+    Args:
+        document_converter (DocumentConverter): The document converter to use.
+        images (List[numpy.ndarray]): The page images, grayscale or BGR.
+        name (str): Name of the document the pages belong to.
+    Returns:
+        ConversionResult: The result of the conversion.
+    """
+    return document_converter.convert(images_to_document_stream(images, name))
+
+
+class PageTextLayer(NamedTuple):
+    page_no: int
+    char_count: int
+    usable: bool
+
+def _usable_char_count(text: str) -> int:
+    # Characters the PDF font could not map to unicode come out as U+FFFD or control characters
+    return sum(1 for char in text if not char.isspace() and char.isprintable() and char != "\ufffd")
+
+def pdf_text_layers(file_path: Path, min_chars: int, page_range: Optional[Tuple[int, int]] = None) -> List[PageTextLayer]:
+    """
+    Check which pages of a PDF have a usable embedded text layer, without rendering them.
+    Args:
+        file_path (Path): Path to the PDF file.
+        min_chars (int): Minimum number of readable characters for a page's text layer to be used.
+        page_range (Optional[Tuple[int, int]]): First and last page (1-based, inclusive) to check, or None for all pages.
+    Returns:
+        List[PageTextLayer]: The page number, readable character count and decision for every page.
+    """
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        first_page, last_page = page_range or (1, len(pdf))
+        pages = []
+        for page_no in range(first_page, last_page + 1):
+            text_page = pdf[page_no - 1].get_textpage()
+            try:
+                char_count = _usable_char_count(text_page.get_text_range())
+            finally:
+                text_page.close()
+            pages.append(PageTextLayer(page_no, char_count, char_count >= min_chars))
+        return pages
+    finally:
+        pdf.close()
+
+# Text layer converters built from each OCR converter, so their pipelines are only initialized once
+_text_layer_converters: "weakref.WeakKeyDictionary[DocumentConverter, DocumentConverter]" = weakref.WeakKeyDictionary()
+
+def text_layer_converter(document_converter: DocumentConverter) -> DocumentConverter:
+    """
+    Get a converter with the same PDF settings as document_converter, but with OCR turned off.
+    Args:
+        document_converter (DocumentConverter): The OCR document converter.
+    Returns:
+        DocumentConverter: A converter that reads PDF pages from their text layer.
+    """
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    converter = _text_layer_converters.get(document_converter)
+    if converter is None:
+        pdf_option = document_converter.format_to_options[InputFormat.PDF]
+        converter = DocumentConverter(
+            allowed_formats=[InputFormat.PDF],
+            format_options={
+                InputFormat.PDF: PdfFormatOption(
+                    pipeline_cls=pdf_option.pipeline_cls,
+                    backend=pdf_option.backend,
+                    pipeline_options=pdf_option.pipeline_options.model_copy(update={"do_ocr": False})
+                )
+            }
+        )
+        _text_layer_converters[document_converter] = converter
+    return converter
@@ -1,7 +1,19 @@
-import pandas as pd
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
 from pathlib import Path
 import json
-from typing import List
+import os
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, Optional, TextIO, Type
+
+from llm_document_parser.columnar_store import ColumnarStore, arrow_schema, rows_field
+from llm_document_parser.instrumentation import span
+
+# pandas is imported by the functions that build DataFrames, so importing this module stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from pydantic import BaseModel
 
 
 def convert_json_to_df(json_data: str) -> pd.DataFrame:
@@ -9,6 +21,12 @@ def convert_json_to_df(json_data: str) -> pd.DataFrame:
     Convert a JSON string into a pandas DataFrame.
     Automatically extracts the first top-level list if present.
     """
+    with span("build_dataframe"):
+        return _convert_json_to_df(json_data)
+
+def _convert_json_to_df(json_data: str) -> pd.DataFrame:
+    import pandas as pd
+
     data = json.loads(json_data)
 
     # Try to extract the list of transactions if it's wrapped
@@ -24,15 +42,144 @@ def convert_json_to_df(json_data: str) -> pd.DataFrame:
     return pd.DataFrame(data)
 
 def combine_json_data_into_df(json_data_objects: List[str]) -> pd.DataFrame:
-    json_dfs = list()
+    accumulator = ResultAccumulator()
     for json_object in json_data_objects:
-        json_dfs.append(convert_json_to_df(json_object))
+        accumulator.add(json_object)
+    return accumulator.to_df()
 
-    return pd.concat(json_dfs)
+def result_rows(data: Any) -> List[Dict[str, Any]]:
+    """
+    Get the rows of a parsed extraction result.
+    The first top-level list is taken as the rows if the result wraps one, e.g. {"transactions": [...]}.
+    Args:
+        data (Any): The parsed JSON data.
+    Returns:
+        List[Dict[str, Any]]: The rows, empty if the result holds none.
+    """
+    if isinstance(data, list):
+        return data
+    for value in data.values():
+        if isinstance(value, list):
+            return value
+    # e.g. {"transactions": null} when the LLM found no transactions
+    if all(value is None for value in data.values()):
+        return []
+    return [data]
 
-def export_as_csv(df: pd.DataFrame, output_folder: str, output_file_name: str) -> str:
+def model_rows(result: BaseModel) -> List[Dict[str, Any]]:
     """
-    Save a DataFrame as a CSV file, avoiding overwriting by incrementing filenames.
+    Get the rows of a validated extraction result, without going through a JSON string.
+    Values are dumped in JSON mode, so rows hold the same values as the parsed JSON form.
+    Args:
+        result (BaseModel): The extracted data.
+    Returns:
+        List[Dict[str, Any]]: The rows, empty if the result holds none.
+    """
+    field = rows_field(type(result))
+    if field is None:
+        # A response model without a list is a single row
+        return [result.model_dump(mode="json")]
+    return result.model_dump(mode="json", include={field})[field] or []
+
+
+class ResultAccumulator:
+    """
+    Collects the rows of many extraction results as they complete.
+    Each result is parsed once and its rows are appended to one list per column,
+    so the DataFrame is only built when it is needed instead of after every document.
+    Given a response model, rows are kept in a typed ColumnarStore instead and
+    DataFrames are backed by its Arrow columns.
+    """
+
+    def __init__(self, response_model: Optional[Type[BaseModel]] = None, batch_rows: int = 10000):
+        """
+        Args:
+            response_model (Optional[Type[BaseModel]]): The model the LLM output is validated against,
+                used for the typed columnar store, or None to keep rows as Python objects.
+            batch_rows (int): Number of rows the columnar store packs into a record batch at a time.
+        """
+        self._columns: Dict[str, List[Any]] = {}
+        self._store: Optional[ColumnarStore] = None
+        if response_model is not None:
+            try:
+                self._store = ColumnarStore(response_model, batch_rows)
+            except ImportError as e:
+                print(f"{e} Keeping rows as Python objects")
+        self.rows = 0
+        self.documents = 0
+
+    def add(self, json_data: str) -> List[Dict[str, Any]]:
+        """
+        Add the rows of one extraction result.
+        Args:
+            json_data (str): The extracted data as a JSON string.
+        Returns:
+            List[Dict[str, Any]]: The rows that were added, e.g. for display.
+        """
+        rows = result_rows(json.loads(json_data))
+        self.add_rows(rows)
+        return rows
+
+    def add_result(self, result: BaseModel) -> List[Dict[str, Any]]:
+        """
+        Add the rows of one validated extraction result.
+        Args:
+            result (BaseModel): The extracted data.
+        Returns:
+            List[Dict[str, Any]]: The rows that were added, e.g. for display.
+        """
+        rows = model_rows(result)
+        self.add_rows(rows)
+        return rows
+
+    def add_rows(self, rows: List[Dict[str, Any]]):
+        """
+        Add rows that are already parsed.
+        Args:
+            rows (List[Dict[str, Any]]): The rows, as dictionaries keyed by column.
+        """
+        if self._store is not None:
+            self._store.append(rows)
+            self.rows += len(rows)
+            self.documents += 1
+            return
+        for row in rows:
+            for column in row:
+                if column not in self._columns:
+                    # A column first seen now is empty in every earlier row
+                    self._columns[column] = [None] * self.rows
+            for column, values in self._columns.items():
+                values.append(row.get(column))
+            self.rows += 1
+        self.documents += 1
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Build a DataFrame of every row added so far.
+        """
+        import pandas as pd
+
+        with span("build_dataframe"):
+            if self._store is not None:
+                return self._store.to_df()
+            return pd.DataFrame(self._columns)
+
+    def drain(self) -> pd.DataFrame:
+        """
+        Build a DataFrame of the rows added since the last drain and release them,
+        for callers that write rows out as they go.
+        """
+        df = self.to_df()
+        self._columns = {column: [] for column in self._columns}
+        if self._store is not None:
+            self._store.clear()
+        self.rows = 0
+        return df
+
+def next_output_path(output_folder: str, output_file_name: str, extension: str) -> Path:
+    """
+    Find the first unused output path, avoiding overwriting by incrementing filenames.
+    Creates the output folder if it does not exist.
     """
     output_folder_path = Path(output_folder)
     if not output_folder_path.is_dir():
@@ -41,12 +188,38 @@ def export_as_csv(df: pd.DataFrame, output_folder: str, output_file_name: str) -
 
     file_index = 0
     while True:
-        full_output_path = output_folder_path / f"{output_file_name}{file_index}.csv"
+        full_output_path = output_folder_path / f"{output_file_name}{file_index}.{extension}"
         if not full_output_path.exists():
-            break
+            return full_output_path
         file_index += 1
 
-    df.to_csv(full_output_path, index=False)
+def _with_iso_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replace Arrow date columns with ISO date strings before writing text formats.
+    to_json would otherwise write them as datetimes, e.g. "2025-01-24T00:00:00.000",
+    and to_csv formats them several times slower than strings.
+    """
+    import pandas as pd
+
+    date_columns = [
+        column for column, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.ArrowDtype) and str(dtype.pyarrow_dtype).startswith("date")
+    ]
+    if not date_columns:
+        return df
+    import pyarrow
+
+    return df.astype({column: pd.ArrowDtype(pyarrow.string()) for column in date_columns})
+
+def export_as_csv(df: pd.DataFrame, output_folder: str, output_file_name: str) -> str:
+    """
+    Save a DataFrame as a CSV file, avoiding overwriting by incrementing filenames.
+    """
+    full_output_path = next_output_path(output_folder, output_file_name, "csv")
+
+    df = _with_iso_dates(df)
+    with span("export", format="csv"):
+        df.to_csv(full_output_path, index=False)
     print(f"Saved CSV to {full_output_path}")
     return df.to_csv(path_or_buf=None, index=False)
 
@@ -55,18 +228,260 @@ def export_as_json(df: pd.DataFrame, output_folder: str, output_file_name: str)
     """
     Save raw JSON string to a file, avoiding overwriting by incrementing filenames.
     """
-    output_folder_path = Path(output_folder)
-    if not output_folder_path.is_dir():
-        print(f"Creating path {output_folder}")
-        output_folder_path.mkdir(parents=True)
-
-    file_index = 0
-    while True:
-        full_output_path = output_folder_path / f"{output_file_name}{file_index}.json"
-        if not full_output_path.exists():
-            break
-        file_index += 1
+    full_output_path = next_output_path(output_folder, output_file_name, "json")
 
-    df.to_json(full_output_path, orient='records')
+    df = _with_iso_dates(df)
+    with span("export", format="json"):
+        df.to_json(full_output_path, orient='records')
     print(f"Saved JSON to {full_output_path}")
     return df.to_json(orient='records') or ""
+
+
+class StreamingWriter(ABC):
+    """
+    Base class for writers that export each document's rows as soon as they are extracted.
+    Rows are written to disk on every call to write, so memory use stays flat and
+    everything written survives a crash later in the batch.
+    Use as a context manager so the file is finalized when the batch ends.
+    """
+    extension = ""
+
+    def __init__(
+        self,
+        output_folder: str,
+        output_file_name: str,
+        response_model: Optional[Type[BaseModel]] = None,
+        batch_rows: int = 10000
+    ):
+        """
+        Args:
+            output_folder (str): The folder the file is written to.
+            output_file_name (str): The base name of the file.
+            response_model (Optional[Type[BaseModel]]): The model the rows were extracted with, used by
+                formats with a typed schema, or None to take the types from the first batch.
+            batch_rows (int): Number of rows formats that are written in blocks, i.e. Parquet row groups,
+                buffer before writing a block.
+        """
+        self.path = next_output_path(output_folder, output_file_name, self.extension)
+        self.response_model = response_model
+        self.batch_rows = max(1, batch_rows)
+        self.rows_written = 0
+
+    def write(self, df: pd.DataFrame):
+        """
+        Write a batch of rows.
+        """
+        if df.empty:
+            return
+        with span("export", format=self.extension):
+            self._write(df)
+        self.rows_written += len(df)
+
+    def close(self):
+        """
+        Finalize and close the output file.
+        """
+        print(f"Saved {self.rows_written} rows to {self.path}")
+
+    @abstractmethod
+    def _write(self, df: pd.DataFrame):
+        """
+        Write a non-empty batch of rows to the output file.
+        """
+
+    def __enter__(self) -> "StreamingWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CSVStreamingWriter(StreamingWriter):
+    """
+    Appends rows to a CSV file, writing the header with the first batch.
+    """
+    extension = "csv"
+
+    def __init__(
+        self,
+        output_folder: str,
+        output_file_name: str,
+        response_model: Optional[Type[BaseModel]] = None,
+        batch_rows: int = 10000
+    ):
+        super().__init__(output_folder, output_file_name, response_model, batch_rows)
+        self._file: TextIO = open(self.path, "w", newline="", encoding="utf-8")
+        self._columns: Optional[List[str]] = None
+
+    def _write(self, df: pd.DataFrame):
+        df = _with_iso_dates(df)
+        if self._columns is None:
+            self._columns = list(df.columns)
+            df.to_csv(self._file, index=False)
+        else:
+            df.reindex(columns=self._columns).to_csv(self._file, index=False, header=False)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class JSONLinesStreamingWriter(StreamingWriter):
+    """
+    Appends rows to a JSON Lines file, one JSON object per row.
+    """
+    extension = "jsonl"
+
+    def __init__(
+        self,
+        output_folder: str,
+        output_file_name: str,
+        response_model: Optional[Type[BaseModel]] = None,
+        batch_rows: int = 10000
+    ):
+        super().__init__(output_folder, output_file_name, response_model, batch_rows)
+        self._file: TextIO = open(self.path, "w", encoding="utf-8")
+
+    def _write(self, df: pd.DataFrame):
+        lines = _with_iso_dates(df).to_json(orient='records', lines=True, date_format='iso')
+        self._file.write(lines if lines.endswith("\n") else lines + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class JSONStreamingWriter(StreamingWriter):
+    """
+    Streams rows into a JSON array of records, the same layout as export_as_json.
+    The closing bracket is rewritten after every batch, so the file is a complete
+    array of everything written so far even if the run crashes.
+    """
+    extension = "json"
+
+    def __init__(
+        self,
+        output_folder: str,
+        output_file_name: str,
+        response_model: Optional[Type[BaseModel]] = None,
+        batch_rows: int = 10000
+    ):
+        super().__init__(output_folder, output_file_name, response_model, batch_rows)
+        self._file: BinaryIO = open(self.path, "wb")
+        self._file.write(b"[]")
+        self._file.flush()
+
+    def _write(self, df: pd.DataFrame):
+        records = _with_iso_dates(df).to_json(orient='records', date_format='iso')
+        # Overwrite the closing bracket, and strip the enclosing brackets so batches join into one array
+        self._file.seek(-1, os.SEEK_END)
+        separator = "," if self.rows_written else ""
+        self._file.write(f"{separator}{records[1:-1]}]".encode("utf-8"))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class ParquetStreamingWriter(StreamingWriter):
+    """
+    Writes rows to a Parquet file in row groups of batch_rows rows.
+    A Parquet file is only readable once it is closed, so rows are buffered until a
+    row group is full instead of writing a tiny row group for every document.
+    The schema is built from the response model if one is given, otherwise it is
+    taken from the first batch. Requires pyarrow.
+    """
+    extension = "parquet"
+
+    def __init__(
+        self,
+        output_folder: str,
+        output_file_name: str,
+        response_model: Optional[Type[BaseModel]] = None,
+        batch_rows: int = 10000
+    ):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet export requires pyarrow. Install it with `pip install pyarrow`.") from e
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        super().__init__(output_folder, output_file_name, response_model, batch_rows)
+        self._writer = None
+        self._schema = None
+        self._pending: List[pa.Table] = []
+        self._pending_rows = 0
+        if response_model is not None:
+            # A column that is all null in the first batch keeps its type for later batches
+            self._schema = arrow_schema(response_model)
+            self._writer = self._pq.ParquetWriter(self.path, self._schema)
+
+    def _write(self, df: pd.DataFrame):
+        if self._writer is None:
+            schema = self._pa.Schema.from_pandas(df, preserve_index=False)
+            # Columns that are all null in the first batch have no type yet, store them as strings
+            for index, field in enumerate(schema):
+                if self._pa.types.is_null(field.type):
+                    schema = schema.set(index, field.with_type(self._pa.string()))
+            self._schema = schema.remove_metadata()
+            self._writer = self._pq.ParquetWriter(self.path, self._schema)
+
+        df = df.reindex(columns=self._schema.names)
+        try:
+            table = self._pa.Table.from_pandas(df, schema=self._schema, preserve_index=False, safe=False)
+        except (self._pa.ArrowInvalid, self._pa.ArrowTypeError):
+            if self.response_model is None:
+                raise
+            # e.g. dates still held as ISO strings, when rows were not kept in a columnar store
+            store = ColumnarStore(self.response_model)
+            store.append(df.astype(object).where(df.notna(), None).to_dict(orient="records"))
+            table = store.to_table()
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        if self._pending_rows >= self.batch_rows:
+            self._write_row_groups(full_only=True)
+
+    def _write_row_groups(self, full_only: bool = False):
+        if not self._pending_rows:
+            return
+        table = self._pa.concat_tables(self._pending).unify_dictionaries().combine_chunks()
+        # Rows that do not fill a row group wait for the next batch, unless the file is being closed
+        rows = table.num_rows - table.num_rows % self.batch_rows if full_only else table.num_rows
+        self._writer.write_table(table.slice(0, rows), row_group_size=self.batch_rows)
+        self._pending = [table.slice(rows)]
+        self._pending_rows = table.num_rows - rows
+
+    def close(self):
+        if self._writer is not None:
+            with span("export", format=self.extension):
+                self._write_row_groups()
+            self._writer.close()
+        super().close()
+
+
+STREAMING_WRITERS = {
+    "csv": CSVStreamingWriter,
+    "json": JSONStreamingWriter,
+    "jsonl": JSONLinesStreamingWriter,
+    "parquet": ParquetStreamingWriter,
+}
+
+def open_streaming_writer(
+    export_type: str,
+    output_folder: str,
+    output_file_name: str,
+    response_model: Optional[Type[BaseModel]] = None,
+    batch_rows: int = 10000
+) -> StreamingWriter:
+    """
+    Open a streaming writer for the given export type ("csv", "json", "jsonl" or "parquet").
+    Parquet files take their schema from response_model if it is given, and are
+    written in row groups of batch_rows rows.
+    """
+    if export_type not in STREAMING_WRITERS:
+        raise ValueError(f"Unknown export type in config: {export_type}")
+    return STREAMING_WRITERS[export_type](output_folder, output_file_name, response_model, batch_rows)
@@ -5,6 +5,7 @@ import os
 import pandas as pd
 import importlib
 from docling.document_converter import DocumentConverter
+from pydantic import BaseModel
 
 # Add src/ to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
@@ -22,91 +23,109 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 import llm_document_parser.config as config
 
-from llm_document_parser.instructor_llm import extract_json_data_using_ollama_llm, pull_ollama_model
-from llm_document_parser.convert_doc_docling import (
-    load_rapid_ocr_model,
-    load_easy_ocr_model,
-    load_ocr_mac_model,
-    load_tesseract_model,
-    image_to_text
-)
-from llm_document_parser.export_data import export_as_csv, export_as_json, combine_json_data_into_df, convert_json_to_df
+from llm_document_parser.instructor_llm import extract_data_using_ollama_llm
+from llm_document_parser.model_registry import ModelRegistry
+from llm_document_parser.ocr_pool import convert_to_markdown
+from llm_document_parser.instrumentation import start_metrics_server
+from llm_document_parser.job_queue import Job, JobQueue, QueueFullError
+from llm_document_parser.preprocessing.prompt_compaction import compact_prompt
+from llm_document_parser.export_data import ResultAccumulator, open_streaming_writer
 
 print("RUNNING gradio_app.py FROM:", __file__)
 
-# Load OCR model based on config
-def load_ocr_model_from_config(model_type: str) -> DocumentConverter:
-    """
-    Load the OCR model based on the configuration.
-    Args:
-        model_type (str): The type of OCR model to load.
-    Returns:
-        object: The loaded OCR model.
-    """
-    if model_type == "rapid":
-        # TODO: REFACTOR LOAD OCR MODEL TO JUST EITHER USE SERVER MODELS OR MOBILE MODELS
-        return load_rapid_ocr_model(
-            "PP-OCRv4/ch_PP-OCRv4_det_server_infer.onnx",
-            "PP-OCRv3/ch_PP-OCRv3_rec_infer.onnx",
-            "PP-OCRv3/ch_ppocr_mobile_v2.0_cls_train.onnx"
-        )
-    if model_type == "easy":
-        return load_easy_ocr_model()
-    if model_type == "ocrmac":
-        return load_ocr_mac_model()
-    if model_type == "tesseract":
-        return load_tesseract_model(config.TESSERACT_TESSDATA_LOCATION)
-
-    raise ValueError(f"Unknown OCR model type in config: {model_type}")
+# Models are loaded once and shared by every request until the config is reloaded
+model_registry = ModelRegistry(config)
 
 
 def save_results(export_type: str, output_file_name: str, df: pd.DataFrame, output_folder: str) -> str:
     """
-    Save the results in the specified format. 
+    Save the results in the specified format.
     Args:
-        export_type (str): The type of export (e.g., "csv").
+        export_type (str): The type of export ("csv", "json", "jsonl" or "parquet").
         output_file_name (str): The name of the output file.
-        json_data (str): The JSON data to save.
+        df (pd.DataFrame): The extracted rows.
         output_folder (str): The folder to save the output file.
     Returns:
-        output_data (str): The output data from the LLM formatted into the specified format
+        output_data (str): The saved file's contents, or where it was saved for binary formats like Parquet
+    Raises:
+        ValueError: If the export type is not supported.
     """
-    if export_type == "csv":
-        return export_as_csv(df=df, output_folder=output_folder, output_file_name=output_file_name)
-    if export_type == "json":
-        return export_as_json(df=df, output_folder=output_folder, output_file_name=output_file_name)
-    
-    return ""
-
-def process_file(input_path: Path, document_converter: DocumentConverter) -> str:
-    conversion_result = image_to_text(document_converter, input_path)
-    ocr_text_data = conversion_result.document.export_to_markdown()
+    with open_streaming_writer(export_type, output_folder, output_file_name, config.RESPONSE_MODEL, config.COLUMNAR_BATCH_ROWS) as writer:
+        writer.write(df)
+    if export_type == "parquet":
+        return f"Saved {writer.rows_written} rows to {writer.path}"
+    return writer.path.read_text(encoding="utf-8")
+
+def process_file(input_path: Path, document_converter: DocumentConverter) -> BaseModel:
+    ocr_text_data = convert_to_markdown(
+        document_converter,
+        input_path,
+        preprocess_batch_size=config.OCR_PREPROCESS_BATCH_SIZE,
+        text_layer_min_chars=config.PDF_TEXT_LAYER_MIN_CHARS
+    )
+    if config.PROMPT_COMPACTION_ENABLED:
+        ocr_text_data = compact_prompt(ocr_text_data, str(input_path))
 
-    json_data = extract_json_data_using_ollama_llm(
+    return extract_data_using_ollama_llm(
         prompt=config.LLM_PROMPT,
         text_data=ocr_text_data,
         ollama_model=config.OLLAMA_MODEL,
         response_model=config.RESPONSE_MODEL
     )
-    return json_data
+
+def process_uploaded_file(input_path: Path) -> BaseModel:
+    """
+    Parse one uploaded file with the shared models. Runs on a job queue worker.
+    """
+    model_registry.ensure_ollama_model()
+    return process_file(Path(input_path), model_registry.get_document_converter())
+
+# Uploads are processed in the background by a worker pool shared by all users
+job_queue = JobQueue(process_uploaded_file, workers=config.JOB_WORKERS, max_queue_depth=config.JOB_MAX_QUEUE_DEPTH)
+
+def job_progress(job: Job) -> str:
+    """
+    Describe the progress of a job as markdown, one line per file.
+    """
+    lines = [f"**Job {job.status}**: {job.completed_files()} of {len(job.input_paths)} files processed"]
+    for index, (input_path, file_status) in enumerate(zip(job.input_paths, job.file_status)):
+        error = f" ({job.errors[index]})" if index in job.errors else ""
+        lines.append(f"- `{Path(input_path).name}`: {file_status}{error}")
+    return "\n".join(lines)
 
 # Full processing pipeline
 def run_full_pipeline(file_inputs):
-    document_converter = load_ocr_model_from_config(config.OCR_MODEL)
-    pull_ollama_model(config.OLLAMA_MODEL)
-
-    df = pd.DataFrame()
-    if type(file_inputs) == list:
-        json_data_objects = list()
-        for file in file_inputs:
-            json_data = process_file(file, document_converter)
-            json_data_objects.append(json_data)
-            df = combine_json_data_into_df(json_data_objects)
-    else:
-        json_data = process_file(Path(file_inputs), document_converter)
-        df = convert_json_to_df(json_data)
-
-    return save_results(export_type=config.EXPORT_TYPE,output_file_name=config.OUTPUT_FILE_NAME, df=df, output_folder=config.OUTPUT_FOLDER)
+    """
+    Submit the uploaded files as a job, then stream its progress and each file's
+    result as it completes. The exported results are shown once the job is done.
+    """
+    if not file_inputs:
+        raise gr.Error("Upload at least one document")
+    input_paths = [Path(file) for file in file_inputs] if type(file_inputs) == list else [Path(file_inputs)]
+    try:
+        job = job_queue.submit(input_paths)
+    except QueueFullError as e:
+        raise gr.Error(str(e))
+
+    # Each file's rows are taken from its validated result once, when it arrives
+    accumulator = ResultAccumulator(config.RESPONSE_MODEL if config.COLUMNAR_STORE_ENABLED else None, config.COLUMNAR_BATCH_ROWS)
+    partial_results = {}
+    for job in job_queue.updates(job):
+        for index in sorted(job.results.keys() - partial_results.keys()):
+            partial_results[index] = accumulator.add_result(job.results[index])
+        yield job.id, job_progress(job), {
+            Path(job.input_paths[index]).name: rows for index, rows in sorted(partial_results.items())
+        }
+
+    if accumulator.documents:
+        df = accumulator.to_df()
+        output = save_results(export_type=config.EXPORT_TYPE, output_file_name=config.OUTPUT_FILE_NAME, df=df, output_folder=config.OUTPUT_FOLDER)
+        yield job.id, job_progress(job), output
+
+def cancel_job(job_id: str) -> str:
+    if job_id and job_queue.cancel(job_id):
+        return "Cancelling job, files already being processed will finish"
+    return "No running job to cancel"
 
 base_dir = Path(os.path.dirname(__file__))
 config_file_path = base_dir / "src" / "llm_document_parser" / "config.py"
@@ -119,6 +138,7 @@ def load_config():
 def save_config(updated_config):
     config_file_path.write_text(updated_config)
     importlib.reload(config)
+    model_registry.reload()
     return "Config updated successfully!"
 
 with gr.Blocks() as demo:
@@ -135,9 +155,15 @@ with gr.Blocks() as demo:
 
     file_input = gr.File(file_types=["image", ".pdf"], file_count="multiple", label="Upload Document(s) (Image/PDF)")
 
-    run_button = gr.Button("Parse Documents")
+    with gr.Row():
+        run_button = gr.Button("Parse Documents")
+        cancel_button = gr.Button("Cancel")
+    job_id = gr.State()
+    progress = gr.Markdown()
     output_text = gr.JSON(label="Extracted Data")
-    run_button.click(fn=run_full_pipeline, inputs=file_input, outputs=output_text)
+    # Requests only wait on the job queue, which bounds the actual work, so they are not limited here
+    run_button.click(fn=run_full_pipeline, inputs=file_input, outputs=[job_id, progress, output_text], concurrency_limit=None)
+    cancel_button.click(fn=cancel_job, inputs=job_id, outputs=progress, concurrency_limit=None)
 
     ''' 
     gr.Markdown("""# Config
@@ -152,4 +178,6 @@ with gr.Blocks() as demo:
     '''
 
 if __name__ == "__main__":
+    if config.METRICS_PORT is not None:
+        start_metrics_server(config.METRICS_PORT)
     demo.launch(share=True)
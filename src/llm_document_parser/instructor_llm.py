@@ -1,52 +1,291 @@
-import instructor
-from openai import OpenAI
+from __future__ import annotations
+
+import threading
+from contextvars import ContextVar
+
 from pydantic import BaseModel
-from typing import Type
+from typing import TYPE_CHECKING, Optional, Type
+
+# instructor, openai and ollama are imported when a client is first needed,
+# so importing this module stays cheap
+if TYPE_CHECKING:
+    import httpx
+    import instructor
+    import ollama
+
+from llm_document_parser.config import (
+    OLLAMA_BASE_URL,
+    LLM_CONNECTION_POOL_SIZE,
+    LLM_TIMEOUT_SECONDS,
+    LLM_CONNECT_TIMEOUT_SECONDS
+)
+from llm_document_parser.llm_cache import LLMCache, llm_cache_key
+from llm_document_parser.instrumentation import metrics, span
+
+# Instructor clients keyed on (base_url, pool_size, timeout, connect_timeout), so each
+# Ollama host keeps one keep-alive connection pool for the lifetime of the process
+_clients: dict = {}
+_async_clients: dict = {}
+_clients_lock = threading.Lock()
+
+# Number of completion attempts made by instructor for the request running in this
+# thread or asyncio task, counted through the "completion:kwargs" hook of the shared clients
+_attempts: ContextVar[Optional[list]] = ContextVar("llm_attempts", default=None)
+
+def _count_attempt(*args, **kwargs):
+    attempts = _attempts.get()
+    if attempts is not None:
+        attempts[0] += 1
+
+def _register_hooks(client):
+    client.on("completion:kwargs", _count_attempt)
+    return client
+
+def _http_limits(pool_size: int) -> httpx.Limits:
+    import httpx
+
+    return httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+
+def _http_timeout(timeout: float, connect_timeout: float) -> httpx.Timeout:
+    import httpx
 
-import ollama
+    return httpx.Timeout(timeout, connect=connect_timeout)
 
-def pull_ollama_model(model: str):
+def get_instructor_client(
+    base_url: str = OLLAMA_BASE_URL,
+    pool_size: int = LLM_CONNECTION_POOL_SIZE,
+    timeout: float = LLM_TIMEOUT_SECONDS,
+    connect_timeout: float = LLM_CONNECT_TIMEOUT_SECONDS
+) -> instructor.Instructor:
+    """
+    Get a shared instructor client for an OpenAI compatible endpoint.
+    Clients are created once per base URL and settings and reuse their HTTP connections.
+    Args:
+        base_url (str): The OpenAI compatible API URL, e.g. "http://localhost:11434/v1".
+        pool_size (int): Maximum number of connections kept open to the endpoint.
+        timeout (float): Request timeout in seconds.
+        connect_timeout (float): Connection timeout in seconds.
+    Returns:
+        instructor.Instructor: The shared client.
+    """
+    import httpx
+    import instructor
+    from openai import OpenAI
+
+    key = (base_url, pool_size, timeout, connect_timeout)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = _register_hooks(instructor.from_openai(
+                OpenAI(
+                    base_url=base_url,
+                    api_key="ollama",
+                    http_client=httpx.Client(
+                        limits=_http_limits(pool_size),
+                        timeout=_http_timeout(timeout, connect_timeout)
+                    )
+                ),
+                mode=instructor.Mode.JSON
+            ))
+        return _clients[key]
+
+def get_async_instructor_client(
+    base_url: str = OLLAMA_BASE_URL,
+    pool_size: int = LLM_CONNECTION_POOL_SIZE,
+    timeout: float = LLM_TIMEOUT_SECONDS,
+    connect_timeout: float = LLM_CONNECT_TIMEOUT_SECONDS
+) -> instructor.AsyncInstructor:
+    """
+    Get a shared async instructor client for an OpenAI compatible endpoint.
+    The client's connections belong to the event loop that first uses them, so it
+    should only be shared between coroutines running on one event loop.
+    Args:
+        base_url (str): The OpenAI compatible API URL, e.g. "http://localhost:11434/v1".
+        pool_size (int): Maximum number of connections kept open to the endpoint.
+        timeout (float): Request timeout in seconds.
+        connect_timeout (float): Connection timeout in seconds.
+    Returns:
+        instructor.AsyncInstructor: The shared client.
+    """
+    import httpx
+    import instructor
+    from openai import AsyncOpenAI
+
+    key = (base_url, pool_size, timeout, connect_timeout)
+    with _clients_lock:
+        if key not in _async_clients:
+            _async_clients[key] = _register_hooks(instructor.from_openai(
+                AsyncOpenAI(
+                    base_url=base_url,
+                    api_key="ollama",
+                    http_client=httpx.AsyncClient(
+                        limits=_http_limits(pool_size),
+                        timeout=_http_timeout(timeout, connect_timeout)
+                    )
+                ),
+                mode=instructor.Mode.JSON
+            ))
+        return _async_clients[key]
+
+def pull_ollama_model(model: str, client: Optional[ollama.Client] = None):
     """
     Pull a model from ollama if it is not already downloaded
+    Uses the given ollama client, or the local daemon if no client is given
     """
+    if client is None:
+        import ollama
+
+        client = ollama
+
     if not model.__contains__(":"):
         model += ":latest"
 
-    for downloaded_model in ollama.list()["models"]:
+    for downloaded_model in client.list()["models"]:
         if downloaded_model['model']== model:
             print(f"Model {downloaded_model['model']} is installed")
             return
     
     print(f"Model {model} is not installed")
     print(f"Downloading {model} model...")
-    ollama.pull(model)
+    client.pull(model)
 
-def extract_json_data_using_ollama_llm(prompt: str, text_data: str, ollama_model: str, response_model: Type[BaseModel]) -> str:
+def _record_attempts(attempts: int):
+    metrics.increment("llm_requests")
+    if attempts > 1:
+        metrics.increment("llm_validation_retries", attempts - 1)
+
+def _build_messages(prompt: str, text_data: str) -> list:
+    return [
+        {
+            'role': 'system',
+            'content': prompt
+        },
+        {
+            'role': 'user',
+            'content': text_data
+        },
+    ]
+
+def get_cached_result(cache: LLMCache, cache_key: str, response_model: Type[BaseModel]) -> Optional[BaseModel]:
     """
-    Pass prompt and data into an ollama LLM using instructor
+    Look up a cached LLM result and validate it back into the response model
+    Returns None on a cache miss
     """
-    client = instructor.from_openai(
-        OpenAI(
-            base_url="http://localhost:11434/v1",
-            api_key="ollama"
-        ),
-        mode=instructor.Mode.JSON
-    )
+    cached_json_data = cache.get(cache_key)
+    if cached_json_data is None:
+        return None
+    metrics.increment("llm_cache_hits")
+    return response_model.model_validate_json(cached_json_data)
 
-    resp = client.chat.completions.create(
-        model=ollama_model,
-        messages=[
-            {
-                'role': 'system',
-                'content': prompt
-            },
-            {
-                'role': 'user',
-                'content': text_data
-            },
-        ],
-        response_model=response_model,
-        max_retries=3
-    )
+def extract_data_using_ollama_llm(
+    prompt: str,
+    text_data: str,
+    ollama_model: str,
+    response_model: Type[BaseModel],
+    cache: Optional[LLMCache] = None,
+    base_url: str = OLLAMA_BASE_URL,
+    client: Optional[instructor.Instructor] = None
+) -> BaseModel:
+    """
+    Pass prompt and data into an ollama LLM using instructor and return the validated response model
+    If a cache is given, identical requests are answered from it without calling the LLM
+    Uses the shared client for base_url unless a client is passed in
+    """
+    if cache is not None:
+        cache_key = llm_cache_key(prompt, text_data, ollama_model, response_model)
+        cached_result = get_cached_result(cache, cache_key, response_model)
+        if cached_result is not None:
+            return cached_result
 
+    if client is None:
+        client = get_instructor_client(base_url)
+
+    attempts = [0]
+    token = _attempts.set(attempts)
+    try:
+        with span("extract_json_data_using_ollama_llm", model=ollama_model, base_url=base_url):
+            resp = client.chat.completions.create(
+                model=ollama_model,
+                messages=_build_messages(prompt, text_data),
+                response_model=response_model,
+                max_retries=3
+            )
+    finally:
+        _attempts.reset(token)
+        _record_attempts(attempts[0])
+
+    if cache is not None:
+        cache.put(cache_key, resp.model_dump_json())
+    return resp
+
+def extract_json_data_using_ollama_llm(
+    prompt: str,
+    text_data: str,
+    ollama_model: str,
+    response_model: Type[BaseModel],
+    cache: Optional[LLMCache] = None,
+    base_url: str = OLLAMA_BASE_URL,
+    client: Optional[instructor.Instructor] = None
+) -> str:
+    """
+    Version of extract_data_using_ollama_llm that returns the result as an indented JSON string, for display
+    """
+    return extract_data_using_ollama_llm(
+        prompt, text_data, ollama_model, response_model, cache, base_url, client
+    ).model_dump_json(indent=4)
+
+async def extract_data_using_ollama_llm_async(
+    prompt: str,
+    text_data: str,
+    ollama_model: str,
+    response_model: Type[BaseModel],
+    cache: Optional[LLMCache] = None,
+    base_url: str = OLLAMA_BASE_URL,
+    client: Optional[instructor.AsyncInstructor] = None
+) -> BaseModel:
+    """
+    Async version of extract_data_using_ollama_llm for concurrent callers
+    """
+    if cache is not None:
+        cache_key = llm_cache_key(prompt, text_data, ollama_model, response_model)
+        cached_result = get_cached_result(cache, cache_key, response_model)
+        if cached_result is not None:
+            return cached_result
+
+    if client is None:
+        client = get_async_instructor_client(base_url)
+
+    # Each asyncio task has its own context, so concurrent requests count their attempts separately
+    attempts = [0]
+    token = _attempts.set(attempts)
+    try:
+        with span("extract_json_data_using_ollama_llm", model=ollama_model, base_url=base_url):
+            resp = await client.chat.completions.create(
+                model=ollama_model,
+                messages=_build_messages(prompt, text_data),
+                response_model=response_model,
+                max_retries=3
+            )
+    finally:
+        _attempts.reset(token)
+        _record_attempts(attempts[0])
+
+    if cache is not None:
+        cache.put(cache_key, resp.model_dump_json())
+    return resp
+
+async def extract_json_data_using_ollama_llm_async(
+    prompt: str,
+    text_data: str,
+    ollama_model: str,
+    response_model: Type[BaseModel],
+    cache: Optional[LLMCache] = None,
+    base_url: str = OLLAMA_BASE_URL,
+    client: Optional[instructor.AsyncInstructor] = None
+) -> str:
+    """
+    Async version of extract_json_data_using_ollama_llm for concurrent callers
+    """
+    resp = await extract_data_using_ollama_llm_async(
+        prompt, text_data, ollama_model, response_model, cache, base_url, client
+    )
     return resp.model_dump_json(indent=4)
@@ -0,0 +1,230 @@
+# instrumentation.py
+"""
+This module provides lightweight timing and profiling for the pipeline.
+Stages are wrapped in spans that aggregate durations per stage name. Every
+finished span is also passed to the registered sinks, such as a JSON Lines
+log, and the aggregates can be served in the Prometheus text format.
+An opt-in profiler hook wraps single documents with cProfile or pyinstrument.
+"""
+
+# imports
+import cProfile
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional
+
+METRIC_PREFIX = "llm_document_parser"
+
+
+class Metrics:
+    """
+    Thread-safe registry of stage timings and counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings: Dict[str, List[float]] = {}
+        self._counters: Dict[str, float] = {}
+        self._sinks: List[Callable[[dict], None]] = []
+
+    def add_sink(self, sink: Callable[[dict], None]):
+        """
+        Register a callable that receives every span and counter event as a dict.
+        """
+        with self._lock:
+            self._sinks.append(sink)
+
+    def _emit(self, event: dict):
+        for sink in list(self._sinks):
+            sink(event)
+
+    @contextmanager
+    def span(self, name: str, **fields) -> Iterator[None]:
+        """
+        Time a block of code as one run of a stage.
+        Args:
+            name (str): The stage name, aggregated across runs.
+            **fields: Extra details passed to the sinks only, e.g. the input file.
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, error=error, **fields)
+
+    def record(self, name: str, seconds: float, **fields):
+        """
+        Record one run of a stage that was timed elsewhere.
+        """
+        with self._lock:
+            timing = self._timings.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+        self._emit({"type": "span", "name": name, "seconds": seconds, "timestamp": time.time(), **fields})
+
+    def increment(self, name: str, value: float = 1, **fields):
+        """
+        Add to a counter.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        self._emit({"type": "counter", "name": name, "value": value, "timestamp": time.time(), **fields})
+
+    def add_counters(self, counters: Dict[str, float]):
+        """
+        Add counters counted in another process, e.g. an OCR worker.
+        Their events are not sent to the sinks again, since that process already did.
+        """
+        with self._lock:
+            for name, value in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: The count, total and maximum seconds of every stage, and every counter.
+        """
+        with self._lock:
+            return {
+                "timings": {
+                    name: {"count": count, "total_seconds": total, "max_seconds": maximum}
+                    for name, (count, total, maximum) in self._timings.items()
+                },
+                "counters": dict(self._counters),
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Returns:
+            str: The timings and counters in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, timing in sorted(snapshot["timings"].items()):
+            metric = _metric_name(f"{name}_seconds")
+            lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_count {timing['count']}")
+            lines.append(f"{metric}_sum {timing['total_seconds']}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            lines.append(f"{metric}_max {timing['max_seconds']}")
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = _metric_name(f"{name}_total")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """
+        Clear all timings and counters.
+        """
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", f"{METRIC_PREFIX}_{name}")
+
+
+class JSONLogSink:
+    """
+    Appends every event as one line of JSON to a file.
+    Lines are written with a single append, so several processes can share a file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        line = json.dumps(event, default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+# Process-wide metrics used by the pipeline modules
+metrics = Metrics()
+
+def span(name: str, **fields):
+    """
+    Time a block of code with the process-wide metrics. See Metrics.span.
+    """
+    return metrics.span(name, **fields)
+
+def start_metrics_server(port: int, host: str = "0.0.0.0", registry: Optional[Metrics] = None) -> ThreadingHTTPServer:
+    """
+    Serve metrics in the Prometheus text format at /metrics from a background thread.
+    Args:
+        port (int): The port to listen on, or 0 for any free port.
+        host (str): The address to listen on.
+        registry (Optional[Metrics]): The metrics to serve, the process-wide metrics by default.
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    registry = registry or metrics
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving metrics at http://{host}:{server.server_port}/metrics")
+    return server
+
+@contextmanager
+def profile(output_path: str, profiler: str = "cprofile") -> Iterator[None]:
+    """
+    Profile a block of code, e.g. the processing of a single document.
+    Args:
+        output_path (str): Where to write the profile. cProfile writes pstats data,
+            pyinstrument writes an HTML report.
+        profiler (str): "cprofile" or "pyinstrument" (requires the pyinstrument package).
+    """
+    if profiler == "cprofile":
+        profiler_instance = cProfile.Profile()
+        profiler_instance.enable()
+        try:
+            yield
+        finally:
+            profiler_instance.disable()
+            profiler_instance.dump_stats(output_path)
+            print(f"Saved cProfile stats to {output_path}")
+        return
+
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError as e:
+            raise ImportError("Profiling with pyinstrument requires `pip install pyinstrument`.") from e
+        profiler_instance = Profiler()
+        profiler_instance.start()
+        try:
+            yield
+        finally:
+            profiler_instance.stop()
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(profiler_instance.output_html())
+            print(f"Saved pyinstrument report to {output_path}")
+        return
+
+    raise ValueError(f"Unknown profiler: {profiler}")
@@ -0,0 +1,163 @@
+# job_manifest.py
+"""
+This module records the progress of batch runs so they can be resumed.
+A SQLite ledger stores the status, content hash, timings and output location
+of every input file, and a fingerprint of the settings it was processed with.
+Files that finished with unchanged contents and settings are skipped on the
+next run; failed, changed and new files, and files processed with different
+settings, are processed again.
+"""
+
+# imports
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from llm_document_parser.ocr_cache import hash_file
+
+
+class JobManifest:
+    """
+    Persistent per-file ledger of a batch job.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, db_path: str, settings_fingerprint: str = ""):
+        """
+        Args:
+            db_path (str): Path to the SQLite database file.
+            settings_fingerprint (str): Identifies the settings that determine a file's rows, e.g. the
+                prompt, models, response model and export type. Files completed with other settings are pending.
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.settings_fingerprint = settings_fingerprint
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    started_at REAL,
+                    finished_at REAL,
+                    output_path TEXT,
+                    row_offset INTEGER,
+                    row_count INTEGER,
+                    settings TEXT
+                )
+                """
+            )
+            columns = [column[1] for column in self._connection.execute("PRAGMA table_info(files)")]
+            if "settings" not in columns:
+                # Ledgers written before settings were recorded; their files are processed again
+                self._connection.execute("ALTER TABLE files ADD COLUMN settings TEXT")
+
+    @staticmethod
+    def _key(input_path: Path) -> str:
+        return str(Path(input_path).resolve())
+
+    def _content_hash(self, input_path: Path, stat, row) -> str:
+        # Only re-hash files whose size or modification time changed since they were recorded
+        if row is not None and row[1] == stat.st_size and row[2] == stat.st_mtime_ns:
+            return row[0]
+        return hash_file(input_path)
+
+    def pending_files(self, input_paths: List[Path], output_paths: Optional[Iterable[Path]] = None) -> List[Path]:
+        """
+        Register the input files of a run and return the ones that still need processing.
+        Files already completed with the same contents and settings are skipped.
+        Args:
+            input_paths (List[Path]): All input files of the run.
+            output_paths (Optional[Iterable[Path]]): The output files that are known to be complete, or None
+                to trust every output. Files whose rows were written elsewhere, e.g. to a shard part that
+                a crashed run never registered, are processed again.
+        Returns:
+            List[Path]: The files to process, in input order.
+        """
+        complete_outputs = None if output_paths is None else {self._key(output_path) for output_path in output_paths}
+        pending = []
+        now = time.time()
+        for input_path in input_paths:
+            key = self._key(input_path)
+            stat = Path(input_path).stat()
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT content_hash, size, mtime_ns, status, settings, output_path FROM files WHERE path = ?", (key,)
+                ).fetchone()
+            content_hash = self._content_hash(input_path, stat, row)
+            if (
+                row is not None and row[3] == "done" and row[0] == content_hash and row[4] == self.settings_fingerprint
+                and (complete_outputs is None or (row[5] is not None and self._key(row[5]) in complete_outputs))
+            ):
+                continue
+
+            with self._lock, self._connection:
+                self._connection.execute(
+                    """
+                    INSERT OR REPLACE INTO files (path, content_hash, size, mtime_ns, status, started_at, settings)
+                    VALUES (?, ?, ?, ?, 'pending', ?, ?)
+                    """,
+                    (key, content_hash, stat.st_size, stat.st_mtime_ns, now, self.settings_fingerprint)
+                )
+            pending.append(input_path)
+
+        skipped = len(input_paths) - len(pending)
+        if skipped:
+            print(f"Skipping {skipped} files already completed in {self.db_path}")
+        return pending
+
+    def mark_done(self, input_path: Path, output_path: Path, row_offset: int, row_count: int):
+        """
+        Record that a file was processed and where its rows were written.
+        Args:
+            input_path (Path): The input file.
+            output_path (Path): The output file the rows were written to.
+            row_offset (int): Number of rows in the output file before this file's rows.
+            row_count (int): Number of rows written for this file.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                UPDATE files SET status = 'done', error = NULL, finished_at = ?,
+                    output_path = ?, row_offset = ?, row_count = ?
+                WHERE path = ?
+                """,
+                (time.time(), str(output_path), row_offset, row_count, self._key(input_path))
+            )
+
+    def mark_failed(self, input_path: Path, error: Exception):
+        """
+        Record that processing a file failed, so the next run retries it.
+        Args:
+            input_path (Path): The input file.
+            error (Exception): The error raised while processing it.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE files SET status = 'failed', error = ?, finished_at = ? WHERE path = ?",
+                (repr(error), time.time(), self._key(input_path))
+            )
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: The number of files in each status.
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,253 @@
+# job_queue.py
+"""
+This module runs parsing jobs submitted by the Gradio front end in the background.
+A job is the list of files of one upload. Files of all jobs are processed by a
+fixed pool of worker threads, taking turns between jobs so one large upload does
+not hold up everyone else. Callers follow a job's per-file progress and partial
+results as they complete, can cancel it, and are turned away with QueueFullError
+once too many files are waiting.
+"""
+
+# imports
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from llm_document_parser.instrumentation import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while the queue already holds its maximum number of files.
+    """
+
+
+@dataclass(eq=False)
+class Job:
+    """
+    The files of one submission and the progress made on them.
+    """
+    id: str
+    input_paths: List[Path]
+    status: str = QUEUED
+    # Per-file status, result and error, by index in input_paths
+    file_status: List[str] = field(default_factory=list)
+    results: Dict[int, Any] = field(default_factory=dict)
+    errors: Dict[int, str] = field(default_factory=dict)
+    # Number of updates so far, used by callers to wait for the next one
+    version: int = 0
+    _pending: Deque[int] = field(default_factory=deque, repr=False)
+    _running: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def completed_files(self) -> int:
+        return len(self.results) + len(self.errors)
+
+    def snapshot(self) -> "Job":
+        """
+        Copy the job, so it can be read while workers keep updating the original.
+        """
+        return replace(
+            self,
+            file_status=list(self.file_status),
+            results=dict(self.results),
+            errors=dict(self.errors),
+            _pending=deque(self._pending)
+        )
+
+
+class JobQueue:
+    """
+    In-process job queue with a bounded pool of worker threads shared by all jobs.
+    """
+
+    def __init__(
+        self,
+        process_file: Callable[[Path], Any],
+        workers: int,
+        max_queue_depth: int,
+        max_finished_jobs: int = 100
+    ):
+        """
+        Args:
+            process_file (Callable[[Path], Any]): Parses one file and returns its extracted data.
+            workers (int): Number of files processed at the same time, across all jobs.
+            max_queue_depth (int): Maximum number of files waiting to be processed (0 for no limit).
+            max_finished_jobs (int): Number of finished jobs kept for their results.
+        """
+        self.process_file = process_file
+        self.max_queue_depth = max_queue_depth
+        self.max_finished_jobs = max_finished_jobs
+        self._condition = threading.Condition()
+        self._jobs: Dict[str, Job] = {}
+        self._finished: Deque[str] = deque()
+        # Jobs with files left to start, in the order they take turns
+        self._ready: Deque[Job] = deque()
+        self._queued_files = 0
+        self._stopped = False
+        self._workers = [
+            threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            for index in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, input_paths: List[Path]) -> Job:
+        """
+        Queue a job.
+        Args:
+            input_paths (List[Path]): The files to process.
+        Returns:
+            Job: The queued job.
+        Raises:
+            QueueFullError: If the files would take the queue past max_queue_depth.
+        """
+        job = Job(id=uuid.uuid4().hex, input_paths=list(input_paths))
+        job.file_status = [QUEUED] * len(job.input_paths)
+        job._pending.extend(range(len(job.input_paths)))
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("The job queue has been shut down")
+            if self.max_queue_depth and self._queued_files + len(job.input_paths) > self.max_queue_depth:
+                metrics.increment("jobs_rejected")
+                raise QueueFullError(
+                    f"The queue is full ({self._queued_files} files waiting, limit {self.max_queue_depth}), try again later"
+                )
+            self._jobs[job.id] = job
+            if job._pending:
+                self._ready.append(job)
+                self._queued_files += len(job._pending)
+            else:
+                self._finish(job, DONE)
+            metrics.increment("jobs_submitted")
+            self._condition.notify_all()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job. Files not yet started are dropped; files already running finish
+        but their results are kept.
+        Returns:
+            bool: Whether the job was found and not already finished.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            self._queued_files -= len(job._pending)
+            for index in job._pending:
+                job.file_status[index] = CANCELLED
+            job._pending.clear()
+            if job in self._ready:
+                self._ready.remove(job)
+            if job._running:
+                job.status = CANCELLED
+                self._update(job)
+            else:
+                self._finish(job, CANCELLED)
+            metrics.increment("jobs_cancelled")
+            return True
+
+    def updates(self, job: Job, timeout: Optional[float] = None) -> Iterator[Job]:
+        """
+        Follow a job, yielding it once now and again after every change until it finishes.
+        Args:
+            job (Job): The job to follow.
+            timeout (Optional[float]): Seconds to wait for a change before yielding anyway, e.g. to keep a UI alive.
+        Yields:
+            Job: A snapshot of the job.
+        """
+        seen = -1
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: job.version != seen, timeout=timeout)
+                seen = job.version
+                snapshot = job.snapshot()
+            yield snapshot
+            if snapshot.finished and snapshot._running == 0:
+                return
+
+    def queued_files(self) -> int:
+        with self._condition:
+            return self._queued_files
+
+    def shutdown(self):
+        """
+        Stop the workers once the files already running are done. Queued files are dropped.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def _update(self, job: Job):
+        job.version += 1
+        self._condition.notify_all()
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        self._update(job)
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished_jobs:
+            self._jobs.pop(self._finished.popleft(), None)
+
+    def _next_file(self):
+        # Take one file from the job whose turn it is, then send that job to the back of the line
+        job = self._ready.popleft()
+        index = job._pending.popleft()
+        if job._pending:
+            self._ready.append(job)
+        self._queued_files -= 1
+        job._running += 1
+        job.status = RUNNING
+        job.file_status[index] = RUNNING
+        self._update(job)
+        return job, index
+
+    def _work(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopped or self._ready)
+                if self._stopped:
+                    return
+                job, index = self._next_file()
+
+            input_path = job.input_paths[index]
+            try:
+                result = self.process_file(input_path)
+                error = None
+            except Exception as e:
+                print(f"Job {job.id}: processing {input_path} failed: {e}")
+                result, error = None, e
+
+            with self._condition:
+                job._running -= 1
+                if error is None:
+                    job.results[index] = result
+                    job.file_status[index] = DONE
+                else:
+                    job.errors[index] = f"{type(error).__name__}: {error}"
+                    job.file_status[index] = FAILED
+                if job.status == CANCELLED and job._running == 0:
+                    self._finish(job, CANCELLED)
+                elif job.status == RUNNING and not job._pending and job._running == 0:
+                    self._finish(job, FAILED if job.errors and not job.results else DONE)
+                else:
+                    self._update(job)
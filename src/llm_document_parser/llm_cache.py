@@ -0,0 +1,174 @@
+# llm_cache.py
+"""
+This module provides caches for LLM extraction results.
+Entries are keyed on a hash of the prompt, the OCR text, the model name and
+the response model's JSON schema, so a cache hit is only possible when the
+LLM would be given byte-identical input.
+The default backend stores entries in SQLite with TTL and size based eviction.
+"""
+
+# imports
+from abc import ABC, abstractmethod
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Type
+
+from pydantic import BaseModel
+
+
+def llm_cache_key(prompt: str, text_data: str, ollama_model: str, response_model: Type[BaseModel]) -> str:
+    """
+    Build the cache key for an LLM extraction request.
+    Args:
+        prompt (str): The system prompt.
+        text_data (str): The text passed to the LLM.
+        ollama_model (str): The name of the LLM.
+        response_model (Type[BaseModel]): The model the LLM output is validated against.
+    Returns:
+        str: The cache key.
+    """
+    payload = json.dumps(
+        [prompt, text_data, ollama_model, response_model.model_json_schema()],
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMCache(ABC):
+    """
+    Base class for LLM result caches.
+    Subclasses implement _get and _put; hit and miss counting is shared.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached result and record a hit or miss.
+        Args:
+            key (str): The cache key from llm_cache_key.
+        Returns:
+            Optional[str]: The cached JSON data, or None on a miss.
+        """
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key: str, value: str):
+        """
+        Store a validated result.
+        Args:
+            key (str): The cache key from llm_cache_key.
+            value (str): The JSON data to store.
+        """
+        self._put(key, value)
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: The number of cache hits and misses so far.
+        """
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached result without recording a hit or miss.
+        """
+
+    @abstractmethod
+    def _put(self, key: str, value: str):
+        """
+        Store a result.
+        """
+
+
+class SQLiteLLMCache(LLMCache):
+    """
+    LLM result cache stored in a SQLite database.
+    Entries older than ttl_seconds are treated as misses and removed.
+    When the cache holds more than max_entries, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        Args:
+            db_path (str): Path to the SQLite database file.
+            ttl_seconds (Optional[float]): Lifetime of an entry, or None for no expiry.
+            max_entries (Optional[int]): Maximum number of entries, or None for no limit.
+        """
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+
+            self._connection.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def _put(self, key: str, value: str):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            if self.ttl_seconds is not None:
+                self._connection.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            if self.max_entries is not None:
+                self._connection.execute(
+                    """
+                    DELETE FROM llm_cache WHERE key NOT IN (
+                        SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT ?
+                    )
+                    """,
+                    (self.max_entries,)
+                )
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,81 @@
+# model_registry.py
+"""
+This module keeps OCR converters and LLM model checks alive between requests.
+The OCR model is loaded and the Ollama model is checked once, on first use,
+and only again after the configuration they were built from changes.
+"""
+
+# imports
+from __future__ import annotations
+
+import threading
+from types import ModuleType
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from llm_document_parser.convert_doc_docling import load_ocr_model
+from llm_document_parser.model_store import ModelStore
+
+if TYPE_CHECKING:
+    from docling.document_converter import DocumentConverter
+
+
+class ModelRegistry:
+    """
+    Thread-safe, lazily built holder of the models used by the pipeline.
+    Settings are read from the config module on every call, so a reloaded
+    config is picked up; reload() also drops everything built so far.
+    """
+
+    def __init__(self, config: ModuleType):
+        """
+        Args:
+            config (ModuleType): The config module the models are built from.
+        """
+        self.config = config
+        self._ocr_lock = threading.Lock()
+        self._llm_lock = threading.Lock()
+        self._document_converter: Optional[DocumentConverter] = None
+        self._document_converter_key: Optional[Tuple[str, str, str, bool]] = None
+        self._checked_ollama_model: Optional[str] = None
+
+    def get_document_converter(self) -> DocumentConverter:
+        """
+        Get the OCR model selected in the config, loading it on first use.
+        Returns:
+            DocumentConverter: The loaded OCR model.
+        """
+        key = (self.config.OCR_MODEL, self.config.TESSERACT_TESSDATA_LOCATION, self.config.MODEL_DIR, self.config.MODELS_OFFLINE)
+        with self._ocr_lock:
+            if self._document_converter is None or self._document_converter_key != key:
+                print(f"Loading OCR model {self.config.OCR_MODEL}")
+                self._document_converter = load_ocr_model(key[0], key[1], self.model_store())
+                self._document_converter_key = key
+            return self._document_converter
+
+    def model_store(self) -> ModelStore:
+        """
+        Returns:
+            ModelStore: The local model directory selected in the config.
+        """
+        return ModelStore(self.config.MODEL_DIR, self.config.MODELS_OFFLINE)
+
+    def ensure_ollama_model(self):
+        """
+        Make sure the LLM selected in the config is downloaded, checking only once per model.
+        """
+        model = self.config.OLLAMA_MODEL
+        with self._llm_lock:
+            if self._checked_ollama_model == model:
+                return
+            self.model_store().ensure_ollama_model(model)
+            self._checked_ollama_model = model
+
+    def reload(self):
+        """
+        Drop the loaded models so they are rebuilt from the current config on next use.
+        """
+        with self._ocr_lock:
+            self._document_converter = None
+            self._document_converter_key = None
+        with self._llm_lock:
+            self._checked_ollama_model = None
@@ -0,0 +1,265 @@
+# model_store.py
+"""
+This module provisions the models used by the pipeline ahead of time.
+RapidOCR ONNX files, docling's layout, table and EasyOCR models and the
+Ollama LLM are fetched once into a local model directory by the prefetch
+command, and recorded in a manifest next to them. Later runs resolve the
+models from the manifest without any network calls or Ollama queries, so
+startup is fast and works in air-gapped containers.
+
+Usage:
+    python -m llm_document_parser.model_store prefetch
+"""
+
+# imports
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import ollama
+
+MANIFEST_FILE_NAME = "manifest.json"
+RAPID_OCR_REPO = "SWHL/RapidOCR"
+
+# Detection, recognition and classification ONNX files of each RapidOCR model type
+RAPID_OCR_MODEL_FILES: Dict[str, Tuple[str, str, str]] = {
+    "rapid": (
+        "PP-OCRv4/ch_PP-OCRv4_det_server_infer.onnx",
+        "PP-OCRv3/ch_PP-OCRv3_rec_infer.onnx",
+        "PP-OCRv3/ch_ppocr_mobile_v2.0_cls_train.onnx"
+    ),
+    # Smaller, faster detection model, suited as the first tier of tiered OCR
+    "rapid-mobile": (
+        "PP-OCRv4/ch_PP-OCRv4_det_infer.onnx",
+        "PP-OCRv3/ch_PP-OCRv3_rec_infer.onnx",
+        "PP-OCRv3/ch_ppocr_mobile_v2.0_cls_train.onnx"
+    ),
+}
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """
+    Local model directory with a JSON manifest of the models it holds.
+    Can be sent to worker processes; the manifest is re-read in each process.
+    """
+
+    def __init__(self, model_dir: str, offline: bool = False):
+        """
+        Args:
+            model_dir (str): Directory the models and manifest are stored in.
+            offline (bool): Whether to fail instead of downloading models missing from the directory.
+        """
+        self.model_dir = Path(model_dir)
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._manifest: Optional[dict] = None
+
+    def __getstate__(self):
+        return {"model_dir": self.model_dir, "offline": self.offline}
+
+    def __setstate__(self, state):
+        self.__init__(str(state["model_dir"]), state["offline"])
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.model_dir / MANIFEST_FILE_NAME
+
+    def manifest(self) -> dict:
+        """
+        Returns:
+            dict: The manifest, empty if nothing has been provisioned yet.
+        """
+        with self._lock:
+            if self._manifest is None:
+                self._manifest = json.loads(self.manifest_path.read_text()) if self.manifest_path.exists() else {}
+            return self._manifest
+
+    def _record(self, section: str, key: str, entry: dict):
+        manifest = self.manifest()
+        with self._lock:
+            manifest.setdefault(section, {})[key] = {**entry, "fetched_at": time.time()}
+            self.model_dir.mkdir(parents=True, exist_ok=True)
+            # Written atomically, so a reader never sees a half-written manifest
+            fd, tmp_path = tempfile.mkstemp(dir=self.model_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+
+    def _missing(self, what: str) -> FileNotFoundError:
+        return FileNotFoundError(
+            f"{what} is not in the model directory {self.model_dir}. "
+            f"Run `python -m llm_document_parser.model_store prefetch` with network access first."
+        )
+
+    def rapid_ocr_dir(self, model_files: Iterable[str]) -> str:
+        """
+        Get the directory holding the given RapidOCR ONNX files, downloading them unless offline.
+        Args:
+            model_files (Iterable[str]): Paths of the ONNX files within the RapidOCR repository.
+        Returns:
+            str: The directory the file paths are relative to.
+        """
+        rapid_ocr_dir = self.model_dir / "rapidocr"
+        recorded = self.manifest().get("rapidocr", {})
+        missing = [
+            model_file for model_file in model_files
+            if model_file not in recorded or not (rapid_ocr_dir / model_file).exists()
+        ]
+        if not missing:
+            return str(rapid_ocr_dir)
+        if self.offline:
+            raise self._missing(f"RapidOCR model {missing[0]}")
+        return self.prefetch_rapid_ocr(missing)
+
+    def prefetch_rapid_ocr(self, model_files: Iterable[str]) -> str:
+        """
+        Download RapidOCR ONNX files into the model directory and record them in the manifest.
+        Args:
+            model_files (Iterable[str]): Paths of the ONNX files within the RapidOCR repository.
+        Returns:
+            str: The directory the file paths are relative to.
+        """
+        from huggingface_hub import snapshot_download
+
+        model_files = list(model_files)
+        rapid_ocr_dir = self.model_dir / "rapidocr"
+        print(f"Downloading RapidOCR models {model_files} to {rapid_ocr_dir}")
+        snapshot_download(repo_id=RAPID_OCR_REPO, allow_patterns=model_files, local_dir=rapid_ocr_dir)
+        for model_file in model_files:
+            self._record("rapidocr", model_file, {"sha256": _sha256(rapid_ocr_dir / model_file)})
+        return str(rapid_ocr_dir)
+
+    def docling_artifacts_path(self) -> Optional[str]:
+        """
+        Get the directory holding docling's layout, table and EasyOCR models.
+        Returns:
+            Optional[str]: The directory, or None to let docling download the models itself.
+        """
+        artifacts_path = self.model_dir / "docling"
+        if "artifacts" in self.manifest().get("docling", {}) and artifacts_path.exists():
+            return str(artifacts_path)
+        if self.offline:
+            raise self._missing("The docling layout model")
+        return None
+
+    def prefetch_docling(self, with_easyocr: bool = False) -> str:
+        """
+        Download docling's layout and table models, and optionally EasyOCR's, into the model directory.
+        Args:
+            with_easyocr (bool): Whether to also download the EasyOCR models.
+        Returns:
+            str: The docling artifacts directory.
+        """
+        from docling.utils.model_downloader import download_models
+
+        artifacts_path = self.model_dir / "docling"
+        print(f"Downloading docling models to {artifacts_path}")
+        download_models(
+            output_dir=artifacts_path,
+            progress=True,
+            with_layout=True,
+            with_tableformer=True,
+            with_code_formula=False,
+            with_picture_classifier=False,
+            with_rapidocr=False,
+            with_easyocr=with_easyocr
+        )
+        self._record("docling", "artifacts", {"easyocr": with_easyocr})
+        return str(artifacts_path)
+
+    def ensure_ollama_model(self, model: str, client: Optional[ollama.Client] = None, host: str = "default"):
+        """
+        Make sure an Ollama server has a model, without querying it if the manifest says it does.
+        Args:
+            model (str): The name of the model.
+            client (Optional[ollama.Client]): Client of the Ollama server, or None for the local daemon.
+            host (str): Name of the Ollama server in the manifest.
+        """
+        if f"{host} {model}" in self.manifest().get("ollama", {}):
+            return
+        if self.offline:
+            print(f"Warning: Ollama model {model} on {host} is not in {self.manifest_path}, assuming it is installed")
+            return
+        self.prefetch_ollama_model(model, client, host)
+
+    def prefetch_ollama_model(self, model: str, client: Optional[ollama.Client] = None, host: str = "default"):
+        """
+        Pull a model onto an Ollama server and record it in the manifest.
+        Args:
+            model (str): The name of the model.
+            client (Optional[ollama.Client]): Client of the Ollama server, or None for the local daemon.
+            host (str): Name of the Ollama server in the manifest.
+        """
+        from llm_document_parser.instructor_llm import pull_ollama_model
+
+        pull_ollama_model(model, client)
+        self._record("ollama", f"{host} {model}", {"host": host, "model": model})
+
+    def prefetch(self, ocr_models: List[str], ollama_model: Optional[str] = None, ollama_hosts: Optional[List[str]] = None):
+        """
+        Fill the model directory with everything the given configuration needs.
+        Args:
+            ocr_models (List[str]): The OCR model types to provision, e.g. OCR_MODEL and OCR_FALLBACK_MODEL.
+            ollama_model (Optional[str]): The Ollama model to pull, or None to skip Ollama.
+            ollama_hosts (Optional[List[str]]): The Ollama servers to pull it onto, or None for the local daemon.
+        """
+        self.prefetch_docling(with_easyocr="easy" in ocr_models)
+        rapid_ocr_files = sorted({
+            model_file for ocr_model in ocr_models for model_file in RAPID_OCR_MODEL_FILES.get(ocr_model, ())
+        })
+        if rapid_ocr_files:
+            self.prefetch_rapid_ocr(rapid_ocr_files)
+        if ollama_model is not None:
+            import ollama
+
+            for host in ollama_hosts or [None]:
+                client = ollama.Client(host=host) if host else None
+                self.prefetch_ollama_model(ollama_model, client, host or "default")
+        print(f"Models provisioned in {self.model_dir}, manifest at {self.manifest_path}")
+
+
+def main(argv=None):
+    from llm_document_parser.config import (
+        MODEL_DIR,
+        OCR_FALLBACK_MODEL,
+        OCR_MODEL,
+        OLLAMA_HOSTS,
+        OLLAMA_MODEL,
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["prefetch"])
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="Directory to store the models in")
+    parser.add_argument("--ocr-models", nargs="+", default=[model for model in (OCR_MODEL, OCR_FALLBACK_MODEL) if model],
+                        help="OCR model types to provision")
+    parser.add_argument("--ollama-model", default=OLLAMA_MODEL, help="Ollama model to pull")
+    parser.add_argument("--ollama-hosts", nargs="*", default=OLLAMA_HOSTS, help="Ollama servers to pull the model onto")
+    parser.add_argument("--skip-ollama", action="store_true", help="Do not pull the Ollama model")
+    args = parser.parse_args(argv)
+
+    ModelStore(args.model_dir).prefetch(
+        args.ocr_models,
+        ollama_model=None if args.skip_ollama else args.ollama_model,
+        ollama_hosts=args.ollama_hosts
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# ocr_cache.py
+"""
+This module provides a persistent, content-addressed cache for OCR output.
+Entries are keyed on the SHA-256 of the input file plus a fingerprint of the
+document converter's OCR engine and pipeline options, so changing the LLM side
+of the pipeline never invalidates them.
+The cache is size-bounded and evicts least recently used entries first.
+"""
+
+# imports
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from docling.document_converter import DocumentConverter
+
+
+def hash_file(file_path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hash of a file's contents.
+    Args:
+        file_path (Path): Path to the file.
+        chunk_size (int): Number of bytes read at a time.
+    Returns:
+        str: The hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def converter_fingerprint(document_converter: DocumentConverter) -> str:
+    """
+    Build a stable fingerprint of a document converter's configuration.
+    Covers the pipeline, backend and pipeline options (including the OCR engine
+    options) configured for every input format.
+    Args:
+        document_converter (DocumentConverter): The document converter.
+    Returns:
+        str: A hex digest identifying the converter configuration.
+    """
+    config = {}
+    for input_format, format_option in sorted(document_converter.format_to_options.items(), key=lambda item: str(item[0])):
+        pipeline_options = format_option.pipeline_options
+        config[str(input_format)] = {
+            "pipeline": getattr(format_option.pipeline_cls, "__name__", str(format_option.pipeline_cls)),
+            "backend": getattr(format_option.backend, "__name__", str(format_option.backend)),
+            "pipeline_options": pipeline_options.model_dump(mode="json") if pipeline_options is not None else None,
+        }
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class OCRCache:
+    """
+    On-disk cache of OCR markdown output with LRU eviction.
+    Entries are stored as one file per key. Reads refresh the entry's
+    modification time, which is used as the LRU order during eviction.
+    Writes are atomic, so the cache can be shared between worker processes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        """
+        Args:
+            cache_dir (str): Directory the cache entries are stored in.
+            max_bytes (int): Maximum total size of the cache entries.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def key(self, file_path: Path, fingerprint: str) -> str:
+        """
+        Build the cache key for a file converted with a given converter configuration.
+        Args:
+            file_path (Path): Path to the input file.
+            fingerprint (str): The converter fingerprint from converter_fingerprint.
+        Returns:
+            str: The cache key.
+        """
+        return hashlib.sha256(f"{hash_file(file_path)}:{fingerprint}".encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.md"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cache entry.
+        Args:
+            key (str): The cache key.
+        Returns:
+            Optional[str]: The cached markdown, or None on a miss.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            text = entry_path.read_text(encoding="utf-8")
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        return text
+
+    def put(self, key: str, text: str):
+        """
+        Store a cache entry, then evict old entries if the cache is over its size limit.
+        Args:
+            key (str): The cache key.
+            text (str): The markdown to store.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, self._entry_path(key))
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        total_bytes = 0
+        for entry_path in self.cache_dir.glob("*.md"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+            total_bytes += stat.st_size
+
+        for _, size, entry_path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total_bytes -= size
@@ -0,0 +1,207 @@
+# ocr_fallback.py
+"""
+This module implements tiered OCR.
+Documents are converted with the fast OCR engine selected by OCR_MODEL. Pages
+whose OCR confidence is below a threshold are converted again with a slower,
+more accurate fallback engine, and whole documents are re-run through it when
+the LLM cannot produce a valid result from the fast engine's text.
+The fallback engine is only loaded once the first page is escalated.
+"""
+
+# imports
+from __future__ import annotations
+
+import math
+import threading
+from itertools import groupby
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from llm_document_parser.convert_doc_docling import image_to_text, load_ocr_model
+from llm_document_parser.instrumentation import metrics, span
+from llm_document_parser.model_store import ModelStore
+
+if TYPE_CHECKING:
+    from docling.datamodel.document import ConversionResult
+    from docling.document_converter import DocumentConverter
+
+
+def unparseable_llm_errors() -> Tuple[type, ...]:
+    """
+    The errors meaning the LLM could not turn the OCR text into the response model.
+    A function rather than a constant so instructor is only imported once an error is caught.
+    Returns:
+        Tuple[type, ...]: The exception types, for use in an except clause.
+    """
+    from instructor.core import IncompleteOutputException, InstructorRetryException
+    from pydantic import ValidationError
+
+    return (InstructorRetryException, IncompleteOutputException, ValidationError)
+
+
+class OCRFallback:
+    """
+    The slower, more accurate OCR engine used for pages the fast engine is unsure about.
+    Can be sent to worker processes; each process loads the engine on first use.
+    """
+
+    def __init__(
+        self,
+        model_type: str,
+        tessdata_location: str,
+        min_confidence: float,
+        model_store: Optional[ModelStore] = None
+    ):
+        """
+        Args:
+            model_type (str): The type of OCR model to fall back to.
+            tessdata_location (str): Path to the Tesseract data directory, used by the tesseract model.
+            min_confidence (float): Pages with a lower OCR confidence score (0 to 1) are escalated.
+            model_store (Optional[ModelStore]): Local model directory to load the model from,
+                or None to download it on demand.
+        """
+        self.model_type = model_type
+        self.tessdata_location = tessdata_location
+        self.min_confidence = min_confidence
+        self.model_store = model_store
+        self._lock = threading.Lock()
+        self._document_converter: Optional[DocumentConverter] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_document_converter"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def document_converter(self) -> DocumentConverter:
+        """
+        The fallback OCR model, loaded on first use.
+        """
+        with self._lock:
+            if self._document_converter is None:
+                print(f"Loading fallback OCR model {self.model_type}")
+                self._document_converter = load_ocr_model(self.model_type, self.tessdata_location, self.model_store)
+            return self._document_converter
+
+def low_confidence_pages(conversion_result: ConversionResult, min_confidence: float) -> List[int]:
+    """
+    Find the pages of a conversion whose OCR confidence is below a threshold.
+    Pages without an OCR score, e.g. because no OCR was needed, are never escalated.
+    Args:
+        conversion_result (ConversionResult): The result of the fast OCR engine.
+        min_confidence (float): The lowest acceptable OCR confidence score (0 to 1).
+    Returns:
+        List[int]: The page numbers to escalate, in order.
+    """
+    pages = []
+    for page in conversion_result.pages:
+        score = conversion_result.confidence.pages[page.page_no].ocr_score
+        if not math.isnan(score) and score < min_confidence:
+            pages.append(page.page_no)
+    return pages
+
+def _page_runs(page_numbers: List[int]) -> List[Tuple[int, int]]:
+    runs = []
+    for _, run in groupby(enumerate(page_numbers), key=lambda item: item[1] - item[0]):
+        run = [page_no for _, page_no in run]
+        runs.append((run[0], run[-1]))
+    return runs
+
+def merge_escalated_pages(
+    conversion_result: ConversionResult,
+    fallback: OCRFallback,
+    reconvert: Callable[[DocumentConverter, List[int]], Dict[int, str]],
+    page_break_placeholder: Optional[str] = None,
+    document: Optional[str] = None
+) -> str:
+    """
+    Re-run the low-confidence pages of a conversion through the fallback engine and export the merged markdown.
+    Args:
+        conversion_result (ConversionResult): The result of the fast OCR engine.
+        fallback (OCRFallback): The fallback OCR engine.
+        reconvert (Callable[[DocumentConverter, List[int]], Dict[int, str]]): Converts the given pages
+            with the given converter and returns their markdown by page number.
+        page_break_placeholder (Optional[str]): Marker written between pages, or None for no marker.
+        document (Optional[str]): Name of the document, used in logs and metrics.
+    Returns:
+        str: The markdown of every page, from the fallback engine for escalated pages.
+    """
+    page_numbers = [page.page_no for page in conversion_result.pages]
+    escalated = low_confidence_pages(conversion_result, fallback.min_confidence)
+    metrics.increment("ocr_pages", len(page_numbers), file=document)
+    if not escalated:
+        return conversion_result.document.export_to_markdown(page_break_placeholder=page_break_placeholder)
+
+    for page_no in escalated:
+        score = conversion_result.confidence.pages[page_no].ocr_score
+        print(f"{document} page {page_no}: OCR confidence {score:.2f} < {fallback.min_confidence}, re-running with {fallback.model_type}")
+    metrics.increment("ocr_pages_escalated", len(escalated), file=document, reason="low_confidence")
+
+    with span("ocr_fallback", file=document, pages=len(escalated)):
+        fallback_markdown = reconvert(fallback.document_converter, escalated)
+    return (page_break_placeholder or "\n\n").join(
+        fallback_markdown[page_no] if page_no in fallback_markdown
+        else conversion_result.document.export_to_markdown(page_no=page_no)
+        for page_no in page_numbers
+    )
+
+def convert_file_with_fallback(
+    document_converter: DocumentConverter,
+    fallback: OCRFallback,
+    input_path: Path,
+    page_break_placeholder: Optional[str] = None,
+    page_range: Optional[Tuple[int, int]] = None
+) -> str:
+    """
+    Convert a file with the fast OCR engine, escalating low-confidence pages to the fallback engine.
+    Args:
+        document_converter (DocumentConverter): The fast OCR engine.
+        fallback (OCRFallback): The fallback OCR engine.
+        input_path (Path): The file to convert.
+        page_break_placeholder (Optional[str]): Marker written between pages, or None for no marker.
+        page_range (Optional[Tuple[int, int]]): First and last page to convert, or None for all pages.
+    Returns:
+        str: The markdown export of the converted document.
+    """
+    def reconvert(fallback_converter: DocumentConverter, page_numbers: List[int]) -> Dict[int, str]:
+        markdown = {}
+        for run_range in _page_runs(page_numbers):
+            result = image_to_text(fallback_converter, input_path, run_range)
+            for page_no in range(run_range[0], run_range[1] + 1):
+                markdown[page_no] = result.document.export_to_markdown(page_no=page_no)
+        return markdown
+
+    with span("image_to_text", file=str(input_path), page_range=page_range):
+        conversion_result = image_to_text(document_converter, input_path, page_range)
+    with span("export_to_markdown", file=str(input_path), page_range=page_range):
+        return merge_escalated_pages(conversion_result, fallback, reconvert, page_break_placeholder, str(input_path))
+
+def record_llm_escalation(input_path: Path, error: Exception):
+    """
+    Log and count a document re-run through the fallback engine because the LLM could not parse its text.
+    """
+    print(f"LLM could not parse the OCR text of {input_path} ({type(error).__name__}), re-running OCR with the fallback model")
+    metrics.increment("ocr_documents_escalated", file=str(input_path), reason="llm_failure")
+
+def escalation_stats() -> Dict[str, float]:
+    """
+    Summarize the escalations counted in this process, including those of OCR worker
+    processes, whose counters are returned with each result of the OCRWorkerPool.
+    Returns:
+        Dict[str, float]: Pages converted, pages escalated for low confidence, the escalated
+        share of pages and documents escalated after an LLM failure.
+    """
+    counters = metrics.snapshot()["counters"]
+    pages = counters.get("ocr_pages", 0)
+    escalated = counters.get("ocr_pages_escalated", 0)
+    return {
+        "pages": pages,
+        "pages_escalated": escalated,
+        "page_escalation_rate": escalated / pages if pages else 0.0,
+        "documents_escalated": counters.get("ocr_documents_escalated", 0),
+    }
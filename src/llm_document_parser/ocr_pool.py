@@ -0,0 +1,436 @@
+# ocr_pool.py
+"""
+This module runs OCR in a pool of worker processes.
+Each worker builds its DocumentConverter once, with the same settings as
+load_ocr_model, and reuses it for every document it is sent. Large PDFs can be
+split into page ranges that are converted by different workers, and the
+markdown of each document is streamed back as soon as all its parts are done.
+Counters the workers add, e.g. pages escalated to the fallback OCR engine, are
+returned with each result and added to the metrics of the parent process.
+"""
+
+# imports
+from __future__ import annotations
+
+import os
+from itertools import groupby
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from llm_document_parser.convert_doc_docling import (
+    count_pdf_pages,
+    image_to_text,
+    images_to_text,
+    load_ocr_model,
+    pdf_text_layers,
+    text_layer_converter,
+)
+from llm_document_parser.ocr_cache import OCRCache, converter_fingerprint
+from llm_document_parser.ocr_fallback import OCRFallback, convert_file_with_fallback, merge_escalated_pages
+from llm_document_parser.model_store import ModelStore
+from llm_document_parser.instrumentation import JSONLogSink, metrics, span
+
+if TYPE_CHECKING:
+    from docling.document_converter import DocumentConverter
+
+PageRange = Optional[Tuple[int, int]]
+
+
+def convert_preprocessed_pages(
+    document_converter: DocumentConverter,
+    input_path: Path,
+    batch_size: int,
+    page_break_placeholder: Optional[str] = None,
+    page_range: PageRange = None,
+    fallback: Optional[OCRFallback] = None
+) -> str:
+    """
+    Preprocess the pages of a file in memory and convert them in batches, without temporary files.
+    Args:
+        document_converter (DocumentConverter): The document converter to use.
+        input_path (Path): The file to convert.
+        batch_size (int): Number of pages preprocessed and converted together.
+        page_break_placeholder (Optional[str]): Marker written between pages, or None for no marker.
+        page_range (Optional[Tuple[int, int]]): First and last page to convert, or None for all pages.
+        fallback (Optional[OCRFallback]): Engine low-confidence pages are converted again with, or None.
+    Returns:
+        str: The markdown export of the converted pages.
+    """
+    from llm_document_parser.preprocessing.ocr_preprocessing import load_page_images, preprocess_images
+
+    pages = load_page_images(input_path, page_range=page_range)
+    parts = []
+    for start in range(0, len(pages), batch_size):
+        with span("preprocess_images", file=str(input_path), pages=len(pages[start:start + batch_size])):
+            batch = preprocess_images(pages[start:start + batch_size])
+        with span("image_to_text", file=str(input_path), page_range=page_range):
+            conversion_result = images_to_text(document_converter, batch, Path(input_path).name)
+        with span("export_to_markdown", file=str(input_path), page_range=page_range):
+            if fallback is None:
+                parts.append(conversion_result.document.export_to_markdown(page_break_placeholder=page_break_placeholder))
+                continue
+
+            def reconvert(fallback_converter: DocumentConverter, page_numbers: List[int]) -> Dict[int, str]:
+                # Pages of the in-memory PDF are numbered from 1 within the batch
+                result = images_to_text(fallback_converter, [batch[page_no - 1] for page_no in page_numbers], Path(input_path).name)
+                return {
+                    page_no: result.document.export_to_markdown(page_no=index)
+                    for index, page_no in enumerate(page_numbers, start=1)
+                }
+
+            parts.append(merge_escalated_pages(conversion_result, fallback, reconvert, page_break_placeholder, str(input_path)))
+    return (page_break_placeholder or "\n\n").join(parts)
+
+def _run_ocr(
+    document_converter: DocumentConverter,
+    input_path: Path,
+    page_break_placeholder: Optional[str],
+    page_range: PageRange,
+    preprocess_batch_size: int,
+    fallback: Optional[OCRFallback]
+) -> str:
+    if preprocess_batch_size > 0:
+        return convert_preprocessed_pages(
+            document_converter, input_path, preprocess_batch_size, page_break_placeholder, page_range, fallback
+        )
+    if fallback is not None:
+        return convert_file_with_fallback(document_converter, fallback, input_path, page_break_placeholder, page_range)
+    with span("image_to_text", file=str(input_path), page_range=page_range):
+        conversion_result = image_to_text(document_converter, input_path, page_range)
+    with span("export_to_markdown", file=str(input_path), page_range=page_range):
+        return conversion_result.document.export_to_markdown(page_break_placeholder=page_break_placeholder)
+
+def convert_pdf_using_text_layer(
+    document_converter: DocumentConverter,
+    input_path: Path,
+    text_layer_min_chars: int,
+    page_break_placeholder: Optional[str] = None,
+    page_range: PageRange = None,
+    preprocess_batch_size: int = 0,
+    fallback: Optional[OCRFallback] = None
+) -> str:
+    """
+    Convert a PDF, reading pages with a usable text layer directly and running OCR only on scanned pages.
+    Consecutive pages with the same decision are converted together.
+    Args:
+        document_converter (DocumentConverter): The OCR document converter.
+        input_path (Path): The PDF to convert.
+        text_layer_min_chars (int): Minimum number of readable characters for a page's text layer to be used.
+        page_break_placeholder (Optional[str]): Marker written between pages, or None for no marker.
+        page_range (Optional[Tuple[int, int]]): First and last page to convert, or None for all pages.
+        preprocess_batch_size (int): Pages preprocessed in memory before OCR, or 0 to OCR them unchanged.
+        fallback (Optional[OCRFallback]): Engine low-confidence OCR pages are converted again with, or None.
+    Returns:
+        str: The markdown export of the converted document.
+    """
+    with span("detect_text_layer", file=str(input_path), page_range=page_range):
+        pages = pdf_text_layers(input_path, text_layer_min_chars, page_range)
+    for page in pages:
+        decision = "text layer" if page.usable else "OCR"
+        print(f"{input_path} page {page.page_no}: {page.char_count} characters in text layer, using {decision}")
+        metrics.increment("pdf_pages_text_layer" if page.usable else "pdf_pages_ocr", file=str(input_path), page=page.page_no)
+
+    parts = []
+    for usable, run in groupby(pages, key=lambda page: page.usable):
+        run = list(run)
+        run_range = (run[0].page_no, run[-1].page_no)
+        if not usable:
+            parts.append(_run_ocr(document_converter, input_path, page_break_placeholder, run_range, preprocess_batch_size, fallback))
+            continue
+        with span("text_layer_to_text", file=str(input_path), page_range=run_range):
+            conversion_result = image_to_text(text_layer_converter(document_converter), input_path, run_range)
+        with span("export_to_markdown", file=str(input_path), page_range=run_range):
+            parts.append(conversion_result.document.export_to_markdown(page_break_placeholder=page_break_placeholder))
+    return (page_break_placeholder or "\n\n").join(parts)
+
+def convert_to_markdown(
+    document_converter: DocumentConverter,
+    input_path: Path,
+    ocr_cache: Optional[OCRCache] = None,
+    page_break_placeholder: Optional[str] = None,
+    page_range: PageRange = None,
+    preprocess_batch_size: int = 0,
+    text_layer_min_chars: int = 0,
+    fallback: Optional[OCRFallback] = None
+) -> str:
+    """
+    Run OCR on a file, or a range of its pages, and return the text as markdown.
+    Args:
+        document_converter (DocumentConverter): The document converter to use.
+        input_path (Path): The file to convert.
+        ocr_cache (Optional[OCRCache]): Cache of earlier OCR results, or None to always run OCR.
+        page_break_placeholder (Optional[str]): Marker written between pages, or None for no marker.
+        page_range (Optional[Tuple[int, int]]): First and last page to convert, or None for all pages.
+        preprocess_batch_size (int): Pages preprocessed in memory and converted together, or 0 to
+            convert the file unchanged.
+        text_layer_min_chars (int): Readable characters a PDF page's text layer needs to be used
+            instead of OCR, or 0 to always run OCR.
+        fallback (Optional[OCRFallback]): Engine low-confidence OCR pages are converted again with, or None.
+    Returns:
+        str: The markdown export of the converted document.
+    """
+    if ocr_cache is not None:
+        settings = (
+            page_break_placeholder,
+            page_range,
+            preprocess_batch_size,
+            text_layer_min_chars,
+            fallback and (fallback.model_type, fallback.min_confidence)
+        )
+        cache_key = ocr_cache.key(input_path, f"{converter_fingerprint(document_converter)}:{settings}")
+        ocr_text_data = ocr_cache.get(cache_key)
+        if ocr_text_data is not None:
+            print(f"Using cached OCR text for file {input_path}")
+            metrics.increment("ocr_cache_hits")
+            return ocr_text_data
+        metrics.increment("ocr_cache_misses")
+
+    if text_layer_min_chars > 0 and Path(input_path).suffix.lower() == ".pdf":
+        ocr_text_data = convert_pdf_using_text_layer(
+            document_converter, input_path, text_layer_min_chars, page_break_placeholder, page_range, preprocess_batch_size, fallback
+        )
+    else:
+        ocr_text_data = _run_ocr(document_converter, input_path, page_break_placeholder, page_range, preprocess_batch_size, fallback)
+
+    if ocr_cache is not None:
+        ocr_cache.put(cache_key, ocr_text_data)
+    return ocr_text_data
+
+
+# State of each worker process, set up once by _init_worker
+_worker_document_converter: Optional[DocumentConverter] = None
+_worker_ocr_cache: Optional[OCRCache] = None
+_worker_page_break_placeholder: Optional[str] = None
+_worker_preprocess_batch_size: int = 0
+_worker_text_layer_min_chars: int = 0
+_worker_ocr_fallback: Optional[OCRFallback] = None
+
+def _init_worker(
+    model_type: str,
+    tessdata_location: str,
+    threads_per_worker: int,
+    ocr_cache: Optional[OCRCache],
+    page_break_placeholder: Optional[str],
+    metrics_log_path: Optional[str],
+    preprocess_batch_size: int,
+    text_layer_min_chars: int,
+    ocr_fallback: Optional[OCRFallback],
+    model_store: Optional[ModelStore]
+):
+    global _worker_document_converter, _worker_ocr_cache, _worker_page_break_placeholder
+    global _worker_preprocess_batch_size, _worker_text_layer_min_chars, _worker_ocr_fallback
+    if metrics_log_path:
+        metrics.add_sink(JSONLogSink(metrics_log_path))
+    if threads_per_worker > 0:
+        # Read by docling's accelerator options and by torch when they are first used
+        os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+    _worker_document_converter = load_ocr_model(model_type, tessdata_location, model_store)
+    _worker_ocr_cache = ocr_cache
+    _worker_page_break_placeholder = page_break_placeholder
+    _worker_preprocess_batch_size = preprocess_batch_size
+    _worker_text_layer_min_chars = text_layer_min_chars
+    _worker_ocr_fallback = ocr_fallback
+
+def _run_in_worker(function: Callable[..., str], *args) -> Tuple[str, Dict[str, float]]:
+    # Counters of a worker, e.g. pages escalated to the fallback engine, only exist in its process,
+    # so each task returns what it added for the parent to aggregate.
+    # A worker runs one task at a time, so the difference is this task's alone.
+    before = metrics.snapshot()["counters"]
+    result = function(*args)
+    after = metrics.snapshot()["counters"]
+    return result, {name: value - before.get(name, 0) for name, value in after.items() if value != before.get(name, 0)}
+
+def _convert_in_worker(input_path: Path, page_range: PageRange) -> str:
+    return convert_to_markdown(
+        _worker_document_converter,
+        input_path,
+        _worker_ocr_cache,
+        _worker_page_break_placeholder,
+        page_range,
+        _worker_preprocess_batch_size,
+        _worker_text_layer_min_chars,
+        _worker_ocr_fallback
+    )
+
+def _convert_with_fallback_in_worker(input_path: Path) -> str:
+    return convert_to_markdown(
+        _worker_ocr_fallback.document_converter,
+        input_path,
+        _worker_ocr_cache,
+        _worker_page_break_placeholder,
+        None,
+        _worker_preprocess_batch_size,
+        _worker_text_layer_min_chars
+    )
+
+
+class OCRWorkerPool:
+    """
+    Pool of OCR worker processes that each keep a DocumentConverter loaded.
+    Use as a context manager so the worker processes are shut down afterwards.
+    """
+
+    def __init__(
+        self,
+        model_type: str,
+        tessdata_location: str,
+        workers: int = 0,
+        threads_per_worker: int = 1,
+        max_pending: int = 0,
+        pages_per_task: int = 0,
+        ocr_cache: Optional[OCRCache] = None,
+        page_break_placeholder: Optional[str] = None,
+        metrics_log_path: Optional[str] = None,
+        preprocess_batch_size: int = 0,
+        text_layer_min_chars: int = 0,
+        ocr_fallback: Optional[OCRFallback] = None,
+        model_store: Optional[ModelStore] = None
+    ):
+        """
+        Args:
+            model_type (str): The type of OCR model each worker loads.
+            tessdata_location (str): Path to the Tesseract data directory, used by the tesseract model.
+            workers (int): Number of worker processes, or 0 for one per CPU core.
+            threads_per_worker (int): Thread limit of each worker's OCR and ML libraries, or 0 for no limit.
+            max_pending (int): Maximum number of tasks submitted but not yet returned, or 0 for twice the number of workers.
+            pages_per_task (int): Pages of a PDF converted by one task, or 0 to convert each file in one task.
+            ocr_cache (Optional[OCRCache]): Cache of earlier OCR results, or None to always run OCR.
+            page_break_placeholder (Optional[str]): Marker written between pages, or None for no marker.
+            metrics_log_path (Optional[str]): JSON Lines file the workers log their OCR timings to, or None.
+            preprocess_batch_size (int): Pages each worker preprocesses in memory and converts together,
+                or 0 to convert files unchanged.
+            text_layer_min_chars (int): Readable characters a PDF page's text layer needs to be used
+                instead of OCR, or 0 to always run OCR.
+            ocr_fallback (Optional[OCRFallback]): Engine low-confidence pages, and files passed to
+                convert_with_fallback, are converted with, or None.
+            model_store (Optional[ModelStore]): Local model directory the workers load their models from,
+                or None to download them on demand.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self.pages_per_task = pages_per_task
+        self.page_break_placeholder = page_break_placeholder
+        self.ocr_fallback = ocr_fallback
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(
+                model_type,
+                tessdata_location,
+                threads_per_worker,
+                ocr_cache,
+                page_break_placeholder,
+                metrics_log_path,
+                preprocess_batch_size,
+                text_layer_min_chars,
+                ocr_fallback,
+                model_store
+            )
+        )
+
+    def __enter__(self) -> "OCRWorkerPool":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def shutdown(self, cancel_pending: bool = False):
+        """
+        Stop the worker processes.
+        Args:
+            cancel_pending (bool): Whether to cancel tasks that have not started yet.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+    def _page_ranges(self, input_path: Path) -> List[PageRange]:
+        if self.pages_per_task <= 0 or input_path.suffix.lower() != ".pdf":
+            return [None]
+        page_count = count_pdf_pages(input_path)
+        if page_count <= self.pages_per_task:
+            return [None]
+        return [
+            (first_page, min(first_page + self.pages_per_task - 1, page_count))
+            for first_page in range(1, page_count + 1, self.pages_per_task)
+        ]
+
+    def _join_parts(self, parts: List[str]) -> str:
+        return (self.page_break_placeholder or "\n\n").join(parts)
+
+    def convert(self, input_path: Path) -> str:
+        """
+        Convert a single file, splitting it across workers by page range if configured.
+        Args:
+            input_path (Path): The file to convert.
+        Returns:
+            str: The markdown export of the converted document.
+        """
+        for _, _, ocr_text_data in self.imap_unordered([input_path]):
+            return ocr_text_data
+        return ""
+
+    def convert_with_fallback(self, input_path: Path) -> str:
+        """
+        Convert a whole file with the fallback OCR engine, e.g. after the LLM could not parse its text.
+        Args:
+            input_path (Path): The file to convert.
+        Returns:
+            str: The markdown export of the converted document.
+        """
+        if self.ocr_fallback is None:
+            raise ValueError("The OCR worker pool has no fallback OCR model")
+        ocr_text_data, counters = self._executor.submit(_run_in_worker, _convert_with_fallback_in_worker, input_path).result()
+        metrics.add_counters(counters)
+        return ocr_text_data
+
+    def imap_unordered(self, input_paths: Iterable[Path], return_exceptions: bool = False) -> Iterator[Tuple[int, Path, Union[str, Exception]]]:
+        """
+        Convert files in the worker processes and yield each one as soon as it is done.
+        At most max_pending tasks are in flight; new tasks are only submitted while the
+        caller is consuming results, which applies backpressure to the OCR stage.
+        Args:
+            input_paths (Iterable[Path]): The files to convert.
+            return_exceptions (bool): Whether to yield the error of a failed file instead of raising it.
+        Yields:
+            Tuple[int, Path, Union[str, Exception]]: The index of each file in input_paths, the file and
+            its markdown (or error), in completion order.
+        """
+        def tasks():
+            for index, input_path in enumerate(input_paths):
+                page_ranges = self._page_ranges(Path(input_path))
+                file_parts[index] = [None] * len(page_ranges)
+                file_paths[index] = Path(input_path)
+                for part, page_range in enumerate(page_ranges):
+                    yield index, part, page_range
+
+        file_parts: Dict[int, List[Optional[Union[str, Exception]]]] = {}
+        file_paths: Dict[int, Path] = {}
+        pending: Dict[Future, Tuple[int, int]] = {}
+        task_iterator = tasks()
+
+        def submit_tasks():
+            while len(pending) < self.max_pending:
+                task = next(task_iterator, None)
+                if task is None:
+                    return
+                index, part, page_range = task
+                future = self._executor.submit(_run_in_worker, _convert_in_worker, file_paths[index], page_range)
+                pending[future] = (index, part)
+
+        submit_tasks()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, part = pending.pop(future)
+                error = future.exception()
+                if error is not None and not return_exceptions:
+                    raise error
+                if error is None:
+                    ocr_text_data, counters = future.result()
+                    metrics.add_counters(counters)
+                file_parts[index][part] = ocr_text_data if error is None else error
+                if all(text is not None for text in file_parts[index]):
+                    parts = file_parts.pop(index)
+                    errors = [part for part in parts if isinstance(part, Exception)]
+                    yield index, file_paths.pop(index), errors[0] if errors else self._join_parts(parts)
+            submit_tasks()
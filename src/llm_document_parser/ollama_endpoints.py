@@ -0,0 +1,212 @@
+# ollama_endpoints.py
+"""
+This module spreads LLM extraction requests across several Ollama servers.
+Requests go to the healthy endpoint with the fewest requests in flight.
+Endpoints are probed with ollama.list() periodically and skipped while they
+are unreachable.
+"""
+
+# imports
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Type
+
+from pydantic import BaseModel
+
+from llm_document_parser.instructor_llm import extract_data_using_ollama_llm, get_cached_result, pull_ollama_model
+from llm_document_parser.model_store import ModelStore
+from llm_document_parser.llm_cache import LLMCache, llm_cache_key
+
+
+class OllamaEndpoint:
+    """
+    A single Ollama server and its load balancing state.
+    """
+
+    def __init__(self, host: str, timeout: float):
+        """
+        Args:
+            host (str): The Ollama server URL, e.g. "http://localhost:11434".
+            timeout (float): Timeout in seconds for health probes.
+        """
+        import ollama
+
+        self.host = host.rstrip("/")
+        self.base_url = f"{self.host}/v1"
+        self.client = ollama.Client(host=self.host, timeout=timeout)
+        # Pulling a model answers only once it is downloaded, which can take many minutes
+        self.pull_client = ollama.Client(host=self.host, timeout=None)
+        self.outstanding = 0
+        self.healthy = True
+
+    def check_health(self) -> bool:
+        """
+        Probe the server with ollama.list() and record whether it answered.
+        Returns:
+            bool: Whether the server is healthy.
+        """
+        try:
+            self.client.list()
+            self.healthy = True
+        except Exception as e:
+            if self.healthy:
+                print(f"Ollama endpoint {self.host} is unhealthy: {e}")
+            self.healthy = False
+        return self.healthy
+
+
+class OllamaEndpointPool:
+    """
+    Load balancer over several Ollama servers.
+    """
+
+    def __init__(self, hosts: List[str], health_check_interval: float = 30, timeout: float = 10):
+        """
+        Args:
+            hosts (List[str]): The Ollama server URLs.
+            health_check_interval (float): Seconds between background health probes.
+            timeout (float): Timeout in seconds for health probes. Model pulls have no timeout.
+        """
+        if not hosts:
+            raise ValueError("At least one Ollama host is required")
+        self.endpoints = [OllamaEndpoint(host, timeout) for host in hosts]
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+    def check_health(self) -> List[OllamaEndpoint]:
+        """
+        Probe every endpoint.
+        Returns:
+            List[OllamaEndpoint]: The healthy endpoints.
+        """
+        return [endpoint for endpoint in self.endpoints if endpoint.check_health()]
+
+    def start_health_checks(self):
+        """
+        Probe every endpoint now, then keep probing in a background thread.
+        """
+        self.check_health()
+        if self._health_thread is not None:
+            return
+        self._stop_event.clear()
+        self._health_thread = threading.Thread(target=self._health_check_loop, daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self):
+        """
+        Stop the background health check thread.
+        """
+        self._stop_event.set()
+        if self._health_thread is not None:
+            self._health_thread.join()
+            self._health_thread = None
+
+    def _health_check_loop(self):
+        while not self._stop_event.wait(self.health_check_interval):
+            self.check_health()
+
+    def pull_model(self, model: str, model_store: Optional[ModelStore] = None):
+        """
+        Make sure a model is available on every healthy endpoint.
+        Args:
+            model (str): The name of the model.
+            model_store (Optional[ModelStore]): Manifest of models already provisioned, so endpoints
+                recorded in it are not queried, or None to check every endpoint.
+        """
+        for endpoint in self.check_health():
+            if model_store is not None:
+                model_store.ensure_ollama_model(model, endpoint.pull_client, endpoint.host)
+                continue
+            print(f"Checking model {model} on {endpoint.host}")
+            pull_ollama_model(model, client=endpoint.pull_client)
+
+    @contextmanager
+    def acquire(self, exclude: Optional[List[OllamaEndpoint]] = None) -> Iterator[OllamaEndpoint]:
+        """
+        Reserve the healthy endpoint with the fewest outstanding requests.
+        Args:
+            exclude (Optional[List[OllamaEndpoint]]): Endpoints not to choose.
+        Yields:
+            OllamaEndpoint: The chosen endpoint.
+        """
+        with self._lock:
+            candidates = [
+                endpoint for endpoint in self.endpoints
+                if endpoint.healthy and endpoint not in (exclude or [])
+            ]
+            if not candidates:
+                raise RuntimeError("No healthy Ollama endpoints available")
+            endpoint = min(candidates, key=lambda candidate: candidate.outstanding)
+            endpoint.outstanding += 1
+        try:
+            yield endpoint
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def extract_data(
+        self,
+        prompt: str,
+        text_data: str,
+        ollama_model: str,
+        response_model: Type[BaseModel],
+        cache: Optional[LLMCache] = None
+    ) -> BaseModel:
+        """
+        Run extract_data_using_ollama_llm on the least loaded healthy endpoint.
+        Cache hits are answered before an endpoint is reserved, so they do not need a
+        healthy endpoint. If the request fails and the endpoint no longer passes a
+        health check, the request is retried on another endpoint.
+        Args:
+            prompt (str): The system prompt.
+            text_data (str): The text passed to the LLM.
+            ollama_model (str): The name of the LLM.
+            response_model (Type[BaseModel]): The model the LLM output is validated against.
+            cache (Optional[LLMCache]): Cache of earlier LLM results.
+        Returns:
+            BaseModel: The extracted data, validated against response_model.
+        """
+        if cache is not None:
+            cache_key = llm_cache_key(prompt, text_data, ollama_model, response_model)
+            cached_result = get_cached_result(cache, cache_key, response_model)
+            if cached_result is not None:
+                return cached_result
+
+        failed_endpoints: List[OllamaEndpoint] = []
+        while True:
+            with self.acquire(exclude=failed_endpoints) as endpoint:
+                try:
+                    result = extract_data_using_ollama_llm(
+                        prompt=prompt,
+                        text_data=text_data,
+                        ollama_model=ollama_model,
+                        response_model=response_model,
+                        base_url=endpoint.base_url
+                    )
+                    break
+                except Exception:
+                    if endpoint.check_health():
+                        raise
+                    print(f"Retrying request on another endpoint after {endpoint.host} failed")
+                    failed_endpoints.append(endpoint)
+
+        if cache is not None:
+            cache.put(cache_key, result.model_dump_json())
+        return result
+
+    def extract_json_data(
+        self,
+        prompt: str,
+        text_data: str,
+        ollama_model: str,
+        response_model: Type[BaseModel],
+        cache: Optional[LLMCache] = None
+    ) -> str:
+        """
+        Version of extract_data that returns the result as an indented JSON string, for display.
+        Returns:
+            str: The extracted data as a JSON string.
+        """
+        return self.extract_data(prompt, text_data, ollama_model, response_model, cache).model_dump_json(indent=4)
@@ -5,31 +5,50 @@ It includes functions to clean the text, normalize whitespace,
 remove headers and footers, standardize dates and amounts,
 and extract transaction lines.
 It uses regular expressions for text manipulation.
+All patterns are compiled once at import time. preprocess_text runs every
+enabled step in a single line-by-line pass, rejecting non-transaction lines
+before any other work is done on them.
 """
 
 # imports
 import re
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from llm_document_parser.instrumentation import span
+
+# Runs of whitespace other than newlines
+HORIZONTAL_WHITESPACE = re.compile(r'[^\S\n]+')
+HEADER_FOOTER = re.compile(r'Page \d+ of \d+|CONFIDENTIAL', flags=re.IGNORECASE)
+DATE = re.compile(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b')
+# A dollar sign directly in front of an amount
+CURRENCY_SYMBOL = re.compile(r'\$\s*(?=-?\d)')
+# A comma between groups of three digits. Starting on the literal comma lets the
+# regex engine skip ahead to candidates instead of trying the lookbehind everywhere.
+THOUSANDS_SEPARATOR = re.compile(r',(?<=\d,)(?=\d{3}(?!\d))')
+# A date, either M/D/Y or already standardized Y-M-D, followed by an amount later on the line
+TRANSACTION_LINE = re.compile(r'\b(?:\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}-\d{1,2}-\d{1,2})\b.+?\d')
 
 def clean_text(text):
     """
-    Clean the text by removing unnecessary whitespace and newlines. 
+    Clean the text by removing unnecessary whitespace and newlines.
     Args:
         text (str): The input text.
     Returns:
         str: The cleaned text.
     """
-    lines = text.splitlines()
-    return "\n".join([line.strip() for line in lines if line.strip()])
+    return "\n".join(filter(None, map(str.strip, text.splitlines())))
 
 def normalize_whitespace(text):
     """
     Normalize whitespace in the text by replacing multiple spaces with a single space.
+    Newlines are kept so the text can still be processed line by line.
     Args:
         text (str): The input text.
     Returns:
         str: The text with normalized whitespace.
     """
-    return re.sub(r'\s+', ' ', text)
+    return HORIZONTAL_WHITESPACE.sub(' ', text)
 
 def remove_headers_footers(text):
     """
@@ -39,7 +58,30 @@ def remove_headers_footers(text):
     Returns:
         str: The text without headers and footers.
     """
-    return re.sub(r'Page \d+ of \d+|CONFIDENTIAL', '', text, flags=re.IGNORECASE)
+    return HEADER_FOOTER.sub('', text)
+
+@lru_cache(maxsize=4096)
+def _standard_date(date):
+    month, day, year = re.split(r'[/-]', date)
+    year = f"20{year}" if len(year) == 2 else year
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+def _fix_date(match):
+    return _standard_date(match.group())
+
+def _has_date_separator(line):
+    return '/' in line or '-' in line
+
+def is_transaction_line(line):
+    """
+    Check whether a line looks like a transaction, i.e. a date followed by an amount.
+    Args:
+        line (str): A single line of text.
+    Returns:
+        bool: True if the line is a transaction line.
+    """
+    # A substring check is much cheaper than the regex search and rejects most lines
+    return _has_date_separator(line) and TRANSACTION_LINE.search(line) is not None
 
 def standardize_dates(text):
     """
@@ -49,22 +91,17 @@ def standardize_dates(text):
     Returns:
         str: The text with standardized dates.
     """
-    pattern = re.compile(r'\b(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})\b')
-    def fix(match):
-        month, day, year = match.groups()
-        year = f"20{year}" if len(year) == 2 else year
-        return f"{year}-{int(month):02d}-{int(day):02d}"
-    return pattern.sub(fix, text)
+    return DATE.sub(_fix_date, text)
 
 def standardize_amounts(text):
     """
-    Standardize amounts in the text by removing commas and converting to float.
+    Standardize amounts in the text by removing dollar signs and thousands separators.
     Args:
         text (str): The input text.
     Returns:
         str: The text with standardized amounts.
     """
-    return re.sub(r'\$?(-?\d[\d,]*\.?\d{0,2})', lambda m: str(float(m.group(1).replace(',', ''))), text)
+    return THOUSANDS_SEPARATOR.sub('', CURRENCY_SYMBOL.sub('', text))
 
 def extract_transaction_lines(text):
     """
@@ -74,8 +111,56 @@ def extract_transaction_lines(text):
     Returns:
         str: The text with only transaction lines.
     """
-    pattern = re.compile(r'\b(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})\b.+?\$?\s*-?\d[\d,]*\.?\d{0,2}')
-    return "\n".join([line for line in text.splitlines() if pattern.search(line)])
+    return "\n".join([line for line in text.splitlines() if is_transaction_line(line)])
+
+def preprocess_lines(
+    lines: Iterable[str],
+    clean=True,
+    normalize=True,
+    remove_headers=True,
+    standardize_dates_flag=True,
+    standardize_amounts_flag=True,
+    extract_lines=True
+) -> Iterator[str]:
+    """
+    Preprocess text line by line, applying every enabled step in one pass.
+    Accepts any iterable of lines, e.g. an open file, so large inputs can be streamed.
+    Transaction lines are selected on the original dates, before they are standardized.
+    Args:
+        lines (Iterable[str]): The input lines.
+        clean (bool): Whether to strip lines and drop empty ones.
+        normalize (bool): Whether to collapse runs of whitespace within a line.
+        remove_headers (bool): Whether to remove headers and footers.
+        standardize_dates_flag (bool): Whether to standardize dates.
+        standardize_amounts_flag (bool): Whether to standardize amounts.
+        extract_lines (bool): Whether to keep only transaction lines.
+    Yields:
+        str: The preprocessed lines.
+    """
+    # Substring checks are much cheaper than a regex search, so each pattern
+    # only runs on lines that contain the characters it needs
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if extract_lines and not is_transaction_line(line):
+            continue
+        if remove_headers:
+            lowered = line.lower()
+            if 'page' in lowered or 'confidential' in lowered:
+                line = HEADER_FOOTER.sub('', line)
+        if normalize:
+            line = " ".join(line.split())
+        if clean:
+            line = line.strip()
+            if not line:
+                continue
+        if standardize_dates_flag and _has_date_separator(line):
+            line = DATE.sub(_fix_date, line)
+        if standardize_amounts_flag:
+            if '$' in line:
+                line = CURRENCY_SYMBOL.sub('', line)
+            if ',' in line:
+                line = THOUSANDS_SEPARATOR.sub('', line)
+        yield line
 
 def preprocess_text(
     text,
@@ -99,16 +184,13 @@ def preprocess_text(
     Returns:
         str: The preprocessed text.
     """
-    if clean:
-        text = clean_text(text)
-    if normalize:
-        text = normalize_whitespace(text)
-    if remove_headers:
-        text = remove_headers_footers(text)
-    if standardize_dates_flag:
-        text = standardize_dates(text)
-    if standardize_amounts_flag:
-        text = standardize_amounts(text)
-    if extract_lines:
-        text = extract_transaction_lines(text)
-    return text
+    with span("preprocess_text"):
+        return "\n".join(preprocess_lines(
+            text.splitlines(),
+            clean=clean,
+            normalize=normalize,
+            remove_headers=remove_headers,
+            standardize_dates_flag=standardize_dates_flag,
+            standardize_amounts_flag=standardize_amounts_flag,
+            extract_lines=extract_lines
+        ))
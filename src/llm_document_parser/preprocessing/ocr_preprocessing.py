@@ -4,10 +4,17 @@ This module provides functions to preprocess images for OCR.
 It includes functions to convert images to grayscale, upscale them,
 apply Gaussian blur, and adaptive thresholding.
 It uses OpenCV for image processing.
+Pages are preprocessed in memory, so images and pages rasterized from PDFs
+can be handed to docling without being written to disk first.
 """
 
 # imports
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
 import cv2
+import numpy
+import pypdfium2
 
 
 def convert_to_grayscale(image):
@@ -18,6 +25,10 @@ def convert_to_grayscale(image):
     Returns:
         numpy.ndarray: The grayscale image.
     """
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
     return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
 
@@ -63,17 +74,17 @@ def apply_adaptive_threshold(image):
         2
     )
 
-def preprocess_image(
-    image_path,
+def preprocess_array(
+    image,
     use_grayscale=True,
     use_upscale=True,
     use_blur=True,
     use_threshold=True
 ):
     """
-    Preprocess the image for OCR.
+    Preprocess an image that is already in memory for OCR.
     Args:
-        image_path (str): Path to the image file.
+        image (numpy.ndarray): The input BGR, BGRA or grayscale image.
         use_grayscale (bool): Whether to convert to grayscale.
         use_upscale (bool): Whether to upscale the image.
         use_blur (bool): Whether to apply Gaussian blur.
@@ -81,9 +92,8 @@ def preprocess_image(
     Returns:
         numpy.ndarray: The preprocessed image.
     """
-    image = cv2.imread(image_path)
-
-    if use_grayscale:
+    if use_grayscale or use_threshold:
+        # Adaptive thresholding only works on single channel images
         image = convert_to_grayscale(image)
 
     if use_upscale:
@@ -96,3 +106,79 @@ def preprocess_image(
         image = apply_adaptive_threshold(image)
 
     return image
+
+def preprocess_images(
+    images: Iterable[numpy.ndarray],
+    use_grayscale=True,
+    use_upscale=True,
+    use_blur=True,
+    use_threshold=True
+) -> List[numpy.ndarray]:
+    """
+    Preprocess a batch of page images for OCR.
+    Args:
+        images (Iterable[numpy.ndarray]): The input page images.
+        use_grayscale (bool): Whether to convert to grayscale.
+        use_upscale (bool): Whether to upscale the images.
+        use_blur (bool): Whether to apply Gaussian blur.
+        use_threshold (bool): Whether to apply adaptive thresholding.
+    Returns:
+        List[numpy.ndarray]: The preprocessed images, in the same order.
+    """
+    return [
+        preprocess_array(image, use_grayscale, use_upscale, use_blur, use_threshold)
+        for image in images
+    ]
+
+def load_page_images(file_path: Path, scale: float = 2.0, page_range: Optional[Tuple[int, int]] = None) -> List[numpy.ndarray]:
+    """
+    Load the pages of a document as images in memory.
+    PDF pages are rasterized with pypdfium2, multi-page TIFFs are split into their frames.
+    Args:
+        file_path (Path): Path to the PDF or image file.
+        scale (float): Rasterization scale of PDF pages, 1.0 being 72 DPI. The default of 2.0
+            (144 DPI) keeps small print legible for OCR.
+        page_range (Optional[Tuple[int, int]]): First and last page (1-based, inclusive) to load, or None for all pages.
+    Returns:
+        List[numpy.ndarray]: The BGR page images.
+    """
+    file_path = Path(file_path)
+    if file_path.suffix.lower() == ".pdf":
+        pdf = pypdfium2.PdfDocument(file_path)
+        try:
+            first_page, last_page = page_range or (1, len(pdf))
+            return [
+                pdf[page_index].render(scale=scale).to_numpy()
+                for page_index in range(first_page - 1, last_page)
+            ]
+        finally:
+            pdf.close()
+
+    # imdecode instead of imread so paths with non-ASCII characters work on every platform
+    success, images = cv2.imdecodemulti(numpy.fromfile(file_path, dtype=numpy.uint8), cv2.IMREAD_COLOR)
+    if not success:
+        raise ValueError(f"Could not read image {file_path}")
+    if page_range is not None:
+        images = images[page_range[0] - 1:page_range[1]]
+    return list(images)
+
+def preprocess_image(
+    image_path,
+    use_grayscale=True,
+    use_upscale=True,
+    use_blur=True,
+    use_threshold=True
+):
+    """
+    Preprocess the image for OCR.
+    Args:
+        image_path (str): Path to the image file.
+        use_grayscale (bool): Whether to convert to grayscale.
+        use_upscale (bool): Whether to upscale the image.
+        use_blur (bool): Whether to apply Gaussian blur.
+        use_threshold (bool): Whether to apply adaptive thresholding.
+    Returns:
+        numpy.ndarray: The preprocessed image.
+    """
+    image = cv2.imread(image_path)
+    return preprocess_array(image, use_grayscale, use_upscale, use_blur, use_threshold)
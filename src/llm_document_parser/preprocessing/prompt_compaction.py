@@ -0,0 +1,83 @@
+# prompt_compaction.py
+"""
+This module shrinks OCR markdown before it is sent to the LLM.
+Headers, footers, boilerplate and other lines without a transaction are
+dropped. Markdown tables are filtered row by row: the header and separator
+rows are kept for every table that still has a transaction row, so the LLM
+keeps the column names. Page break markers are kept for chunking.
+"""
+
+# imports
+import re
+from typing import List, Optional
+
+from llm_document_parser.chunking import PAGE_BREAK_PLACEHOLDER, estimate_tokens
+from llm_document_parser.instrumentation import metrics, span
+from llm_document_parser.preprocessing.llm_preprocessing import is_transaction_line, remove_headers_footers
+
+TABLE_SEPARATOR_ROW = re.compile(r'^\s*\|[\s:|-]+\|\s*$')
+
+
+def _is_table_row(line: str) -> bool:
+    return line.lstrip().startswith("|")
+
+def _compact_table(rows: List[str]) -> List[str]:
+    """
+    Keep the transaction rows of a markdown table under its header and separator rows.
+    """
+    has_header = len(rows) > 1 and TABLE_SEPARATOR_ROW.match(rows[1]) is not None
+    header = rows[:2] if has_header else []
+    kept = [row for row in rows[len(header):] if is_transaction_line(row)]
+    return header + kept if kept else []
+
+def compact_markdown(markdown: str) -> str:
+    """
+    Remove everything but transactions from OCR markdown.
+    Args:
+        markdown (str): The markdown export of the document.
+    Returns:
+        str: The compacted markdown.
+    """
+    compacted: List[str] = []
+    table: List[str] = []
+    for line in markdown.splitlines():
+        if _is_table_row(line):
+            table.append(line.strip())
+            continue
+        if table:
+            compacted.extend(_compact_table(table))
+            table = []
+        if PAGE_BREAK_PLACEHOLDER in line:
+            compacted.append(PAGE_BREAK_PLACEHOLDER)
+            continue
+        line = remove_headers_footers(line).strip()
+        if is_transaction_line(line):
+            compacted.append(line)
+    if table:
+        compacted.extend(_compact_table(table))
+    return "\n".join(compacted)
+
+def compact_prompt(markdown: str, document: Optional[str] = None) -> str:
+    """
+    Compact OCR markdown for the LLM and report the token counts before and after.
+    The original markdown is returned when no transaction lines are found, so
+    statements in an unexpected layout are still sent to the LLM in full.
+    Args:
+        markdown (str): The markdown export of the document.
+        document (Optional[str]): Name of the document, used in the report.
+    Returns:
+        str: The compacted markdown, or the original markdown if nothing was kept.
+    """
+    with span("compact_prompt", file=document):
+        compacted = compact_markdown(markdown)
+
+    tokens_before = estimate_tokens(markdown)
+    if not compacted.replace(PAGE_BREAK_PLACEHOLDER, "").strip():
+        print(f"Prompt compaction found no transactions in {document or 'document'}, sending it in full ({tokens_before} tokens)")
+        compacted = markdown
+    tokens_after = estimate_tokens(compacted)
+
+    metrics.increment("llm_prompt_tokens_before_compaction", tokens_before, file=document)
+    metrics.increment("llm_prompt_tokens_after_compaction", tokens_after, file=document)
+    print(f"Prompt compaction for {document or 'document'}: {tokens_before} -> {tokens_after} tokens")
+    return compacted
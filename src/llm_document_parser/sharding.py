@@ -0,0 +1,217 @@
+# sharding.py
+"""
+This module splits one batch job across several processes or machines.
+Input files are assigned to shards by the hash of their contents, so every
+node that sees the same files picks the same subset without coordination.
+Each shard writes its rows to its own part file in the shared output folder
+and records the part in a small JSON manifest once the part is complete.
+A resumed shard only skips files whose rows are in a recorded part, so the
+rows of a run that crashed are extracted again rather than lost. Once every
+shard is done, the merge step streams all parts into the final output, chunk
+by chunk, without loading them into memory at once.
+"""
+
+# imports
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple, Type
+
+from llm_document_parser.export_data import open_streaming_writer
+from llm_document_parser.ocr_cache import hash_file
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from pydantic import BaseModel
+
+# Part files are written in a format that can be read back in chunks; JSON arrays cannot
+PART_EXPORT_TYPES = {"json": "jsonl"}
+
+
+def parse_shard_spec(spec: str) -> Tuple[int, int]:
+    """
+    Parse a shard given as "i/N", where i counts from 0 to N - 1.
+    Args:
+        spec (str): The shard, e.g. "2/8".
+    Returns:
+        Tuple[int, int]: The shard index and shard count.
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must be given as i/N, e.g. 0/4, not {spec}") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and {count - 1}, not {index}")
+    return index, count
+
+def file_shard(input_path: Path, shard_count: int) -> int:
+    """
+    Get the shard a file belongs to, based on the SHA-256 hash of its contents.
+    Args:
+        input_path (Path): The input file.
+        shard_count (int): The number of shards.
+    Returns:
+        int: The shard index, from 0 to shard_count - 1.
+    """
+    return int(hash_file(input_path), 16) % shard_count
+
+def select_shard(input_paths: List[Path], shard_index: int, shard_count: int) -> List[Path]:
+    """
+    Keep the files that belong to a shard.
+    Args:
+        input_paths (List[Path]): All input files of the job.
+        shard_index (int): The shard to keep.
+        shard_count (int): The number of shards.
+    Returns:
+        List[Path]: The files of the shard, in input order.
+    """
+    return [input_path for input_path in input_paths if file_shard(input_path, shard_count) == shard_index]
+
+def shard_file_name(file_name: str, shard_index: int, shard_count: int) -> str:
+    """
+    Tag a file name with a shard, e.g. "job_manifest.sqlite3" becomes "job_manifest.shard-0-of-4.sqlite3".
+    """
+    stem, extension = os.path.splitext(file_name)
+    return f"{stem}.shard-{shard_index}-of-{shard_count}{extension}"
+
+def part_file_name(output_file_name: str, shard_index: int, shard_count: int) -> str:
+    """
+    Get the output file name a shard writes its part to.
+    """
+    return f"{output_file_name}.shard-{shard_index}-of-{shard_count}.part"
+
+def part_export_type(export_type: str) -> str:
+    """
+    Get the format a shard writes its part in for the given final export type.
+    """
+    return PART_EXPORT_TYPES.get(export_type, export_type)
+
+def shard_manifest_path(output_folder: str, output_file_name: str, shard_index: int, shard_count: int) -> Path:
+    return Path(output_folder) / f"{output_file_name}.shard-{shard_index}-of-{shard_count}.manifest.json"
+
+def _read_shard_manifest(manifest_path: Path) -> Optional[dict]:
+    return json.loads(manifest_path.read_text()) if manifest_path.exists() else None
+
+def shard_part_paths(output_folder: str, output_file_name: str, shard_index: int, shard_count: int) -> List[Path]:
+    """
+    Get the part files a shard has registered in its manifest, i.e. the parts the merge step will read.
+    Returns:
+        List[Path]: The part files, empty if the shard has not finished a run yet.
+    """
+    manifest = _read_shard_manifest(shard_manifest_path(output_folder, output_file_name, shard_index, shard_count))
+    if manifest is None:
+        return []
+    return [Path(output_folder) / part["path"] for part in manifest["parts"]]
+
+def record_shard_part(
+    output_folder: str,
+    output_file_name: str,
+    shard_index: int,
+    shard_count: int,
+    export_type: str,
+    part_path: Path,
+    rows: int,
+    files: int,
+    input_paths: List[Path],
+    failed_paths: Iterable[Path] = (),
+    resume: bool = False
+):
+    """
+    Record a finished run of a shard in its manifest.
+    A resumed run only processed the files earlier runs did not finish, so its part is added to
+    the parts written so far, and the files that failed before are kept unless it retried them.
+    Any other run processed every file of the shard again and replaces the earlier parts.
+    Args:
+        output_folder (str): The shared output folder.
+        output_file_name (str): The base name of the final output file.
+        shard_index (int): The shard that ran.
+        shard_count (int): The number of shards.
+        export_type (str): The final export type.
+        part_path (Path): The part file written by this run.
+        rows (int): Number of rows in the part file.
+        files (int): Number of input files in the shard.
+        input_paths (List[Path]): The input files processed by this run.
+        failed_paths (Iterable[Path]): The input files that failed in this run.
+        resume (bool): Whether this run resumed earlier runs of the shard.
+    """
+    manifest_path = shard_manifest_path(output_folder, output_file_name, shard_index, shard_count)
+    manifest = _read_shard_manifest(manifest_path) if resume else None
+    if manifest is None:
+        manifest = {"shard": shard_index, "shard_count": shard_count, "export_type": export_type, "parts": []}
+    if rows:
+        # Relative to the output folder, so nodes may mount the shared folder at different paths
+        manifest["parts"].append({"path": Path(part_path).name, "rows": rows})
+    manifest["files"] = files
+    # Files that failed before and were retried by this run are replaced by their new outcome
+    retried = {str(input_path) for input_path in input_paths}
+    failed = {path for path in manifest.get("failed_files", []) if path not in retried}
+    manifest["failed_files"] = sorted(failed | {str(input_path) for input_path in failed_paths})
+
+    # Written atomically, so the merge step never reads a half-written manifest
+    fd, tmp_path = tempfile.mkstemp(dir=output_folder, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def _read_part(part_path: Path, export_type: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    import pandas as pd
+
+    if export_type == "csv":
+        # Read as text, so values are copied to the final file unchanged
+        yield from pd.read_csv(part_path, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+    elif export_type == "jsonl":
+        yield from pd.read_json(part_path, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False)
+    elif export_type == "parquet":
+        import pyarrow.parquet
+
+        for batch in pyarrow.parquet.ParquetFile(part_path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unknown part export type: {export_type}")
+
+def merge_shards(
+    output_folder: str,
+    output_file_name: str,
+    export_type: str,
+    shard_count: int,
+    chunk_rows: int = 10000,
+    response_model: Optional[Type[BaseModel]] = None
+) -> Path:
+    """
+    Stream the parts written by every shard into one output file.
+    Args:
+        output_folder (str): The shared output folder.
+        output_file_name (str): The base name of the final output file.
+        export_type (str): The final export type ("csv", "json", "jsonl" or "parquet").
+        shard_count (int): The number of shards the job was split into.
+        chunk_rows (int): Number of rows read from a part and written at a time.
+        response_model (Optional[Type[BaseModel]]): The model the rows were extracted with, giving the
+            schema of Parquet output, or None to take it from the first chunk.
+    Returns:
+        Path: The merged output file.
+    """
+    manifest_paths = [
+        shard_manifest_path(output_folder, output_file_name, shard_index, shard_count)
+        for shard_index in range(shard_count)
+    ]
+    missing = [str(path) for path in manifest_paths if not path.exists()]
+    if missing:
+        raise FileNotFoundError(f"{len(missing)} of {shard_count} shards have not finished, missing {missing[0]}")
+    manifests = [_read_shard_manifest(path) for path in manifest_paths]
+
+    failed = sum(len(manifest.get("failed_files", [])) for manifest in manifests)
+    if failed:
+        print(f"Warning: {failed} input files failed across the shards and are not in the merged output")
+
+    with open_streaming_writer(export_type, output_folder, output_file_name, response_model) as writer:
+        for manifest in manifests:
+            for part in manifest["parts"]:
+                for df in _read_part(Path(output_folder) / part["path"], part_export_type(export_type), chunk_rows):
+                    writer.write(df)
+        expected_rows = sum(part["rows"] for manifest in manifests for part in manifest["parts"])
+        if writer.rows_written != expected_rows:
+            raise RuntimeError(f"Merged {writer.rows_written} rows, but the shard manifests record {expected_rows}")
+    return writer.path
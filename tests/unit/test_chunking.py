@@ -0,0 +1,66 @@
+from llm_document_parser.chunking import (
+    PAGE_BREAK_PLACEHOLDER,
+    estimate_tokens,
+    extract_data_in_chunks,
+    merge_extracted_chunks,
+    split_markdown_into_chunks,
+)
+from llm_document_parser.config import BankStatement
+
+
+def entry(day, amount):
+    return {"transaction_date": f"2025-01-{day:02d}", "description": "Store", "amount": amount, "transaction_type": "withdrawal"}
+
+
+def test_chunks_respect_budget_and_keep_table_header():
+    rows = "\n".join(f"| 2025-01-{day:02d} | Store | {day}.00 |" for day in range(1, 29))
+    table = f"| Date | Description | Amount |\n|---|---|---|\n{rows}"
+    markdown = f"# Statement\n\n{table}{PAGE_BREAK_PLACEHOLDER}Page two text"
+
+    chunks = split_markdown_into_chunks(markdown, max_tokens=100)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    table_chunks = [chunk for chunk in chunks if "| 2025-01-" in chunk]
+    assert all(chunk.lstrip().startswith("| Date |") or chunk.startswith("# Statement") for chunk in table_chunks)
+    assert sum(chunk.count("| 2025-01-") for chunk in chunks) == 28
+    assert PAGE_BREAK_PLACEHOLDER not in "".join(chunks)
+
+
+def test_overlap_repeats_trailing_lines():
+    chunks = split_markdown_into_chunks("a" * 40 + "\n\n" + "b" * 40, max_tokens=15, overlap_lines=1)
+    assert chunks == ["a" * 40, "a" * 40 + "\n\n" + "b" * 40]
+
+
+def test_merge_drops_transactions_repeated_across_boundary():
+    first = BankStatement.model_validate({"transactions": [entry(1, 1.0), entry(2, 2.0)]})
+    second = BankStatement.model_validate({"transactions": [entry(2, 2.0), entry(3, 3.0)]})
+
+    merged = merge_extracted_chunks([first, second], BankStatement, overlap_lines=2)
+
+    assert [transaction.amount for transaction in merged.transactions] == [1.0, 2.0, 3.0]
+
+
+def test_merge_keeps_repeated_transactions_outside_the_overlap():
+    first = BankStatement.model_validate({"transactions": [entry(1, 1.0), entry(2, 2.0)]})
+    second = BankStatement.model_validate({"transactions": [entry(2, 2.0), entry(2, 2.0), entry(3, 3.0)]})
+
+    # Without overlap, a chunk cannot repeat rows of the previous one
+    merged = merge_extracted_chunks([first, second], BankStatement)
+    assert [transaction.amount for transaction in merged.transactions] == [1.0, 2.0, 2.0, 2.0, 3.0]
+
+    # One overlapped line holds at most one repeated row
+    merged = merge_extracted_chunks([first, second], BankStatement, overlap_lines=1)
+    assert [transaction.amount for transaction in merged.transactions] == [1.0, 2.0, 2.0, 3.0]
+
+
+def test_single_chunk_documents_are_extracted_once():
+    calls = []
+
+    def extract(text):
+        calls.append(text)
+        return BankStatement(transactions=[])
+
+    extract_data_in_chunks(f"short{PAGE_BREAK_PLACEHOLDER}text", extract, BankStatement, max_tokens=1000)
+
+    assert calls == ["short\n\ntext"]
@@ -0,0 +1,210 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from llm_document_parser import cli, config
+from llm_document_parser.cli import build_parser, expand_inputs, job_settings_fingerprint, process_files_pipelined
+from llm_document_parser.config import BankStatement
+
+
+def test_defaults_come_from_config():
+    args = build_parser().parse_args([])
+
+    assert args.inputs == [config.INPUT_PATH]
+    assert args.ocr_model == config.OCR_MODEL
+    assert args.ollama_hosts == config.OLLAMA_HOSTS
+    assert args.ocr_workers == config.OCR_WORKERS
+    assert args.llm_cache == config.LLM_CACHE_ENABLED
+    assert args.chunking == config.LLM_CHUNKING_ENABLED
+
+
+def test_arguments_override_config():
+    args = build_parser().parse_args([
+        "a.pdf", "scans/*.png",
+        "--ocr-model", "rapid",
+        "--ollama-hosts", "http://gpu-1:11434", "http://gpu-2:11434",
+        "--llm-workers", "16",
+        "--no-ocr-cache",
+        "--chunking",
+        "--export-type", "parquet",
+    ])
+
+    assert args.inputs == ["a.pdf", "scans/*.png"]
+    assert args.ocr_model == "rapid"
+    assert args.ollama_hosts == ["http://gpu-1:11434", "http://gpu-2:11434"]
+    assert args.llm_workers == 16
+    assert args.ocr_cache is False
+    assert args.chunking is True
+    assert args.export_type == "parquet"
+
+
+def test_settings_fingerprint_follows_result_settings():
+    parser = build_parser()
+    fingerprint = job_settings_fingerprint(parser.parse_args([]))
+
+    assert job_settings_fingerprint(parser.parse_args(["--llm-workers", "32"])) == fingerprint
+    assert job_settings_fingerprint(parser.parse_args(["--ollama-model", "phi"])) != fingerprint
+    assert job_settings_fingerprint(parser.parse_args(["--export-type", "csv" if config.EXPORT_TYPE != "csv" else "json"])) != fingerprint
+
+
+def test_expand_inputs_accepts_files_directories_and_globs(tmp_path):
+    for name in ["a.pdf", "b.png", "nested/c.pdf", "nested/deeper/d.pdf"]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(b"")
+
+    paths = expand_inputs([
+        str(tmp_path / "a.pdf"),
+        str(tmp_path / "nested"),
+        str(tmp_path / "**" / "*.pdf"),
+    ])
+
+    assert paths == sorted([
+        tmp_path / "a.pdf",
+        tmp_path / "nested" / "c.pdf",
+        tmp_path / "nested" / "deeper" / "d.pdf",
+    ])
+
+
+def test_expand_inputs_rejects_missing_paths(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        expand_inputs([str(tmp_path / "missing.pdf")])
+
+
+class FakeOCRPool:
+    """
+    Stands in for OCRWorkerPool, yielding each file's text in the given order.
+    """
+    ocr_fallback = None
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.yielded = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def imap_unordered(self, input_paths, return_exceptions=False):
+        for index, input_path in enumerate(input_paths):
+            self.yielded += 1
+            yield index, input_path, self.texts[index]
+
+
+class FakeOllamaEndpoints:
+    def __init__(self, fail_on=(), release=None):
+        self.fail_on = set(fail_on)
+        self.release = release
+
+    def start_health_checks(self):
+        pass
+
+    def stop_health_checks(self):
+        pass
+
+    def pull_model(self, model, model_store=None):
+        pass
+
+    def extract_data(self, prompt, text_data, ollama_model, response_model, cache=None):
+        if self.release is not None:
+            self.release.wait()
+        if text_data in self.fail_on:
+            raise RuntimeError(f"cannot parse {text_data}")
+        return BankStatement(transactions=[{"transaction_date": None, "description": text_data, "amount": 1.0, "transaction_type": None}])
+
+
+def run_pipeline(texts, llm_workers, ollama_endpoints, on_result, on_error=None, ocr_pool=None):
+    args = build_parser().parse_args(["--llm-workers", str(llm_workers), "--no-prompt-compaction", "--no-chunking"])
+    ocr_pool = ocr_pool or FakeOCRPool(texts)
+    paths = [Path(f"file_{index}.pdf") for index in range(len(texts))]
+    thread = threading.Thread(
+        target=process_files_pipelined,
+        args=(args, paths, ocr_pool, ollama_endpoints),
+        kwargs={"on_result": on_result, "on_error": on_error},
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def test_pipeline_delivers_every_result_with_its_index():
+    results = {}
+    texts = [f"text {index}" for index in range(12)]
+
+    thread = run_pipeline(texts, 3, FakeOllamaEndpoints(), lambda index, path, result: results.setdefault(index, result))
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert sorted(results) == list(range(12))
+    assert all(results[index].transactions[0].description == texts[index] for index in results)
+
+
+def test_pipeline_isolates_failing_files():
+    results, errors = [], []
+
+    def on_result(index, path, result):
+        if index == 2:
+            raise OSError("disk full")
+        results.append(index)
+
+    texts = [f"text {index}" for index in range(6)]
+    # A single LLM thread must survive both an extraction error and an error while saving a result
+    thread = run_pipeline(texts, 1, FakeOllamaEndpoints(fail_on={"text 4"}), on_result,
+                          on_error=lambda index, path, error: errors.append((index, type(error).__name__)))
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert sorted(results) == [0, 1, 3, 5]
+    assert sorted(errors) == [(2, "OSError"), (4, "RuntimeError")]
+
+
+def test_pipeline_queue_bounds_ocr_ahead_of_llm():
+    release = threading.Event()
+    texts = [f"text {index}" for index in range(10)]
+    ocr_pool = FakeOCRPool(texts)
+
+    thread = run_pipeline(texts, 1, FakeOllamaEndpoints(release=release), lambda *result: None, ocr_pool=ocr_pool)
+    time.sleep(0.5)
+    # One file held by the blocked LLM thread, two queued, and one waiting to be queued
+    assert ocr_pool.yielded == 4
+    release.set()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert ocr_pool.yielded == 10
+
+
+def test_parquet_rows_are_collected_into_batches_before_files_are_marked_done(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    inputs = tmp_path / "in"
+    inputs.mkdir()
+    for index in range(5):
+        (inputs / f"statement_{index}.png").write_bytes(b"scan %d" % index)
+    monkeypatch.setattr(cli, "load_ollama_endpoints_from_args", lambda args: FakeOllamaEndpoints())
+    monkeypatch.setattr(cli, "load_ocr_pool_from_args",
+                        lambda args, *rest: FakeOCRPool([f"statement {index}" for index in range(5)]))
+    drained = []
+    drain = cli.ResultAccumulator.drain
+
+    def record_drain(accumulator):
+        drained.append(accumulator.rows)
+        return drain(accumulator)
+
+    monkeypatch.setattr(cli.ResultAccumulator, "drain", record_drain)
+
+    output = tmp_path / "out"
+    cli.main([str(inputs), "--output-folder", str(output), "--export-type", "parquet", "--columnar-batch-rows", "2",
+              "--llm-workers", "1", "--resume", "--no-ocr-cache", "--no-llm-cache", "--no-prompt-compaction", "--no-chunking"])
+
+    # One row per file, drained once two are collected and the last one at the end
+    assert drained == [2, 2, 1]
+    [parquet_path] = output.glob("output*.parquet")
+    parquet_file = pq.ParquetFile(parquet_path)
+    assert [parquet_file.metadata.row_group(index).num_rows for index in range(parquet_file.num_row_groups)] == [2, 2, 1]
+    assert parquet_file.read().column("description").to_pylist() == [f"statement {index}" for index in range(5)]
+    with sqlite3.connect(output / config.JOB_MANIFEST_FILE_NAME) as connection:
+        assert sorted(connection.execute("SELECT status, row_offset FROM files")) == [("done", index) for index in range(5)]
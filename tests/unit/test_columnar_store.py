@@ -0,0 +1,91 @@
+import json
+from datetime import date
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from llm_document_parser.columnar_store import ColumnarStore, arrow_schema, row_model
+from llm_document_parser.config import BankStatement, BankStatementEntry
+from llm_document_parser.export_data import ResultAccumulator, open_streaming_writer
+
+pa = pytest.importorskip("pyarrow")
+
+ROWS = [
+    {"transaction_date": "2025-01-24", "description": "Walmart", "amount": 34.24, "transaction_type": None},
+    {"transaction_date": "2025-01-25", "description": "Payroll", "amount": 1000.0, "transaction_type": "deposit"},
+    {"transaction_date": None, "description": "Walmart", "amount": None, "transaction_type": "withdrawal"},
+]
+
+
+class Payment(BaseModel):
+    posted: date
+    amount: int | float
+    memo: str | None = None
+
+
+class Payments(BaseModel):
+    payments: List[Payment]
+
+
+def test_schema_is_built_from_the_row_model():
+    assert row_model(BankStatement) is BankStatementEntry
+    schema = arrow_schema(BankStatement)
+
+    assert schema.names == ["transaction_date", "description", "amount", "transaction_type"]
+    # Dates may also be strings, so they are kept as text rather than parsed
+    assert schema.field("transaction_date").type == pa.dictionary(pa.int32(), pa.string())
+    assert schema.field("amount").type == pa.float64()
+    assert schema.field("description").type == pa.dictionary(pa.int32(), pa.string())
+    assert schema.field("transaction_type").type == pa.dictionary(pa.int32(), pa.string())
+
+    schema = arrow_schema(Payments)
+    assert schema.field("posted").type == pa.date32()
+    assert schema.field("amount").type == pa.float64()
+
+
+def test_store_packs_rows_into_typed_batches():
+    store = ColumnarStore(BankStatement, batch_rows=2)
+    store.append(ROWS[:2])
+    store.append(ROWS[2:] + [{"transaction_date": "January 26th", "description": "Rent", "amount": 900.0, "transaction_type": None}])
+
+    table = store.to_table()
+
+    assert store.rows == 4
+    assert table.schema == store.schema
+    # Dates the LLM did not write as ISO dates are kept as written
+    assert table.column("transaction_date").to_pylist() == ["2025-01-24", "2025-01-25", None, "January 26th"]
+    assert table.column("description").to_pylist() == ["Walmart", "Payroll", "Walmart", "Rent"]
+
+    store.clear()
+    assert store.rows == 0 and store.to_table().num_rows == 0
+
+
+def test_values_that_do_not_fit_their_column_are_rejected():
+    store = ColumnarStore(Payments)
+    store.append([{"posted": "2025-01-24", "amount": 3}])
+
+    with pytest.raises(ValueError, match="posted"):
+        store.append([{"posted": "2025-01-25", "amount": 1.5}, {"posted": "January 26th", "amount": 2}])
+
+    # A rejected batch leaves the store unchanged
+    assert store.rows == 1
+    assert store.to_table().to_pylist() == [{"posted": date(2025, 1, 24), "amount": 3.0, "memo": None}]
+
+
+PAYMENTS = {"payments": [{"posted": "2025-01-24", "amount": 3, "memo": "rent"}, {"posted": "2025-01-25", "amount": 1.5}]}
+
+
+@pytest.mark.parametrize("export_type", ["csv", "json", "jsonl"])
+@pytest.mark.parametrize("model, data", [(BankStatement, {"transactions": ROWS}), (Payments, PAYMENTS)])
+def test_typed_rows_export_the_same_as_python_objects(tmp_path, export_type, model, data):
+    result = model.model_validate_json(json.dumps(data))
+    paths = []
+    for response_model in [None, model]:
+        accumulator = ResultAccumulator(response_model)
+        accumulator.add_result(result)
+        with open_streaming_writer(export_type, str(tmp_path), "output") as writer:
+            writer.write(accumulator.drain())
+        paths.append(writer.path)
+
+    assert paths[0].read_text() == paths[1].read_text()
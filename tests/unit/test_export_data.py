@@ -0,0 +1,143 @@
+import json
+
+import pandas as pd
+import pytest
+
+from llm_document_parser.config import BankStatement
+from llm_document_parser.export_data import ResultAccumulator, combine_json_data_into_df, convert_json_to_df, model_rows, open_streaming_writer
+
+BATCHES = [
+    pd.DataFrame([{"transaction_date": "2025-01-24", "description": "Walmart", "amount": 34.24, "transaction_type": None}]),
+    pd.DataFrame([
+        {"transaction_date": "2025-01-25", "description": "Payroll", "amount": 1000.0, "transaction_type": "deposit"},
+        {"transaction_date": "2025-01-26", "description": "Rent", "amount": 900.0, "transaction_type": "withdrawal"},
+    ]),
+]
+
+
+def write_batches(export_type, tmp_path, batch_rows=10000):
+    with open_streaming_writer(export_type, str(tmp_path), "output", batch_rows=batch_rows) as writer:
+        for batch in BATCHES:
+            writer.write(batch)
+    return writer.path
+
+
+def expected_records():
+    return pd.concat(BATCHES).to_dict(orient="records")
+
+
+def test_csv_writer_appends_batches(tmp_path):
+    path = write_batches("csv", tmp_path)
+    df = pd.read_csv(path)
+    assert df["description"].tolist() == ["Walmart", "Payroll", "Rent"]
+
+
+def test_json_writer_matches_export_as_json_layout(tmp_path):
+    path = write_batches("json", tmp_path)
+    assert json.loads(path.read_text()) == expected_records()
+
+
+def test_jsonl_writer_writes_one_record_per_line(tmp_path):
+    path = write_batches("jsonl", tmp_path)
+    assert [json.loads(line) for line in path.read_text().splitlines()] == expected_records()
+
+
+@pytest.mark.parametrize("batch_rows, row_groups", [(10000, [3]), (2, [2, 1]), (1, [1, 1, 1])])
+def test_parquet_writer_buffers_rows_into_row_groups(tmp_path, batch_rows, row_groups):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = write_batches("parquet", tmp_path, batch_rows)
+    parquet_file = pq.ParquetFile(path)
+    # Documents are buffered until a row group is full, the rest is written on close
+    assert [parquet_file.metadata.row_group(index).num_rows for index in range(parquet_file.num_row_groups)] == row_groups
+    assert parquet_file.read().to_pylist() == expected_records()
+
+
+def test_output_files_are_not_overwritten(tmp_path):
+    first = write_batches("csv", tmp_path)
+    second = write_batches("csv", tmp_path)
+    assert first.name == "output0.csv"
+    assert second.name == "output1.csv"
+
+
+def records(df):
+    # None and NaN both mean a missing value, whatever the column dtype
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def test_accumulator_matches_per_document_frames():
+    documents = [json.dumps({"transactions": batch.to_dict(orient="records")}) for batch in BATCHES]
+    accumulator = ResultAccumulator()
+    for document in documents:
+        accumulator.add(document)
+
+    df = accumulator.to_df()
+
+    assert accumulator.documents == 2
+    assert records(df) == records(pd.concat([convert_json_to_df(d) for d in documents], ignore_index=True))
+    assert records(combine_json_data_into_df(documents)) == records(df)
+
+
+def test_accumulator_handles_missing_columns_and_empty_results():
+    accumulator = ResultAccumulator()
+    accumulator.add(json.dumps({"transactions": [{"amount": 1.0}]}))
+    accumulator.add(json.dumps({"transactions": None}))
+    accumulator.add(json.dumps({"transactions": [{"amount": 2.0, "description": "Rent"}]}))
+
+    assert records(accumulator.to_df()) == [
+        {"amount": 1.0, "description": None},
+        {"amount": 2.0, "description": "Rent"},
+    ]
+
+
+def test_accumulator_drain_releases_written_rows():
+    accumulator = ResultAccumulator()
+    accumulator.add(json.dumps({"transactions": [{"amount": 1.0}]}))
+    assert len(accumulator.drain()) == 1
+
+    accumulator.add(json.dumps({"transactions": [{"amount": 2.0}]}))
+    assert accumulator.drain()["amount"].tolist() == [2.0]
+
+
+def test_typed_results_give_the_same_rows_as_json():
+    documents = [json.dumps({"transactions": batch.to_dict(orient="records")}) for batch in BATCHES]
+    results = [BankStatement.model_validate_json(document) for document in documents]
+    accumulator = ResultAccumulator()
+    for result in results:
+        accumulator.add_result(result)
+
+    assert records(accumulator.to_df()) == records(combine_json_data_into_df(documents))
+
+
+def test_rows_come_from_the_declared_list_field():
+    assert model_rows(BankStatement(transactions=None)) == []
+    assert model_rows(BankStatement(transactions=[])) == []
+    row = {"transaction_date": "2025-01-24", "description": "Walmart", "amount": 34.24, "transaction_type": None}
+    assert model_rows(BankStatement.model_validate_json(json.dumps({"transactions": [row]}))) == [row]
+
+
+def test_json_writer_keeps_a_complete_array_after_every_batch(tmp_path):
+    writer = open_streaming_writer("json", str(tmp_path), "output")
+    assert json.loads(writer.path.read_text()) == []
+    for batch in BATCHES:
+        writer.write(batch)
+        # Readable without close, e.g. after a crash
+        assert json.loads(writer.path.read_text()) == pd.concat(BATCHES)[:writer.rows_written].to_dict(orient="records")
+    writer.close()
+    assert json.loads(writer.path.read_text()) == expected_records()
+
+
+def test_parquet_schema_comes_from_the_response_model(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    batches = [
+        pd.DataFrame([{"transaction_date": "2025-01-24", "description": "Walmart", "amount": None, "transaction_type": None}]),
+        pd.DataFrame([{"transaction_date": "2025-01-25", "description": "Payroll", "amount": 1000.0, "transaction_type": "deposit"}]),
+    ]
+    # amount and transaction_type are all null in the first batch
+    with open_streaming_writer("parquet", str(tmp_path), "output", BankStatement) as writer:
+        for batch in batches:
+            writer.write(batch)
+
+    table = pq.read_table(writer.path)
+    assert str(table.schema.field("amount").type) == "double"
+    assert table.column("amount").to_pylist() == [None, 1000.0]
+    assert table.column("transaction_type").to_pylist() == [None, "deposit"]
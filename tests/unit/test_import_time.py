@@ -0,0 +1,44 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["docling", "torch", "pandas", "openai", "instructor", "ollama", "cv2"]
+
+# Generous for slow CI machines; importing docling alone takes several seconds
+IMPORT_TIME_BUDGET_SECONDS = 2.0
+
+
+def import_in_subprocess(module):
+    """
+    Import a module in a fresh interpreter and report how long it took and which heavy modules it loaded.
+    """
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'seconds': seconds, 'loaded': loaded}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", [
+    "llm_document_parser.cli",
+    "llm_document_parser.convert_doc_docling",
+    "llm_document_parser.instructor_llm",
+    "llm_document_parser.export_data",
+])
+def test_import_does_not_load_heavy_dependencies(module):
+    result = import_in_subprocess(module)
+
+    assert result["loaded"] == []
+
+
+def test_cli_import_time_within_budget():
+    result = import_in_subprocess("llm_document_parser.cli")
+
+    assert result["seconds"] < IMPORT_TIME_BUDGET_SECONDS
@@ -0,0 +1,43 @@
+import json
+import urllib.request
+
+import pytest
+
+from llm_document_parser.instrumentation import JSONLogSink, Metrics, start_metrics_server
+
+
+def test_spans_are_aggregated_and_logged(tmp_path):
+    registry = Metrics()
+    registry.add_sink(JSONLogSink(str(tmp_path / "metrics.jsonl")))
+
+    for _ in range(2):
+        with registry.span("image_to_text", file="statement.png"):
+            pass
+    with pytest.raises(RuntimeError):
+        with registry.span("extract_json_data_using_ollama_llm"):
+            raise RuntimeError("timeout")
+
+    timings = registry.snapshot()["timings"]
+    assert timings["image_to_text"]["count"] == 2
+    assert timings["extract_json_data_using_ollama_llm"]["count"] == 1
+
+    events = [json.loads(line) for line in (tmp_path / "metrics.jsonl").read_text().splitlines()]
+    assert [event["name"] for event in events] == ["image_to_text", "image_to_text", "extract_json_data_using_ollama_llm"]
+    assert events[0]["file"] == "statement.png"
+    assert events[2]["error"] == "RuntimeError('timeout')"
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    registry = Metrics()
+    registry.record("image_to_text", 1.5)
+    registry.increment("llm_validation_retries", 2)
+    server = start_metrics_server(0, host="127.0.0.1", registry=registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+
+    assert "llm_document_parser_image_to_text_seconds_count 1" in body
+    assert "llm_document_parser_image_to_text_seconds_sum 1.5" in body
+    assert "llm_document_parser_llm_validation_retries_total 2" in body
@@ -0,0 +1,72 @@
+import sqlite3
+
+from llm_document_parser.job_manifest import JobManifest
+
+
+def test_rerun_skips_completed_files(tmp_path):
+    inputs = [tmp_path / f"statement{index}.png" for index in range(3)]
+    for input_path in inputs:
+        input_path.write_bytes(input_path.name.encode())
+    manifest = JobManifest(str(tmp_path / "output" / "job_manifest.sqlite3"))
+
+    assert manifest.pending_files(inputs) == inputs
+    manifest.mark_done(inputs[0], tmp_path / "output0.csv", 0, 4)
+    manifest.mark_failed(inputs[1], RuntimeError("LLM timed out"))
+
+    assert manifest.pending_files(inputs) == inputs[1:]
+    assert manifest.counts() == {"done": 1, "pending": 2}
+
+
+def test_changed_files_are_processed_again(tmp_path):
+    input_path = tmp_path / "statement.png"
+    input_path.write_bytes(b"first scan")
+    manifest = JobManifest(str(tmp_path / "job_manifest.sqlite3"))
+    manifest.pending_files([input_path])
+    manifest.mark_done(input_path, tmp_path / "output0.csv", 0, 1)
+
+    input_path.write_bytes(b"second scan")
+
+    assert manifest.pending_files([input_path]) == [input_path]
+
+
+def test_files_are_processed_again_when_settings_change(tmp_path):
+    input_path = tmp_path / "statement.png"
+    input_path.write_bytes(b"scan")
+    db_path = str(tmp_path / "job_manifest.sqlite3")
+    manifest = JobManifest(db_path, settings_fingerprint="llama3, csv")
+    manifest.pending_files([input_path])
+    manifest.mark_done(input_path, tmp_path / "output0.csv", 0, 1)
+
+    assert JobManifest(db_path, settings_fingerprint="llama3, csv").pending_files([input_path]) == []
+    assert JobManifest(db_path, settings_fingerprint="phi, csv").pending_files([input_path]) == [input_path]
+
+
+def test_ledgers_without_settings_are_upgraded(tmp_path):
+    input_path = tmp_path / "statement.png"
+    input_path.write_bytes(b"scan")
+    db_path = str(tmp_path / "job_manifest.sqlite3")
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(
+            "CREATE TABLE files (path TEXT PRIMARY KEY, content_hash TEXT NOT NULL, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, status TEXT NOT NULL, error TEXT, started_at REAL, finished_at REAL, "
+            "output_path TEXT, row_offset INTEGER, row_count INTEGER)"
+        )
+    connection.close()
+
+    manifest = JobManifest(db_path, settings_fingerprint="llama3, csv")
+
+    assert manifest.pending_files([input_path]) == [input_path]
+
+
+def test_files_written_to_unrecorded_outputs_are_processed_again(tmp_path):
+    inputs = [tmp_path / f"statement{index}.png" for index in range(2)]
+    for input_path in inputs:
+        input_path.write_bytes(input_path.name.encode())
+    manifest = JobManifest(str(tmp_path / "job_manifest.sqlite3"))
+    manifest.pending_files(inputs)
+    manifest.mark_done(inputs[0], tmp_path / "output.part0.csv", 0, 3)
+    manifest.mark_done(inputs[1], tmp_path / "output.part1.csv", 0, 3)
+
+    # output.part1.csv was written by a run that crashed before recording it
+    assert manifest.pending_files(inputs, [tmp_path / "output.part0.csv"]) == inputs[1:]
+    assert manifest.pending_files(inputs, []) == inputs
@@ -0,0 +1,93 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from llm_document_parser.job_queue import CANCELLED, DONE, JobQueue, QueueFullError
+
+
+class BlockingProcessor:
+    """Processes files only as fast as the test releases them, recording the order they started in."""
+
+    def __init__(self):
+        self.started = []
+        self.release = threading.Semaphore(0)
+
+    def __call__(self, input_path):
+        self.started.append(Path(input_path).name)
+        self.release.acquire()
+        if Path(input_path).name.startswith("bad"):
+            raise ValueError("unreadable")
+        return f'{{"file": "{Path(input_path).name}"}}'
+
+
+def test_job_streams_progress_and_results():
+    processor = BlockingProcessor()
+    queue = JobQueue(processor, workers=1, max_queue_depth=0)
+    job = queue.submit([Path("a.pdf"), Path("bad.pdf")])
+
+    processor.release.release()
+    snapshots = []
+    for snapshot in queue.updates(job, timeout=5):
+        snapshots.append(snapshot)
+        if snapshot.completed_files() == 1:
+            # The first result arrives while the second file is still running
+            assert snapshot.results == {0: '{"file": "a.pdf"}'}
+            assert snapshot.file_status == ["done", "running"]
+            processor.release.release()
+
+    final = snapshots[-1]
+    assert final.status == DONE
+    assert final.results == {0: '{"file": "a.pdf"}'}
+    assert final.errors[1] == "ValueError: unreadable"
+    assert final.file_status == ["done", "failed"]
+    queue.shutdown()
+
+
+def test_jobs_take_turns_on_the_workers():
+    processor = BlockingProcessor()
+    queue = JobQueue(processor, workers=1, max_queue_depth=0)
+    big = queue.submit([Path(f"big{index}.pdf") for index in range(3)])
+    small = queue.submit([Path("small.pdf")])
+
+    for _ in range(4):
+        processor.release.release()
+    list(queue.updates(big, timeout=5))
+    list(queue.updates(small, timeout=5))
+
+    # The small upload does not wait for the whole large one
+    assert processor.started.index("small.pdf") < processor.started.index("big2.pdf")
+    queue.shutdown()
+
+
+def test_full_queue_rejects_jobs():
+    processor = BlockingProcessor()
+    queue = JobQueue(processor, workers=1, max_queue_depth=3)
+    job = queue.submit([Path(f"{index}.pdf") for index in range(3)])
+
+    with pytest.raises(QueueFullError):
+        queue.submit([Path("a.pdf"), Path("b.pdf")])
+
+    queue.cancel(job.id)
+    processor.release.release()
+    list(queue.updates(job, timeout=5))
+    queue.shutdown()
+
+
+def test_cancel_drops_files_not_yet_started():
+    processor = BlockingProcessor()
+    queue = JobQueue(processor, workers=1, max_queue_depth=0)
+    job = queue.submit([Path(f"{index}.pdf") for index in range(3)])
+    for snapshot in queue.updates(job, timeout=5):
+        if snapshot.file_status[0] == "running":
+            break
+
+    assert queue.cancel(job.id)
+    processor.release.release()
+    final = list(queue.updates(job, timeout=5))[-1]
+
+    assert final.status == CANCELLED
+    assert final.file_status == ["done", "cancelled", "cancelled"]
+    assert processor.started == ["0.pdf"]
+    assert queue.queued_files() == 0
+    queue.shutdown()
@@ -0,0 +1,49 @@
+import pytest
+
+from llm_document_parser.config import BankStatement, BankStatementEntry
+from llm_document_parser.llm_cache import LLMCache, SQLiteLLMCache, llm_cache_key
+
+
+def test_cache_key_covers_every_input():
+    key = llm_cache_key("prompt", "text", "llama3:instruct", BankStatement)
+    assert key == llm_cache_key("prompt", "text", "llama3:instruct", BankStatement)
+    assert key != llm_cache_key("other prompt", "text", "llama3:instruct", BankStatement)
+    assert key != llm_cache_key("prompt", "other text", "llama3:instruct", BankStatement)
+    assert key != llm_cache_key("prompt", "text", "phi", BankStatement)
+    assert key != llm_cache_key("prompt", "text", "llama3:instruct", BankStatementEntry)
+
+
+def test_sqlite_cache_counts_hits_and_misses(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "llm.sqlite3"))
+    assert cache.get("key") is None
+
+    cache.put("key", '{"transactions": []}')
+    assert cache.get("key") == '{"transactions": []}'
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_sqlite_cache_expires_entries():
+    cache = SQLiteLLMCache(":memory:", ttl_seconds=-1)
+    cache.put("key", "{}")
+    assert cache.get("key") is None
+
+
+def test_sqlite_cache_evicts_least_recently_used():
+    cache = SQLiteLLMCache(":memory:", max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_cache_backends_must_implement_get_and_put():
+    class IncompleteCache(LLMCache):
+        def _get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteCache()
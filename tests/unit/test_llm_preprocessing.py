@@ -0,0 +1,42 @@
+from llm_document_parser.preprocessing.llm_preprocessing import (
+    normalize_whitespace,
+    preprocess_lines,
+    preprocess_text,
+    standardize_amounts,
+    standardize_dates,
+)
+
+
+STATEMENT = """ACME BANK    CONFIDENTIAL
+Page 1 of 3
+
+Date   Description    Amount
+  1/5/25   Coffee   Shop    $4.50
+12-31-2024  Rent  Page 1 of 3   $1,250.00
+Questions? Call 1-800-555-0100
+Thank you for banking with us.
+"""
+
+
+def test_preprocess_text_keeps_transaction_lines_only():
+    assert preprocess_text(STATEMENT) == "2025-01-05 Coffee Shop 4.50\n2024-12-31 Rent 1250.00"
+
+
+def test_preprocess_lines_streams_from_any_iterable():
+    lines = iter(STATEMENT.splitlines(keepends=True))
+    assert list(preprocess_lines(lines, standardize_amounts_flag=False)) == [
+        "2025-01-05 Coffee Shop $4.50",
+        "2024-12-31 Rent $1,250.00",
+    ]
+
+
+def test_preprocess_text_without_extraction_keeps_other_lines():
+    result = preprocess_text(STATEMENT, extract_lines=False, remove_headers=False)
+    assert "Thank you for banking with us." in result
+    assert "Page 1 of 3" in result
+
+
+def test_individual_steps():
+    assert normalize_whitespace("a   b\n c\t d") == "a b\n c d"
+    assert standardize_dates("on 3/4/25 and 10-11-2024") == "on 2025-03-04 and 2024-10-11"
+    assert standardize_amounts("$1,234,567.89 and $ -12.00 and 12,34") == "1234567.89 and -12.00 and 12,34"
@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+from llm_document_parser import model_registry
+from llm_document_parser.model_registry import ModelRegistry
+
+
+def make_registry(monkeypatch, tmp_path):
+    loads, checks = [], []
+    monkeypatch.setattr(model_registry, "load_ocr_model", lambda model_type, *args: loads.append(model_type) or object())
+    monkeypatch.setattr(model_registry.ModelStore, "ensure_ollama_model", lambda self, model: checks.append(model))
+    config = SimpleNamespace(
+        OCR_MODEL="easy",
+        TESSERACT_TESSDATA_LOCATION="",
+        MODEL_DIR=str(tmp_path),
+        MODELS_OFFLINE=False,
+        OLLAMA_MODEL="llama3:instruct",
+    )
+    return ModelRegistry(config), config, loads, checks
+
+
+def test_models_are_reused_until_the_config_changes(monkeypatch, tmp_path):
+    registry, config, loads, checks = make_registry(monkeypatch, tmp_path)
+
+    converter = registry.get_document_converter()
+    assert registry.get_document_converter() is converter
+    registry.ensure_ollama_model()
+    registry.ensure_ollama_model()
+    assert loads == ["easy"] and checks == ["llama3:instruct"]
+
+    config.OCR_MODEL = "rapid"
+    config.OLLAMA_MODEL = "phi"
+    assert registry.get_document_converter() is not converter
+    registry.ensure_ollama_model()
+    assert loads == ["easy", "rapid"] and checks == ["llama3:instruct", "phi"]
+
+
+def test_reload_rebuilds_models_with_unchanged_config(monkeypatch, tmp_path):
+    registry, config, loads, checks = make_registry(monkeypatch, tmp_path)
+    registry.get_document_converter()
+    registry.ensure_ollama_model()
+
+    registry.reload()
+    registry.get_document_converter()
+    registry.ensure_ollama_model()
+
+    assert loads == ["easy", "easy"] and checks == ["llama3:instruct", "llama3:instruct"]
@@ -0,0 +1,86 @@
+import json
+import pickle
+
+import pytest
+
+from llm_document_parser.model_store import RAPID_OCR_MODEL_FILES, ModelStore
+
+
+class FakeOllamaClient:
+    def __init__(self, installed):
+        self.installed = installed
+        self.calls = []
+
+    def list(self):
+        self.calls.append("list")
+        return {"models": [{"model": model} for model in self.installed]}
+
+    def pull(self, model):
+        self.calls.append(f"pull {model}")
+
+
+def provision_rapid_ocr(store, model_files):
+    for model_file in model_files:
+        path = store.model_dir / "rapidocr" / model_file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"onnx")
+        store._record("rapidocr", model_file, {"sha256": "test"})
+
+
+def test_rapid_ocr_models_resolve_from_manifest_offline(tmp_path):
+    model_files = RAPID_OCR_MODEL_FILES["rapid-mobile"]
+    with pytest.raises(FileNotFoundError, match="prefetch"):
+        ModelStore(str(tmp_path), offline=True).rapid_ocr_dir(model_files)
+
+    provision_rapid_ocr(ModelStore(str(tmp_path)), model_files)
+
+    offline_store = ModelStore(str(tmp_path), offline=True)
+    assert offline_store.rapid_ocr_dir(model_files) == str(tmp_path / "rapidocr")
+    with pytest.raises(FileNotFoundError):
+        offline_store.rapid_ocr_dir(RAPID_OCR_MODEL_FILES["rapid"])
+    with pytest.raises(FileNotFoundError):
+        offline_store.docling_artifacts_path()
+    assert ModelStore(str(tmp_path)).docling_artifacts_path() is None
+
+
+def test_ollama_model_is_only_checked_until_it_is_recorded(tmp_path):
+    client = FakeOllamaClient(installed=[])
+    store = ModelStore(str(tmp_path))
+    store.ensure_ollama_model("llama3", client, "http://gpu-1:11434")
+    assert client.calls == ["list", "pull llama3:latest"]
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert "http://gpu-1:11434 llama3" in manifest["ollama"]
+
+    reopened = ModelStore(str(tmp_path), offline=True)
+    reopened.ensure_ollama_model("llama3", client, "http://gpu-1:11434")
+    reopened.ensure_ollama_model("mistral", client, "http://gpu-1:11434")
+    assert client.calls == ["list", "pull llama3:latest"]
+
+
+def test_model_store_is_sent_to_workers_without_its_manifest(tmp_path):
+    store = ModelStore(str(tmp_path), offline=True)
+    store.manifest()
+    copy = pickle.loads(pickle.dumps(store))
+    assert (copy.model_dir, copy.offline, copy._manifest) == (tmp_path, True, None)
+
+
+@pytest.mark.parametrize("model_type", ["rapid-mobile", "easy", "ocrmac", "tesseract"])
+def test_offline_converters_load_docling_models_from_the_store(tmp_path, monkeypatch, model_type):
+    from docling.datamodel.base_models import InputFormat
+
+    from llm_document_parser.convert_doc_docling import load_ocr_model, text_layer_converter
+
+    # The tesseract loader sets TESSDATA_PREFIX, so it is restored after the test
+    monkeypatch.setenv("TESSDATA_PREFIX", "")
+    store = ModelStore(str(tmp_path))
+    provision_rapid_ocr(store, RAPID_OCR_MODEL_FILES["rapid-mobile"])
+    (tmp_path / "docling").mkdir()
+    store._record("docling", "artifacts", {"sha256": "test"})
+
+    converter = load_ocr_model(model_type, str(tmp_path), ModelStore(str(tmp_path), offline=True))
+
+    # Real PDFs, in-memory page PDFs, images and the text layer converter all use the stored models
+    format_options = [converter.format_to_options[InputFormat.PDF], converter.format_to_options[InputFormat.IMAGE]]
+    format_options.append(text_layer_converter(converter).format_to_options[InputFormat.PDF])
+    assert [option.pipeline_options.artifacts_path for option in format_options] == [str(tmp_path / "docling")] * 3
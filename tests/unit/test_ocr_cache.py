@@ -0,0 +1,38 @@
+import os
+
+from llm_document_parser.ocr_cache import OCRCache
+
+
+def test_cache_key_depends_on_contents_and_fingerprint(tmp_path):
+    cache = OCRCache(str(tmp_path / "cache"), max_bytes=1024)
+    statement = tmp_path / "statement.png"
+    statement.write_bytes(b"statement")
+
+    key = cache.key(statement, "easy")
+    assert key == cache.key(statement, "easy")
+    assert key != cache.key(statement, "tesseract")
+
+    statement.write_bytes(b"other statement")
+    assert key != cache.key(statement, "easy")
+
+
+def test_cache_round_trip(tmp_path):
+    cache = OCRCache(str(tmp_path), max_bytes=1024)
+    assert cache.get("missing") is None
+
+    cache.put("key", "| date | amount |")
+    assert cache.get("key") == "| date | amount |"
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = OCRCache(str(tmp_path), max_bytes=20)
+    cache.put("old", "x" * 10)
+    cache.put("new", "y" * 10)
+    os.utime(tmp_path / "old.md", (0, 0))
+    os.utime(tmp_path / "new.md", (1, 1))
+
+    cache.put("newest", "z" * 10)
+
+    assert cache.get("old") is None
+    assert cache.get("new") == "y" * 10
+    assert cache.get("newest") == "z" * 10
@@ -0,0 +1,54 @@
+import math
+import pickle
+from types import SimpleNamespace
+
+from llm_document_parser.instrumentation import metrics
+from llm_document_parser.ocr_fallback import OCRFallback, escalation_stats, low_confidence_pages, merge_escalated_pages
+
+
+def conversion_result(scores):
+    """A stand-in for docling's ConversionResult with the given OCR score per page."""
+    def export_to_markdown(page_no=None, page_break_placeholder=None):
+        if page_no is not None:
+            return f"fast {page_no}"
+        return (page_break_placeholder or "\n\n").join(f"fast {page_no}" for page_no in scores)
+
+    return SimpleNamespace(
+        pages=[SimpleNamespace(page_no=page_no) for page_no in scores],
+        confidence=SimpleNamespace(pages={page_no: SimpleNamespace(ocr_score=score) for page_no, score in scores.items()}),
+        document=SimpleNamespace(export_to_markdown=export_to_markdown),
+    )
+
+
+def test_low_confidence_pages_ignores_pages_without_ocr():
+    result = conversion_result({1: 0.9, 2: 0.3, 3: math.nan, 4: 0.49})
+    assert low_confidence_pages(result, 0.5) == [2, 4]
+
+
+def test_only_low_confidence_pages_are_reconverted():
+    metrics.reset()
+    fallback = OCRFallback("easy", "", min_confidence=0.5)
+    fallback._document_converter = "accurate converter"
+    calls = []
+
+    def reconvert(document_converter, page_numbers):
+        calls.append((document_converter, page_numbers))
+        return {page_no: f"accurate {page_no}" for page_no in page_numbers}
+
+    result = conversion_result({1: 0.9, 2: 0.2, 3: 0.95})
+    markdown = merge_escalated_pages(result, fallback, reconvert, "<br>", "statement.pdf")
+
+    assert calls == [("accurate converter", [2])]
+    assert markdown == "fast 1<br>accurate 2<br>fast 3"
+    assert escalation_stats()["page_escalation_rate"] == 1 / 3
+
+    assert merge_escalated_pages(conversion_result({1: 0.9}), fallback, reconvert) == "fast 1"
+    assert len(calls) == 1
+
+
+def test_fallback_is_sent_to_workers_without_its_model():
+    fallback = OCRFallback("easy", "", min_confidence=0.5)
+    fallback._document_converter = object()
+    copy = pickle.loads(pickle.dumps(fallback))
+    assert copy._document_converter is None
+    assert (copy.model_type, copy.min_confidence) == ("easy", 0.5)
@@ -0,0 +1,73 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from llm_document_parser import ocr_pool
+from llm_document_parser.instrumentation import metrics
+from llm_document_parser.ocr_fallback import escalation_stats
+from llm_document_parser.ocr_pool import OCRWorkerPool
+
+
+# Stand in for the worker functions, so the pool runs without loading an OCR model.
+# They are looked up by name in the forked worker processes.
+def fake_init_worker(*args):
+    pass
+
+def fake_convert_in_worker(input_path, page_range):
+    if "broken" in input_path.name:
+        raise ValueError(f"cannot convert {input_path.name}")
+    # Later parts finish first, so parts are joined by position rather than completion order
+    if page_range is not None:
+        time.sleep(0.05 * (10 - page_range[0]) / 10)
+    metrics.increment("ocr_pages", 2)
+    metrics.increment("ocr_pages_escalated", 1)
+    return f"{input_path.name}{page_range or ''}"
+
+
+@pytest.fixture
+def fake_workers(monkeypatch):
+    monkeypatch.setattr(ocr_pool, "_init_worker", fake_init_worker)
+    monkeypatch.setattr(ocr_pool, "_convert_in_worker", fake_convert_in_worker)
+    monkeypatch.setattr(ocr_pool, "count_pdf_pages", lambda input_path: 7)
+
+
+def test_page_ranges_are_joined_in_page_order(fake_workers):
+    with OCRWorkerPool("easy", "", workers=3, pages_per_task=3, page_break_placeholder="|") as pool:
+        assert pool.convert(Path("statement.pdf")) == "statement.pdf(1, 3)|statement.pdf(4, 6)|statement.pdf(7, 7)"
+
+
+def test_failed_files_are_returned_without_stopping_the_others(fake_workers):
+    paths = [Path("a.png"), Path("broken.png"), Path("c.png")]
+    with OCRWorkerPool("easy", "", workers=2) as pool:
+        results = {index: text for index, _, text in pool.imap_unordered(paths, return_exceptions=True)}
+
+    assert results[0] == "a.png" and results[2] == "c.png"
+    assert isinstance(results[1], ValueError)
+
+    with OCRWorkerPool("easy", "", workers=2) as pool:
+        with pytest.raises(ValueError):
+            list(pool.imap_unordered(paths))
+
+
+def test_tasks_are_only_submitted_while_results_are_consumed(fake_workers):
+    submitted = []
+    with OCRWorkerPool("easy", "", workers=2, max_pending=2) as pool:
+        submit = pool._executor.submit
+        pool._executor.submit = lambda *args: submitted.append(args) or submit(*args)
+
+        results = pool.imap_unordered([Path(f"{index}.png") for index in range(10)])
+        next(results)
+        assert len(submitted) == 2
+        assert len(list(results)) == 9
+        assert len(submitted) == 10
+
+
+def test_worker_escalations_are_counted_in_the_parent(fake_workers):
+    metrics.reset()
+    with OCRWorkerPool("easy", "", workers=2, pages_per_task=3) as pool:
+        list(pool.imap_unordered([Path("statement.pdf"), Path("a.png")]))
+
+    # Three page ranges of the PDF and one image, each converting 2 pages and escalating 1
+    stats = escalation_stats()
+    assert (stats["pages"], stats["pages_escalated"], stats["page_escalation_rate"]) == (8, 4, 0.5)
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import numpy
+import pypdfium2
+from PIL import Image
+
+from llm_document_parser.convert_doc_docling import images_to_document_stream, load_rapid_ocr_model
+from llm_document_parser.preprocessing.ocr_preprocessing import load_page_images, preprocess_images
+
+
+def make_pdf(path, page_count):
+    pages = [Image.new("RGB", (200, 100), (255, 255, 255)) for _ in range(page_count)]
+    pages[0].save(path, format="PDF", save_all=True, append_images=pages[1:], resolution=72.0)
+
+
+def test_load_page_images_rasterizes_pdf_page_range(tmp_path):
+    pdf_path = tmp_path / "statement.pdf"
+    make_pdf(pdf_path, 3)
+
+    pages = load_page_images(pdf_path)
+    assert len(pages) == 3
+    # Rasterized above 72 DPI by default, so small print survives OCR
+    assert pages[0].shape[:2] == (200, 400)
+    pages = load_page_images(pdf_path, scale=3.0, page_range=(2, 3))
+    assert len(pages) == 2
+    assert pages[0].shape[:2] == (300, 600)
+
+
+def test_preprocessed_batch_is_packed_into_an_in_memory_pdf(tmp_path):
+    image_path = tmp_path / "page.png"
+    Image.new("RGB", (120, 80), (200, 200, 200)).save(image_path)
+    pages = load_page_images(image_path) * 2
+
+    processed = preprocess_images(pages)
+    assert [page.shape for page in processed] == [(160, 240), (160, 240)]
+    assert all(set(numpy.unique(page)) <= {0, 255} for page in processed)
+
+    document = images_to_document_stream(processed, "page.png")
+    assert document.name == "page.pdf"
+    # Embedded losslessly, so binarized pages reach OCR without JPEG artifacts
+    assert b"DCTDecode" not in document.stream.getvalue()
+    pdf = pypdfium2.PdfDocument(document.stream.getvalue())
+    try:
+        assert len(pdf) == 2
+        assert pdf[0].get_size() == (240, 160)
+        assert numpy.array_equal(pdf[0].render(scale=1.0, grayscale=True).to_numpy().squeeze(), processed[0])
+    finally:
+        pdf.close()
+
+
+def test_rapid_ocr_converter_reads_in_memory_pdfs_with_rapid_ocr():
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import RapidOcrOptions
+
+    converter = load_rapid_ocr_model("det.onnx", "rec.onnx", "cls.onnx", download_path="models")
+
+    # Preprocessed pages are sent as a PDF, so the PDF pipeline must use RapidOCR too
+    for input_format in [InputFormat.PDF, InputFormat.IMAGE]:
+        ocr_options = converter.format_to_options[input_format].pipeline_options.ocr_options
+        assert isinstance(ocr_options, RapidOcrOptions)
+        assert ocr_options.det_model_path == str(Path("models") / "det.onnx")
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_document_parser.config import BankStatement
+from llm_document_parser.instructor_llm import extract_data_using_ollama_llm, extract_data_using_ollama_llm_async
+from llm_document_parser.instrumentation import metrics
+from llm_document_parser.llm_cache import SQLiteLLMCache
+from llm_document_parser.ollama_endpoints import OllamaEndpointPool
+
+STATEMENT = {
+    "transactions": [
+        {"transaction_date": "2025-01-24", "description": "Walmart", "amount": 34.24, "transaction_type": "withdrawal"}
+    ]
+}
+
+
+class StubOllamaServer:
+    """
+    Minimal stand-in for an Ollama node: lists and pulls models and answers chat completions.
+    """
+
+    def __init__(self, models=()):
+        self.models = list(models)
+        self.completions = 0
+        # Number of completions still to be answered with output that fails validation
+        self.invalid_replies = 0
+        self.pulls = []
+        # Seconds a pull takes before it is answered
+        self.pull_seconds = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._send_json({"models": [{"model": model, "name": model} for model in stub.models]})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path == "/api/pull":
+                    time.sleep(stub.pull_seconds)
+                    stub.pulls.append(request["model"])
+                    stub.models.append(request["model"])
+                    self._send_json({"status": "success"})
+                    return
+                stub.completions += 1
+                content = json.dumps(STATEMENT)
+                if stub.invalid_replies:
+                    stub.invalid_replies -= 1
+                    content = "not json"
+                self._send_json({
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": request["model"],
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }],
+                })
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_servers():
+    servers = [StubOllamaServer(models=["llama3:instruct"]), StubOllamaServer()]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def test_pull_model_on_every_node(stub_servers):
+    pool = OllamaEndpointPool([server.host for server in stub_servers])
+    pool.pull_model("llama3:instruct")
+
+    assert stub_servers[0].pulls == []
+    assert stub_servers[1].pulls == ["llama3:instruct"]
+
+
+def test_pulls_outlast_the_health_probe_timeout(stub_servers):
+    stub_servers[1].pull_seconds = 1.5
+    pool = OllamaEndpointPool([server.host for server in stub_servers], timeout=0.5)
+    pool.pull_model("llama3:instruct")
+
+    assert stub_servers[1].pulls == ["llama3:instruct"]
+
+
+def test_requests_go_to_least_loaded_node(stub_servers):
+    pool = OllamaEndpointPool([server.host for server in stub_servers])
+
+    with pool.acquire() as busy_endpoint:
+        json_data = pool.extract_json_data("prompt", "text", "llama3:instruct", BankStatement)
+
+    assert json.loads(json_data) == STATEMENT
+    idle_server = stub_servers[1] if busy_endpoint.host == stub_servers[0].host else stub_servers[0]
+    assert idle_server.completions == 1
+
+
+def test_unhealthy_nodes_are_skipped(stub_servers):
+    stub_servers[0].stop()
+    pool = OllamaEndpointPool([server.host for server in stub_servers], timeout=1)
+
+    healthy = pool.check_health()
+    assert [endpoint.host for endpoint in healthy] == [stub_servers[1].host]
+
+    pool.extract_json_data("prompt", "text", "llama3:instruct", BankStatement)
+    assert stub_servers[1].completions == 1
+
+
+def test_failed_request_is_retried_on_another_node(stub_servers):
+    pool = OllamaEndpointPool([server.host for server in stub_servers], timeout=1)
+    stub_servers[0].stop()
+    pool.endpoints[1].outstanding = 1
+
+    pool.extract_json_data("prompt", "text", "llama3:instruct", BankStatement)
+
+    assert not pool.endpoints[0].healthy
+    assert stub_servers[1].completions == 1
+
+
+def test_extract_data_returns_validated_model_and_caches_it(stub_servers, tmp_path):
+    pool = OllamaEndpointPool([server.host for server in stub_servers])
+    cache = SQLiteLLMCache(str(tmp_path / "llm.sqlite3"))
+
+    result = pool.extract_data("prompt", "text", "llama3:instruct", BankStatement, cache=cache)
+    cached_result = pool.extract_data("prompt", "text", "llama3:instruct", BankStatement, cache=cache)
+
+    assert isinstance(result, BankStatement)
+    assert result.model_dump(mode="json") == STATEMENT
+    assert cached_result.model_dump(mode="json") == STATEMENT
+    assert sum(server.completions for server in stub_servers) == 1
+
+
+def test_cache_hits_do_not_need_a_healthy_node(stub_servers, tmp_path):
+    pool = OllamaEndpointPool([server.host for server in stub_servers])
+    cache = SQLiteLLMCache(str(tmp_path / "llm.sqlite3"))
+    pool.extract_data("prompt", "text", "llama3:instruct", BankStatement, cache=cache)
+
+    for endpoint in pool.endpoints:
+        endpoint.healthy = False
+    cached_result = pool.extract_data("prompt", "text", "llama3:instruct", BankStatement, cache=cache)
+
+    assert cached_result.model_dump(mode="json") == STATEMENT
+    assert cache.stats() == {"hits": 1, "misses": 1}
+    assert all(endpoint.outstanding == 0 for endpoint in pool.endpoints)
+
+
+def validation_retries():
+    return metrics.snapshot()["counters"].get("llm_validation_retries", 0)
+
+
+def test_sync_and_async_requests_count_validation_retries(stub_servers):
+    server = stub_servers[0]
+    base_url = f"{server.host}/v1"
+
+    server.invalid_replies = 1
+    before = validation_retries()
+    extract_data_using_ollama_llm("prompt", "sync text", "llama3:instruct", BankStatement, base_url=base_url)
+    assert validation_retries() - before == 1
+
+    server.invalid_replies = 1
+    before = validation_retries()
+    asyncio.run(extract_data_using_ollama_llm_async("prompt", "async text", "llama3:instruct", BankStatement, base_url=base_url))
+    assert validation_retries() - before == 1
@@ -0,0 +1,50 @@
+from llm_document_parser.chunking import PAGE_BREAK_PLACEHOLDER
+from llm_document_parser.instrumentation import metrics
+from llm_document_parser.preprocessing.prompt_compaction import compact_markdown, compact_prompt
+
+
+MARKDOWN = f"""## ACME BANK CONFIDENTIAL
+
+Page 1 of 2
+
+Thank you for banking with us. Questions? Call 1-800-555-0100.
+
+| Account summary | Amount |
+|---|---|
+| Opening balance | $1,000.00 |
+| Closing balance | $2,000.00 |
+
+| Date | Description | Amount |
+|---|---|---|
+| 01/05/25 | Coffee Shop | $4.50 |
+| | continued from previous page | |
+| 2025-01-06 | Payroll Deposit | $1,250.00 |
+{PAGE_BREAK_PLACEHOLDER}
+Page 2 of 2
+
+1/7/25 Rent Payment -900.00
+
+Member FDIC
+"""
+
+
+def test_compact_markdown_keeps_transactions_and_table_headers():
+    assert compact_markdown(MARKDOWN) == "\n".join([
+        "| Date | Description | Amount |",
+        "|---|---|---|",
+        "| 01/05/25 | Coffee Shop | $4.50 |",
+        "| 2025-01-06 | Payroll Deposit | $1,250.00 |",
+        PAGE_BREAK_PLACEHOLDER,
+        "1/7/25 Rent Payment -900.00",
+    ])
+
+
+def test_compact_prompt_reports_tokens_and_falls_back_to_full_text():
+    metrics.reset()
+    compacted = compact_prompt(MARKDOWN, "statement.pdf")
+    counters = metrics.snapshot()["counters"]
+    assert counters["llm_prompt_tokens_after_compaction"] < counters["llm_prompt_tokens_before_compaction"] / 2
+    assert "Coffee Shop" in compacted
+
+    no_transactions = "# Letter\n\nDear customer, your card has been renewed."
+    assert compact_prompt(no_transactions) == no_transactions
@@ -0,0 +1,159 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from llm_document_parser import cli
+from llm_document_parser.sharding import (
+    file_shard,
+    merge_shards,
+    parse_shard_spec,
+    record_shard_part,
+    select_shard,
+    shard_manifest_path,
+)
+
+# Runs one node: the real command line with the given arguments, with OCR reading the
+# statement JSON from the file and an LLM that validates it, so no models are needed
+NODE_SCRIPT = """
+import os, sys
+from llm_document_parser import cli, ocr_pool
+from llm_document_parser.config import RESPONSE_MODEL
+
+# Set to stop the node abruptly after this many extractions, like a crashed machine
+crash_after = int(os.environ.get("CRASH_AFTER", 0))
+
+class FakeOllamaEndpoints:
+    extractions = 0
+    def start_health_checks(self): pass
+    def stop_health_checks(self): pass
+    def pull_model(self, model, model_store=None): pass
+    def extract_data(self, prompt, text_data, ollama_model, response_model, cache=None):
+        self.extractions += 1
+        if crash_after and self.extractions > crash_after:
+            os._exit(1)
+        return RESPONSE_MODEL.model_validate_json(text_data)
+
+def read_statement(document_converter, input_path, *args, **kwargs):
+    return input_path.read_text()
+
+cli.load_ollama_endpoints_from_args = lambda args: FakeOllamaEndpoints()
+cli.load_ocr_model = ocr_pool.load_ocr_model = lambda *args: None
+cli.convert_to_markdown = ocr_pool.convert_to_markdown = read_statement
+cli.main(sys.argv[1:])
+"""
+
+NODE_OPTIONS = ["--no-ocr-cache", "--no-llm-cache", "--no-prompt-compaction", "--no-chunking", "--ocr-workers", "2"]
+
+
+def start_node(input_folder, output_folder, export_type, shard, *options, crash_after=0):
+    return subprocess.Popen(
+        [sys.executable, "-c", NODE_SCRIPT, str(input_folder), "--output-folder", str(output_folder),
+         "--export-type", export_type, "--shard", shard, *NODE_OPTIONS, *options],
+        stdout=subprocess.DEVNULL,
+        env={**os.environ, "CRASH_AFTER": str(crash_after)}
+    )
+
+
+def make_statements(folder, count):
+    folder.mkdir()
+    for index in range(count):
+        transactions = [
+            {"transaction_date": f"2025-01-{day + 1:02d}", "description": f"statement {index} row {day}",
+             "amount": index + day / 100, "transaction_type": "withdrawal"}
+            for day in range(3)
+        ]
+        (folder / f"statement_{index}.json").write_text(json.dumps({"transactions": transactions}))
+
+
+def test_parse_shard_spec():
+    assert parse_shard_spec("2/8") == (2, 8)
+    for spec in ["8/8", "-1/4", "1", "a/b", "0/0"]:
+        with pytest.raises(ValueError):
+            parse_shard_spec(spec)
+
+
+def test_shards_partition_files_by_content(tmp_path):
+    make_statements(tmp_path / "in", 20)
+    paths = sorted((tmp_path / "in").iterdir())
+
+    shards = [select_shard(paths, index, 3) for index in range(3)]
+
+    assert sorted(path for shard in shards for path in shard) == paths
+    # The shard follows the contents, not the name or location of the file
+    copy = tmp_path / "renamed.json"
+    copy.write_bytes(paths[0].read_bytes())
+    assert file_shard(copy, 3) == file_shard(paths[0], 3)
+
+
+@pytest.mark.parametrize("export_type", ["csv", "json", "jsonl", "parquet"])
+def test_nodes_write_parts_that_merge_into_one_output(tmp_path, export_type):
+    make_statements(tmp_path / "in", 12)
+    output_folder = tmp_path / "out"
+    output_folder.mkdir()
+    shard_count = 3
+
+    nodes = [
+        start_node(tmp_path / "in", output_folder, export_type, f"{shard_index}/{shard_count}")
+        for shard_index in range(shard_count)
+    ]
+    assert [node.wait() for node in nodes] == [0] * shard_count
+
+    cli.main(["--output-folder", str(output_folder), "--export-type", export_type, "--merge-shards", str(shard_count)])
+    [merged_path] = [path for path in output_folder.glob(f"output*.{export_type}") if ".shard-" not in path.name]
+
+    if export_type == "csv":
+        merged = pd.read_csv(merged_path)
+    elif export_type == "json":
+        merged = pd.DataFrame(json.loads(merged_path.read_text()))
+    elif export_type == "jsonl":
+        merged = pd.read_json(merged_path, lines=True, convert_dates=False)
+    else:
+        merged = pd.read_parquet(merged_path)
+    assert len(merged) == 36
+    assert sorted(merged["description"]) == sorted(
+        f"statement {index} row {day}" for index in range(12) for day in range(3)
+    )
+
+
+def test_merge_requires_every_shard(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        merge_shards(str(tmp_path), "output", "csv", 2)
+
+
+def test_crashed_and_rerun_shards_merge_every_row_once(tmp_path):
+    make_statements(tmp_path / "in", 6)
+    output_folder = tmp_path / "out"
+    output_folder.mkdir()
+    expected = sorted(f"statement {index} row {day}" for index in range(6) for day in range(3))
+
+    def merged_descriptions():
+        return sorted(pd.read_csv(merge_shards(str(output_folder), "output", "csv", 1))["description"])
+
+    # The crashed run's part is never recorded, so the resumed run extracts its files again
+    assert start_node(tmp_path / "in", output_folder, "csv", "0/1", "--resume", crash_after=4).wait() != 0
+    assert start_node(tmp_path / "in", output_folder, "csv", "0/1", "--resume").wait() == 0
+    assert merged_descriptions() == expected
+
+    # A run without --resume processes every file again and replaces the earlier parts
+    assert start_node(tmp_path / "in", output_folder, "csv", "0/1").wait() == 0
+    assert merged_descriptions() == expected
+    manifest = json.loads(shard_manifest_path(str(output_folder), "output", 0, 1).read_text())
+    assert manifest["files"] == 6 and [part["rows"] for part in manifest["parts"]] == [18]
+
+
+def test_resumed_shard_keeps_earlier_failures_it_did_not_retry(tmp_path):
+    part_path = tmp_path / "output.shard-0-of-2.part.csv"
+    record_shard_part(str(tmp_path), "output", 0, 2, "csv", part_path, 6, 4, [Path("a.pdf"), Path("b.pdf"), Path("c.pdf")],
+                      [Path("a.pdf"), Path("b.pdf")], resume=True)
+    # The resumed run retries a.pdf, which now succeeds, and fails on the new d.pdf
+    record_shard_part(str(tmp_path), "output", 0, 2, "csv", part_path, 2, 4, [Path("a.pdf"), Path("d.pdf")],
+                      [Path("d.pdf")], resume=True)
+
+    manifest = json.loads(shard_manifest_path(str(tmp_path), "output", 0, 2).read_text())
+    assert manifest["failed_files"] == ["b.pdf", "d.pdf"]
+    assert manifest["files"] == 4 and [part["rows"] for part in manifest["parts"]] == [6, 2]
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+from llm_document_parser import ocr_pool
+from llm_document_parser.convert_doc_docling import pdf_text_layers
+
+
+def write_pdf(path, page_texts):
+    """Write a minimal PDF with one page per entry, None giving a page without text."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET" if text else ""
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    body = "%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n"
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    path.write_bytes(body.encode("latin-1"))
+
+
+TRANSACTION = "01/05/2025 Coffee Shop 4.50 withdrawal"
+
+
+def test_pdf_text_layers_flags_pages_without_text(tmp_path):
+    pdf_path = tmp_path / "statement.pdf"
+    write_pdf(pdf_path, [TRANSACTION, None, "p. 3"])
+
+    pages = pdf_text_layers(pdf_path, min_chars=20)
+    assert [(page.page_no, page.usable) for page in pages] == [(1, True), (2, False), (3, False)]
+    assert pages[0].char_count == len(TRANSACTION.replace(" ", ""))
+    assert [page.page_no for page in pdf_text_layers(pdf_path, min_chars=1, page_range=(2, 3))] == [2, 3]
+
+
+def test_only_pages_without_text_layer_are_ocrd(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "statement.pdf"
+    write_pdf(pdf_path, [TRANSACTION, TRANSACTION, None, TRANSACTION])
+    ocr_converter, text_converter = object(), object()
+    calls = []
+
+    def fake_image_to_text(document_converter, file_path, page_range=None):
+        kind = "ocr" if document_converter is ocr_converter else "text"
+        calls.append((kind, page_range))
+        document = SimpleNamespace(export_to_markdown=lambda page_break_placeholder=None: f"{kind}{page_range}")
+        return SimpleNamespace(document=document)
+
+    monkeypatch.setattr(ocr_pool, "image_to_text", fake_image_to_text)
+    monkeypatch.setattr(ocr_pool, "text_layer_converter", lambda document_converter: text_converter)
+
+    markdown = ocr_pool.convert_to_markdown(ocr_converter, pdf_path, page_break_placeholder="<br>", text_layer_min_chars=20)
+
+    assert calls == [("text", (1, 2)), ("ocr", (3, 3)), ("text", (4, 4))]
+    assert markdown == "text(1, 2)<br>ocr(3, 3)<br>text(4, 4)"